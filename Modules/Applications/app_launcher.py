@@ -0,0 +1,335 @@
+"""
+This module starts applications. The Exec line of a desktop file is split and its field codes
+expanded as the desktop entry spec describes, and the program is started in its own session with
+no pipes to it, so the Tk loop never waits on it. Children are reaped as soon as they exit: where
+the kernel supports pidfds each child gets one, watched by the Tk loop like any other file, and
+elsewhere the children that are still running are polled.
+
+While an application is starting (from the moment it's launched until its first window appears)
+launching it again does nothing, so a second tap on a slow application doesn't start it twice.
+The launcher's own window being covered or losing the focus is taken as the first window of the
+application started longest ago appearing, and the time that took is recorded for each
+application, so we can tell which applications are too slow to start on the device. The last
+LAUNCH_HISTORY times of each application are kept in the cache directory across runs.
+"""
+
+import os
+import json
+import time
+import shlex
+import shutil
+import tempfile
+import functools
+import statistics
+import subprocess
+import tkinter
+import Modules.Cache.icon_cache as icon_cache
+
+LAUNCH_TIMEOUT_MS = 30000
+POLL_MS = 500
+LAUNCH_HISTORY = 20
+TERMINAL_COMMAND = ['x-terminal-emulator', '-e']
+
+#Field codes that expand to nothing, since the launcher never opens files or URLs and the rest are
+#deprecated.
+EMPTY_FIELD_CODES = ('%f', '%F', '%u', '%U', '%d', '%D', '%n', '%N', '%v', '%m')
+STRING_ESCAPES = {'s': ' ', 'n': '\n', 't': '\t', 'r': '\r', '\\': '\\'}
+
+def unescape_value(value):
+    """
+    Undo the escapes the desktop entry spec allows in any string value (\\s, \\n, \\t, \\r and
+    \\\\). Any other backslash is left alone for the Exec quoting rules to deal with.
+    """
+    result = []
+    characters = iter(value)
+    for character in characters:
+        if character == '\\':
+            following = next(characters, '')
+            if following in STRING_ESCAPES:
+                result.append(STRING_ESCAPES[following])
+            else:
+                result.append(character + following)
+        else:
+            result.append(character)
+    return ''.join(result)
+
+def expand_field_codes(argument, record):
+    """
+    Expand the field codes in one (unquoted) argument of an Exec line. Returns a list of arguments,
+    since %i expands to two of them and an argument that is only a field code for files or URLs
+    expands to none.
+    """
+    if argument in EMPTY_FIELD_CODES:
+        return []
+    if argument == '%i':
+        return ['--icon', record['icon_name']] if record.get('icon_name') else []
+    expanded = []
+    characters = iter(argument)
+    for character in characters:
+        if character != '%':
+            expanded.append(character)
+            continue
+        code = next(characters, '')
+        if code == '%':
+            expanded.append('%')
+        elif code == 'c':
+            expanded.append(record.get('name', ''))
+        elif code == 'k':
+            expanded.append(record.get('desktop_file', ''))
+    return [''.join(expanded)]
+
+def get_command(record):
+    """
+    Turn the Exec line of an application record into the argument list to start it with, wrapped
+    in a terminal if the application asks for one. Returns an empty list if the Exec line can't
+    be parsed.
+    """
+    try:
+        lexer = shlex.shlex(unescape_value(record.get('shortcut') or ''), posix=True)
+        lexer.whitespace_split = True
+        lexer.commenters = ''
+        lexer.escapedquotes = '"'
+        lexer.quotes = '"'
+        words = list(lexer)
+    except ValueError:
+        return []
+    command = []
+    for word in words:
+        command += expand_field_codes(word, record)
+    if command and record.get('terminal') and shutil.which(TERMINAL_COMMAND[0]):
+        command = TERMINAL_COMMAND + command
+    return command
+
+def get_launch_key(record):
+    """
+    Get what identifies an application for double launch prevention and the launch times.
+    """
+    return record.get('desktop_file') or record.get('shortcut') or record.get('name', '')
+
+class AppLauncher:
+    """
+    Starts applications and keeps track of them until they exit. This has to be attached to the
+    Tk root (from the main thread) before anything is launched.
+    """
+    def __init__(self, history=LAUNCH_HISTORY):
+        self.history = history
+        self.root = None
+        self.starting = {}
+        self.running = []
+        self.poll_id = None
+        self.stats = None
+        self.stats_path = None
+
+    def attach(self, root):
+        """
+        Start watching the Tk root for the windows of launched applications appearing over it.
+        """
+        self.root = root
+        self.root.bind('<Visibility>', self.visibility_changed, add='+')
+        self.root.bind('<FocusOut>', self.focus_changed, add='+')
+
+    def is_starting(self, record):
+        """
+        Whether an application has been launched and its first window hasn't appeared yet.
+        """
+        return get_launch_key(record) in self.starting
+
+    def launch(self, record):
+        """
+        Start an application. Returns True if it was started, or False if it's already starting
+        or couldn't be started.
+        """
+        key = get_launch_key(record)
+        if key in self.starting:
+            print("Already starting " + record['name'])
+            return False
+        command = get_command(record)
+        if not command:
+            print("Unable to parse the command of " + record['name'])
+            return False
+        try:
+            process = subprocess.Popen(command, stdin=subprocess.DEVNULL, #pylint: disable=consider-using-with
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                       close_fds=True, start_new_session=True)
+        except OSError:
+            print("Unable to launch " + record['name'])
+            self.record_launch(key, record['name'], 'failures')
+            return False
+        launch = {'key': key, 'name': record['name'], 'process': process,
+                  'started': time.monotonic(), 'pidfd': None}
+        self.starting[key] = launch
+        self.running.append(launch)
+        self.watch_process(launch)
+        self.root.after(LAUNCH_TIMEOUT_MS, self.timed_out, launch)
+        return True
+
+    def watch_process(self, launch):
+        """
+        Get told when a launched process exits, with a pidfd if we can or by polling if not.
+        """
+        try:
+            launch['pidfd'] = os.pidfd_open(launch['process'].pid)
+            self.root.tk.createfilehandler(launch['pidfd'], tkinter.READABLE,
+                                           functools.partial(self.pidfd_ready, launch))
+        except (AttributeError, OSError, tkinter.TclError):
+            if launch['pidfd'] is not None:
+                os.close(launch['pidfd'])
+                launch['pidfd'] = None
+            self.schedule_poll()
+
+    def pidfd_ready(self, launch, handle, mask): #pylint: disable=unused-argument
+        """
+        File handler callback, run when a launched process with a pidfd has exited.
+        """
+        self.root.tk.deletefilehandler(handle)
+        os.close(handle)
+        launch['pidfd'] = None
+        launch['process'].poll()
+        self.process_exited(launch)
+
+    def schedule_poll(self):
+        """
+        Poll the processes without a pidfd soon, unless that's already due.
+        """
+        if self.poll_id is None:
+            self.poll_id = self.root.after(POLL_MS, self.poll_processes)
+
+    def poll_processes(self):
+        """
+        Reap any process without a pidfd that has exited, and keep polling while some are left.
+        """
+        self.poll_id = None
+        polled = [launch for launch in self.running if launch['pidfd'] is None]
+        for launch in polled:
+            if launch['process'].poll() is not None:
+                self.process_exited(launch)
+        if any(launch['pidfd'] is None for launch in self.running):
+            self.schedule_poll()
+
+    def process_exited(self, launch):
+        """
+        A launched process has exited (and been reaped). If it failed before showing a window it
+        counts as a failed launch. If it exited cleanly it may just have been a wrapper script
+        that started the real program, so we keep waiting for the window.
+        """
+        if launch in self.running:
+            self.running.remove(launch)
+        if launch['process'].returncode != 0 and self.starting.get(launch['key']) is launch:
+            del self.starting[launch['key']]
+            print(launch['name'] + " exited with status " + str(launch['process'].returncode))
+            self.record_launch(launch['key'], launch['name'], 'failures')
+
+    def timed_out(self, launch):
+        """
+        Give up waiting for the first window of an application, so it can be launched again.
+        """
+        if self.starting.get(launch['key']) is launch:
+            del self.starting[launch['key']]
+            self.record_launch(launch['key'], launch['name'], 'timeouts')
+
+    def visibility_changed(self, event):
+        """
+        The launcher window being covered means the window of an application has appeared.
+        """
+        if event.widget is self.root and event.state != 'VisibilityUnobscured':
+            self.window_appeared()
+
+    def focus_changed(self, event):
+        """
+        The launcher losing the focus (rather than it moving between our own widgets) also means
+        the window of an application has appeared.
+        """
+        if event.widget is self.root:
+            self.root.after_idle(self.check_focus)
+
+    def check_focus(self):
+        """
+        Check whether the focus has left the launcher altogether.
+        """
+        try:
+            focused = self.root.focus_get()
+        except (KeyError, tkinter.TclError):
+            focused = None
+        if focused is None:
+            self.window_appeared()
+
+    def window_appeared(self):
+        """
+        Put the first window down to the application that was launched longest ago and is still
+        starting, and record how long it took.
+        """
+        if not self.starting:
+            return
+        launch = min(self.starting.values(), key=lambda launch: launch['started'])
+        del self.starting[launch['key']]
+        latency = (time.monotonic() - launch['started']) * 1000
+        self.record_launch(launch['key'], launch['name'], 'launches', latency)
+
+    def load_stats(self):
+        """
+        Read the launch times recorded by earlier runs, the first time they're needed.
+        """
+        if self.stats is not None:
+            return
+        self.stats = {}
+        cache_dir = icon_cache.get_cache_dir('launches')
+        if not cache_dir:
+            return
+        self.stats_path = os.path.join(cache_dir, 'latency.json')
+        try:
+            with open(self.stats_path, encoding='utf-8') as statsfile:
+                self.stats = json.load(statsfile)
+        except (OSError, ValueError):
+            self.stats = {}
+
+    def write_stats(self):
+        """
+        Write the launch times back out to the cache directory.
+        """
+        if self.stats_path is None:
+            return
+        try:
+            handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.stats_path),
+                                                 suffix='.tmp')
+            with os.fdopen(handle, 'w', encoding='utf-8') as statsfile:
+                json.dump(self.stats, statsfile, separators=(',', ':'))
+            os.replace(temp_path, self.stats_path)
+        except OSError:
+            return
+
+    def record_launch(self, key, name, outcome, latency=None):
+        """
+        Count a launch of an application as one of launches, failures or timeouts, along with how
+        long its first window took to appear.
+        """
+        self.load_stats()
+        entry = self.stats.setdefault(key, {'name': name, 'launches': 0, 'failures': 0,
+                                            'timeouts': 0, 'latencies': []})
+        entry['name'] = name
+        entry[outcome] += 1
+        if latency is not None:
+            entry['latencies'] = (entry['latencies'] + [round(latency, 1)])[-self.history:]
+        self.write_stats()
+
+    def get_launch_stats(self):
+        """
+        Summarize the launch times of every application launched so far (in this run or earlier
+        ones), slowest median first.
+        """
+        self.load_stats()
+        summary = []
+        for key, entry in self.stats.items():
+            latencies = entry['latencies']
+            summary.append({'key': key, 'name': entry['name'], 'launches': entry['launches'],
+                            'failures': entry['failures'], 'timeouts': entry['timeouts'],
+                            'median': statistics.median(latencies) if latencies else None,
+                            'max': max(latencies) if latencies else None})
+        return sorted(summary, key=lambda item: -(item['median'] or 0))
+
+APP_LAUNCHER = AppLauncher()
+
+def launch(record):
+    """
+    Start an application with the shared launcher, see AppLauncher.launch.
+    """
+    return APP_LAUNCHER.launch(record)
@@ -0,0 +1,128 @@
+"""
+This module is the search index behind type-to-filter on the Apps tab. The index is built once
+from the application list: every word of each application's name, generic name and keywords, along
+with the name of the program it runs, goes into a sorted list of tokens, so all the tokens starting
+with whatever has been typed can be found with two binary searches. Applications are ranked by
+how well their tokens match, and if nothing matches a search term as a prefix we fall back to a
+fuzzy match of the term against the application names.
+"""
+
+import os
+import re
+import shlex
+from bisect import bisect_left
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+#How much a match on each field counts for (the first word of the name counts for more than the
+#rest of it), and the bonus when a token matches exactly rather than just starting with the search
+#term.
+FIELD_WEIGHTS = {'name_start': 10, 'name': 8, 'generic_name': 4, 'keywords': 3, 'exec': 2}
+EXACT_BONUS = 2
+FUZZY_WEIGHT = 1
+
+def tokenize(text):
+    """
+    Split a piece of text into casefolded words.
+    """
+    return TOKEN_PATTERN.findall(text.casefold()) if text else []
+
+def get_executable_name(shortcut):
+    """
+    Get the name of the program a desktop file Exec line (or a plain command) runs.
+    """
+    try:
+        words = shlex.split(shortcut or '')
+    except ValueError:
+        words = (shortcut or '').split()
+    words = [word for word in words if word != 'env' and '=' not in word]
+    return os.path.basename(words[0]) if words else ''
+
+def get_record_tokens(record):
+    """
+    Get the (field, token) pairs to index for an application record.
+    """
+    tokens = [('name_start' if position == 0 else 'name', token)
+              for position, token in enumerate(tokenize(record.get('name')))]
+    tokens += [('generic_name', token) for token in tokenize(record.get('generic_name'))]
+    for keyword in record.get('keywords') or []:
+        tokens += [('keywords', token) for token in tokenize(keyword)]
+    tokens += [('exec', token) for token in tokenize(get_executable_name(record.get('shortcut')))]
+    return tokens
+
+def get_fuzzy_score(term, text):
+    """
+    Score a fuzzy match of a search term against a piece of text: every character of the term has
+    to appear in the text in order. Matches where the characters are closer together and start
+    earlier score higher. Returns 0 if the term doesn't match.
+    """
+    position = text.find(term[0])
+    if position < 0:
+        return 0
+    start = position
+    for character in term[1:]:
+        position = text.find(character, position + 1)
+        if position < 0:
+            return 0
+    span = position - start + 1
+    return FUZZY_WEIGHT * len(term) / (span + start)
+
+class SearchIndex:
+    """
+    A search index over a list of application records. Search results are indexes into that list,
+    best match first, with ties kept in the order of the list.
+    """
+    def __init__(self, app_list):
+        self.size = len(app_list)
+        self.names = [(record.get('name') or '').casefold() for record in app_list]
+        postings = {}
+        for index, record in enumerate(app_list):
+            for field, token in get_record_tokens(record):
+                entry = postings.setdefault(token, {})
+                entry[index] = max(entry.get(index, 0), FIELD_WEIGHTS[field])
+        self.tokens = sorted(postings)
+        self.postings = [postings[token] for token in self.tokens]
+
+    def match_prefix(self, term):
+        """
+        Score every application with a token starting with the search term.
+        """
+        scores = {}
+        first = bisect_left(self.tokens, term)
+        last = bisect_left(self.tokens, term + '\U0010ffff', first)
+        for position in range(first, last):
+            bonus = EXACT_BONUS if self.tokens[position] == term else 0
+            for index, weight in self.postings[position].items():
+                scores[index] = max(scores.get(index, 0), weight + bonus)
+        return scores
+
+    def match_fuzzy(self, term):
+        """
+        Score every application whose name fuzzily matches the search term.
+        """
+        scores = {}
+        for index, name in enumerate(self.names):
+            score = get_fuzzy_score(term, name)
+            if score:
+                scores[index] = score
+        return scores
+
+    def search(self, query):
+        """
+        Find the applications matching every word of the query. An empty query matches
+        everything, in list order.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return list(range(self.size))
+        totals = None
+        for term in terms:
+            scores = self.match_prefix(term) or self.match_fuzzy(term)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {index: totals[index] + score for index, score in scores.items()
+                          if index in totals}
+            if not totals:
+                return []
+        return sorted(totals, key=lambda index: (-totals[index], index))
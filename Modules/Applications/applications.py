@@ -5,41 +5,130 @@ and display all applications that should be presented to the user.
 
 import tkinter
 import tkinter.ttk
-from PIL import ImageTk, Image
+import tkinter.font
+import abc
+import functools
 import __main__
+import Modules.Cache.icon_cache as icon_cache
+import Modules.Cache.icon_loader as icon_loader
+import Modules.DBus.dispatcher as dispatcher
 import Modules.Elements.ui_elements as ui_elements
+import Modules.Elements.layout as layout
+import Modules.Applications.desktop_entries as desktop_entries
+import Modules.Applications.app_search as app_search
+import Modules.Applications.app_launcher as app_launcher
+
+GRID_MODES = ('virtual', 'canvas', 'widgets')
+GRID_OVERSCAN = 1
+
+def get_default_applications():
+    """
+    The built-in list of placeholder applications, used only when no desktop files could be found
+    on the system at all (for example when running on a development machine).
+    """
+    return [{'name': 'File Browser',
+             'icon': __main__.DIR_PATH + '/Modules/Applications/browser.png',
+             'shortcut': '/usr/bin/true'},
+            {'name': 'Terminal',
+             'icon': __main__.DIR_PATH + '/Modules/Applications/console.png',
+             'shortcut': '/usr/bin/true'},
+            {'name': 'Chat',
+             'icon': __main__.DIR_PATH + '/Modules/Applications/chat.png',
+             'shortcut': '/usr/bin/true'},
+            {'name': 'Games',
+             'icon': __main__.DIR_PATH + '/Modules/Applications/controller.png',
+             'shortcut': '/usr/bin/true'},
+            {'name': 'Web Browser',
+             'icon': __main__.DIR_PATH + '/Modules/Applications/internet.png',
+             'shortcut': '/usr/bin/true'},
+            {'name': 'Email',
+             'icon': __main__.DIR_PATH + '/Modules/Applications/mail.png',
+             'shortcut': '/usr/bin/true'},
+            {'name': 'Music',
+             'icon': __main__.DIR_PATH + '/Modules/Applications/music.png',
+             'shortcut': '/usr/bin/true'},
+            {'name': 'Text Editor',
+             'icon': __main__.DIR_PATH + '/Modules/Applications/notepad.png',
+             'shortcut': '/usr/bin/true'}
+            ]
 
 class IconList(tkinter.Frame): #pylint: disable=too-many-ancestors
     """
     The icon list is a frame inside of the application launcher that contains all the application
-    buttons. The icon list tries to dynamically identify the opimum number of rows and columns
-    based on the size of the screen.
+    buttons. The number of rows and columns and the button size come from the screen layout.
+    Normally the applications are discovered from the installed desktop files, but a fixed
+    app_list can be given instead (which also turns off watching for changes). The buttons are
+    built with placeholder tiles and the icons are filled in as the icon loader gets to them, those
+    of the buttons in view first.
     """
-    def __init__(self, parent):
+    def __init__(self, parent, screen_layout, app_list=None):
         super().__init__(parent)
         self.parent = parent
-        self.parent.update()
-        self.configure(background=self.parent['background'], width=self.parent['width'],
-                       height=self.parent['height'])
-        self.button_size = self.derive_button_size()
-        self.num_columns = self.get_num_columns()
+        self.screen_layout = screen_layout
+        self.configure(background=self.parent['background'], width=self.screen_layout.center_width,
+                       height=self.screen_layout.center_height)
+        self.button_size = self.screen_layout.button_size
+        self.num_columns = self.screen_layout.num_columns
         self.configure_columns(self.num_columns)
         self.application_buttons = []
+        self.watcher = None
+        self.search_query = ''
+        self.icon_size = self.screen_layout.button_image_size
+        self.placeholder = icon_loader.make_placeholder(self.icon_size)
+        self.fallback_icon = None
+        self.generation = 0
+        if app_list is None:
+            self.app_list = self.read_application_lists()
+        else:
+            self.app_list = app_list
+        self.search_index = app_search.SearchIndex(self.app_list)
+        self.shown = list(range(len(self.app_list)))
+        self.create_app_buttons()
+        self.num_rows = self.get_num_rows()
+        self.is_scroll_needed()
+        if app_list is None:
+            self.bind('<<applications_update>>', self.reload_applications)
+            self.watcher = desktop_entries.DesktopEntryWatcher(self.applications_changed)
+
+    def applications_changed(self):
+        """
+        This is called from the DBus thread by the desktop entry watcher whenever the installed
+        applications change, so the update is handed over to the main thread.
+        """
+        dispatcher.post(self.event_generate, '<<applications_update>>')
+
+    def reload_applications(self, event=None): #pylint: disable=unused-argument
+        """
+        Throw away the existing application buttons and build them again from the (incrementally
+        updated) application list.
+        """
+        for button in self.application_buttons:
+            button.destroy()
+        self.application_buttons = []
+        self.generation += 1
         self.app_list = self.read_application_lists()
+        self.search_index = app_search.SearchIndex(self.app_list)
+        self.shown = self.search_index.search(self.search_query)
         self.create_app_buttons()
         self.num_rows = self.get_num_rows()
         self.is_scroll_needed()
-        self.update()
+
+    def filter_applications(self, query):
+        """
+        Only show the applications matching a search query, best match first. The buttons are
+        kept and just gridded again in their new order.
+        """
+        self.search_query = query
+        self.shown = self.search_index.search(query)
+        self.grid_app_buttons()
+        self.num_rows = self.get_num_rows()
+        self.is_scroll_needed()
 
     def get_num_rows(self):
         """
-        Get the number of rows by finding the maximum row number in the active application buttons.
+        Get the number of rows needed to hold all the application buttons being shown.
         """
-        num_rows = 0
-        for button in self.application_buttons:
-            if button.grid_info()['row'] > num_rows:
-                num_rows = button.grid_info()['row']
-        return num_rows + 1
+        return max(1, -(-len(self.shown) // self.num_columns))
 
     def is_scroll_needed(self):
         """
@@ -51,14 +140,6 @@ class IconList(tkinter.Frame): #pylint: disable=too-many-ancestors
         else:
             self.scroll_needed = False
 
-    def get_num_columns(self):
-        """
-        Based on the image size determine how many columns we should have for application buttons.
-        """
-        remainder = self['width'] % self.button_size
-        intermediate_size = self['width'] - remainder
-        return int(intermediate_size / self.button_size)
-
     def configure_columns(self, num_columns):
         """
         Iterate over the columns to make sure they expand properly to fill the display space.
@@ -68,89 +149,655 @@ class IconList(tkinter.Frame): #pylint: disable=too-many-ancestors
 
     def read_application_lists(self):
         """
-        This is a half-complete function that is designed to load application icons. This
-        hard-codes the values today, but in the future we will search through a directory
-        for *.desktop files.
-        """
-        icon_size = (int(self.button_size/16) * 12)
-        app_list = [{'name': 'File Browser',
-                     'icon': __main__.DIR_PATH + '/Modules/Applications/browser.png',
-                     'shortcut': '/usr/bin/true'},
-                    {'name': 'Terminal',
-                     'icon': __main__.DIR_PATH + '/Modules/Applications/console.png',
-                     'shortcut': '/usr/bin/true'},
-                    {'name': 'Chat',
-                     'icon': __main__.DIR_PATH + '/Modules/Applications/chat.png',
-                     'shortcut': '/usr/bin/true'},
-                    {'name': 'Games',
-                     'icon': __main__.DIR_PATH + '/Modules/Applications/controller.png',
-                     'shortcut': '/usr/bin/true'},
-                    {'name': 'Web Browser',
-                     'icon': __main__.DIR_PATH + '/Modules/Applications/internet.png',
-                     'shortcut': '/usr/bin/true'},
-                    {'name': 'Email',
-                     'icon': __main__.DIR_PATH + '/Modules/Applications/mail.png',
-                     'shortcut': '/usr/bin/true'},
-                    {'name': 'Music',
-                     'icon': __main__.DIR_PATH + '/Modules/Applications/music.png',
-                     'shortcut': '/usr/bin/true'},
-                    {'name': 'Text Editor',
-                     'icon': __main__.DIR_PATH + '/Modules/Applications/notepad.png',
-                     'shortcut': '/usr/bin/true'}
-                    ]
-        for record in app_list:
-            record['image_blob'] = \
-                ImageTk.PhotoImage(Image.open(record['icon']).convert('RGBA').resize((icon_size,
-                                                                                      icon_size)))
+        Load the installed applications from their desktop files. If no desktop files can be found
+        at all fall back to the built-in placeholder list.
+        """
+        app_list = desktop_entries.load_applications(self.screen_layout.button_image_size)
+        if not app_list:
+            app_list = get_default_applications()
         return app_list
 
+    def get_fallback_icon(self):
+        """
+        The generic application icon, for any application whose own icon can't be loaded.
+        """
+        if self.fallback_icon is None:
+            self.fallback_icon = icon_cache.load_icon(__main__.DIR_PATH + \
+                "/Modules/Launcher/app.png", self.icon_size)
+        return self.fallback_icon
+
+    def request_application_icons(self):
+        """
+        Ask the icon loader for the icon of every application, those of the buttons in view on
+        the first screen first.
+        """
+        visible_rows = -(-self.screen_layout.center_height // self.button_size)
+        for position, index in enumerate(self.shown + sorted(set(range(len(self.app_list))) -
+                                                             set(self.shown))):
+            record = self.app_list[index]
+            if 'image_blob' in record:
+                continue
+            if not record.get('icon'):
+                self.icon_loaded(self.generation, index, None)
+                continue
+            priority = icon_loader.VISIBLE if position < visible_rows * self.num_columns \
+                else icon_loader.OFFSCREEN
+            icon_loader.ICON_LOADER.request(record['icon'], self.icon_size,
+                                            functools.partial(self.icon_loaded, self.generation,
+                                                              index), priority)
+
+    def icon_loaded(self, generation, index, icon):
+        """
+        Called by the icon loader (on the Tk thread) with an application's icon, or with None if
+        it couldn't be loaded.
+        """
+        if generation != self.generation:
+            return
+        self.app_list[index]['image_blob'] = icon if icon is not None else self.get_fallback_icon()
+        self.application_buttons[index].set_icon(self.app_list[index]['image_blob'])
+
     def create_app_buttons(self):
         """
-        For the list of given applications create app buttons for them (including deriving the
-        necessary padding).
+        For the list of given applications create app buttons for them, showing placeholder tiles
+        until their icons have been loaded.
         """
-        x_padding = int((self['width'] % self.button_size) / self.num_columns / 2)
-        current_column = 0
-        current_row = 0
         for application in self.app_list:
-            self.application_buttons.append(ui_elements.AppButton(self, application['image_blob'],
-                                                                  application['name'],
-                                                                  self.button_size))
-        for application_button in self.application_buttons:
-            if current_column > self.num_columns - 1:
-                current_column = 0
-                current_row += 1
-            application_button.grid(column=current_column, row=current_row, ipadx=x_padding)
-            current_column += 1
+            self.application_buttons.append(ui_elements.AppButton(
+                self, application.get('image_blob', self.placeholder), application['name'],
+                self.button_size, command=functools.partial(app_launcher.launch, application)))
+        self.grid_app_buttons()
+        self.request_application_icons()
+
+    def grid_app_buttons(self):
+        """
+        Grid the buttons of the applications being shown in order (including deriving the
+        necessary padding), and take any others off the grid.
+        """
+        x_padding = self.screen_layout.x_padding
+        shown = set(self.shown)
+        for index, application_button in enumerate(self.application_buttons):
+            if index not in shown:
+                application_button.grid_remove()
+        for position, index in enumerate(self.shown):
+            current_row, current_column = divmod(position, self.num_columns)
+            self.application_buttons[index].grid(column=current_column, row=current_row,
+                                                 ipadx=x_padding)
+
+class ApplicationGrid(abc.ABC):
+    """
+    The base class for the application grids that draw straight onto the canvas of the
+    ApplicationsFrame rather than being a frame inside it. It keeps the application list (watching
+    for changes to it unless a fixed app_list is given) and its search index, and asks the icon
+    loader for icons as they are needed, showing a placeholder tile until they arrive. The
+    applications being shown (all of them, unless a search is narrowing them down) are
+    listed in order in shown, as indexes into the application list. Subclasses build and throw
+    away whatever they draw with create_app_buttons and destroy_app_buttons, rearrange it when the
+    applications being shown change with show_filtered, fill in the part of the grid in view with
+    update_visible and put a loaded icon in place with show_icon.
+    """
+    def __init__(self, canvas, screen_layout, app_list=None):
+        self.canvas = canvas
+        self.screen_layout = screen_layout
+        self.button_size = self.screen_layout.button_size
+        self.num_columns = self.screen_layout.num_columns
+        self.column_width = self.screen_layout.center_width / self.num_columns
+        self.icon_size = self.screen_layout.button_image_size
+        self.placeholder = icon_loader.make_placeholder(self.icon_size)
+        self.fallback_icon = None
+        self.icons = {}
+        self.icon_requests = {}
+        self.generation = 0
+        self.watcher = None
+        self.search_query = ''
+        if app_list is None:
+            self.app_list = self.read_application_lists()
+        else:
+            self.app_list = app_list
+        self.search_index = app_search.SearchIndex(self.app_list)
+        self.shown = list(range(len(self.app_list)))
+
+    def watch_applications(self):
+        """
+        Start watching the desktop files for changes. Subclasses call this once they're built.
+        """
+        self.watcher = desktop_entries.DesktopEntryWatcher(self.applications_changed)
 
-    def derive_button_size(self):
+    def applications_changed(self):
         """
-        Based on the size of the parent window, determine the optimal button size.
+        This is called from the DBus thread by the desktop entry watcher whenever the installed
+        applications change, so the update is handed over to the main thread.
         """
-        intermediate_size = (self['height'] -(self['height'] % 16)) / 16
-        button_size = ((intermediate_size - (intermediate_size % 2)) / 2) * 16
-        return int(button_size)
+        dispatcher.post(self.reload_applications)
+
+    def reload_applications(self):
+        """
+        Rebuild the grid from the (incrementally updated) application list, and let the frame
+        holding us know with an <<applications_update>> event on the canvas.
+        """
+        self.app_list = self.read_application_lists()
+        self.search_index = app_search.SearchIndex(self.app_list)
+        self.shown = list(range(len(self.app_list)))
+        self.destroy_app_buttons()
+        self.forget_icons()
+        self.create_app_buttons()
+        if self.search_query:
+            self.filter_applications(self.search_query)
+        self.canvas.event_generate('<<applications_update>>')
+
+    def filter_applications(self, query):
+        """
+        Only show the applications matching a search query, best match first, and scroll back to
+        the top.
+        """
+        self.search_query = query
+        self.shown = self.search_index.search(query)
+        self.show_filtered()
+        self.set_scroll_region()
+        self.canvas.yview_moveto(0)
+        self.update_visible()
+
+    def read_application_lists(self):
+        """
+        Load the installed applications from their desktop files. Icons are only loaded when an
+        application is shown.
+        """
+        app_list = desktop_entries.load_applications(self.screen_layout.button_image_size)
+        if not app_list:
+            app_list = get_default_applications()
+        return app_list
+
+    def get_fallback_icon(self):
+        """
+        The generic application icon, for any application whose own icon can't be loaded.
+        """
+        if self.fallback_icon is None:
+            self.fallback_icon = icon_cache.load_icon(__main__.DIR_PATH + \
+                "/Modules/Launcher/app.png", self.icon_size)
+        return self.fallback_icon
+
+    def get_icon(self, index):
+        """
+        Get the icon of an application if it has been loaded, or the placeholder tile if not.
+        """
+        return self.icons.get(index, self.placeholder)
+
+    def request_icon(self, index, priority):
+        """
+        Ask the icon loader for the icon of an application, unless it's already loaded. Asking
+        again with a higher priority moves it up the queue.
+        """
+        if index in self.icons:
+            return
+        record = self.app_list[index]
+        if not record.get('icon'):
+            self.icons[index] = self.get_fallback_icon()
+            self.show_icon(index, self.icons[index])
+            return
+        callback = self.icon_requests.get(index)
+        if callback is None:
+            callback = self.icon_requests[index] = functools.partial(self.icon_loaded,
+                                                                     self.generation, index)
+        icon_loader.ICON_LOADER.request(record['icon'], self.icon_size, callback, priority)
+
+    def forget_icon(self, index):
+        """
+        Drop the icon of an application, or withdraw the request for it if it isn't loaded yet.
+        """
+        self.icons.pop(index, None)
+        callback = self.icon_requests.pop(index, None)
+        if callback is not None:
+            icon_loader.ICON_LOADER.cancel(self.app_list[index]['icon'], self.icon_size, callback)
+
+    def forget_icons(self):
+        """
+        Drop every icon and withdraw every request, before the application list is replaced.
+        """
+        for index in list(self.icon_requests):
+            self.forget_icon(index)
+        self.icons = {}
+        self.generation += 1
+
+    def icon_loaded(self, generation, index, icon):
+        """
+        Called by the icon loader (on the Tk thread) with an application's icon, or with None if
+        it couldn't be loaded. Icons that were asked for and then forgotten are thrown away.
+        """
+        if generation != self.generation or self.icon_requests.pop(index, None) is None:
+            return
+        self.icons[index] = icon if icon is not None else self.get_fallback_icon()
+        self.show_icon(index, self.icons[index])
+
+    def get_num_rows(self):
+        """
+        Get the number of rows needed to hold all the applications being shown.
+        """
+        return max(1, -(-len(self.shown) // self.num_columns))
+
+    def get_grid_height(self):
+        """
+        The height of the whole grid, most of which is normally off screen.
+        """
+        return self.get_num_rows() * self.button_size
+
+    def get_cell_position(self, position):
+        """
+        Get the canvas coordinates of the top left corner of a grid cell, by its position in the
+        grid.
+        """
+        row, column = divmod(position, self.num_columns)
+        return int(column * self.column_width), row * self.button_size
+
+    def get_visible_rows(self, overscan):
+        """
+        Get the range of grid rows in view on the canvas, with overscan rows added either side.
+        """
+        top = self.canvas.canvasy(0)
+        first_row = max(0, int(top // self.button_size) - overscan)
+        last_row = int((top + self.screen_layout.center_height) // self.button_size) + overscan
+        return first_row, min(last_row, self.get_num_rows() - 1)
+
+    @property
+    def scroll_needed(self):
+        """
+        Whether the grid is taller than the canvas, in which case the scroll bar is drawn.
+        """
+        return self.get_grid_height() > self.screen_layout.center_height
+
+    def set_scroll_region(self):
+        """
+        Set the scroll region of the canvas to the size of the whole grid.
+        """
+        self.canvas.config(scrollregion=(0, 0, self.screen_layout.center_width,
+                                         self.get_grid_height()))
+
+    @abc.abstractmethod
+    def create_app_buttons(self):
+        """
+        Draw the grid.
+        """
+
+    @abc.abstractmethod
+    def destroy_app_buttons(self):
+        """
+        Throw away everything drawn for the grid.
+        """
+
+    @abc.abstractmethod
+    def show_filtered(self):
+        """
+        Rearrange the grid to show the applications now listed in shown.
+        """
+
+    @abc.abstractmethod
+    def show_icon(self, index, icon):
+        """
+        Put the icon of an application in place of its placeholder, if it's still being drawn.
+        """
+
+    @abc.abstractmethod
+    def update_visible(self):
+        """
+        Make sure the part of the grid in view is drawn. This is called whenever the canvas
+        scrolls.
+        """
+
+class VirtualIconList(ApplicationGrid):
+    """
+    The virtual icon list shows the same grid of application buttons as the IconList, but only
+    builds enough buttons to fill the rows visible on the canvas plus a few rows of overscan. As
+    the canvas scrolls, rows that leave the view are moved to the rows coming into view and shown
+    with a different application, so the number of buttons (and of loaded icons) stays the same
+    however many applications are installed. Each row of buttons always shows grid rows with the
+    same remainder modulo the number of rows of buttons, so scrolling by one row only changes one
+    row of buttons. Icons are only asked for while their application is bound to a button (those
+    in view first), and are dropped again once it isn't.
+    """
+    def __init__(self, canvas, screen_layout, app_list=None, overscan=GRID_OVERSCAN):
+        super().__init__(canvas, screen_layout, app_list)
+        self.overscan = overscan
+        self.button_rows = []
+        self.bound_rows = []
+        self.bound_buttons = {}
+        self.create_app_buttons()
+        if app_list is None:
+            self.watch_applications()
+
+    def create_app_buttons(self):
+        """
+        Build the rows of buttons that are recycled as the canvas scrolls, and set the scroll
+        region to the size of the whole grid.
+        """
+        visible_rows = -(-self.screen_layout.center_height // self.button_size) + 1
+        num_button_rows = min(max(1, -(-len(self.app_list) // self.num_columns)),
+                              visible_rows + (self.overscan * 2))
+        for _ in range(num_button_rows):
+            row = []
+            for _ in range(self.num_columns):
+                button = ui_elements.AppButton(self.canvas, None, '', self.button_size)
+                item = self.canvas.create_window(0, 0, window=button, anchor="nw",
+                                                 state="hidden")
+                row.append((button, item))
+            self.button_rows.append(row)
+            self.bound_rows.append(None)
+        self.set_scroll_region()
+        self.update_visible()
+
+    def destroy_app_buttons(self):
+        """
+        Throw away all the buttons.
+        """
+        for row in self.button_rows:
+            for button, item in row:
+                self.canvas.delete(item)
+                button.destroy()
+        self.button_rows = []
+        self.bound_rows = []
+        self.bound_buttons = {}
+
+    def update_visible(self):
+        """
+        Make sure the rows in view (and the overscan around them) are showing the right
+        applications.
+        """
+        num_button_rows = len(self.button_rows)
+        if num_button_rows == 0:
+            return
+        first_row = max(0, min(self.get_visible_rows(self.overscan)[0],
+                               self.get_num_rows() - num_button_rows))
+        for grid_row in range(first_row, first_row + num_button_rows):
+            button_row = grid_row % num_button_rows
+            if self.bound_rows[button_row] != grid_row:
+                self.bind_row(button_row, grid_row)
+        first_row, last_row = self.get_visible_rows(0)
+        for index in self.shown[first_row * self.num_columns:(last_row + 1) * self.num_columns]:
+            self.request_icon(index, icon_loader.VISIBLE)
+
+    def show_filtered(self):
+        """
+        Forget which rows the buttons are showing, so update_visible binds them all again.
+        """
+        self.bound_rows = [None] * len(self.button_rows)
+
+    def bind_row(self, button_row, grid_row):
+        """
+        Show a grid row of applications on a row of buttons, hiding any buttons past the end of
+        the applications being shown. The icons of the applications the buttons were showing
+        before are dropped, both by the grid and by the buttons, which keep the icon they show.
+        """
+        self.bound_rows[button_row] = grid_row
+        for column, (button, item) in enumerate(self.button_rows[button_row]):
+            position = (grid_row * self.num_columns) + column
+            index = self.shown[position] if position < len(self.shown) else None
+            self.unbind_button(button, index)
+            if index is None:
+                button.set_icon(self.placeholder)
+                self.canvas.itemconfigure(item, state="hidden")
+                continue
+            self.bound_buttons[index] = button
+            button.set_application(self.get_icon(index), self.app_list[index]['name'],
+                                   functools.partial(app_launcher.launch, self.app_list[index]))
+            self.request_icon(index, icon_loader.OVERSCAN)
+            self.canvas.coords(item, *self.get_cell_position(position))
+            self.canvas.itemconfigure(item, width=int(self.column_width), state="normal")
+
+    def unbind_button(self, button, keep=None):
+        """
+        Forget the application a button was showing, along with its icon, unless it's the
+        application the button is about to show again.
+        """
+        for index, bound_button in self.bound_buttons.items():
+            if bound_button is button:
+                if index != keep:
+                    del self.bound_buttons[index]
+                    self.forget_icon(index)
+                return
+
+    def show_icon(self, index, icon):
+        """
+        Show a loaded icon on the button bound to its application.
+        """
+        button = self.bound_buttons.get(index)
+        if button is not None:
+            button.set_icon(icon)
+
+class CanvasIconList(ApplicationGrid):
+    """
+    The canvas icon list draws each application as canvas items rather than as a tree of widgets:
+    a rectangle the size of its grid cell (so the whole cell can be clicked), an image item for the
+    icon and a text item for its name. Every item is tagged "app" and "app-<index>", one binding on
+    the "app" tag handles clicks on any of them, and the index tag tells us which application was
+    clicked. Scrolling is then just the canvas moving its items, and filtering hides the items of
+    the applications that don't match and moves the rest to their new grid cells. Every
+    application starts out with a placeholder tile; the icons in view are asked for first, then
+    the rest of them in the background, and are kept once loaded.
+    """
+    def __init__(self, canvas, screen_layout, app_list=None, overscan=GRID_OVERSCAN, #pylint: disable=too-many-arguments
+                 command=None):
+        super().__init__(canvas, screen_layout, app_list)
+        self.overscan = overscan
+        self.command = command
+        self.image_height = layout.get_button_image_size(self.button_size)
+        self.label_height = layout.get_button_label_size(self.button_size)
+        self.font = tkinter.font.Font(root=self.canvas, family="default",
+                                      size=layout.get_button_font_size(self.label_height))
+        self.image_items = []
+        self.positions = []
+        self.create_app_buttons()
+        self.canvas.tag_bind('app', '<ButtonRelease-1>', self.clicked)
+        if app_list is None:
+            self.watch_applications()
+
+    def fit_text(self, text):
+        """
+        Shorten an application name with an ellipsis until it fits the width of a grid cell.
+        """
+        width = int(self.column_width) - 4
+        if self.font.measure(text) <= width:
+            return text
+        while text and self.font.measure(text + "\u2026") > width:
+            text = text[:-1]
+        return text + "\u2026"
+
+    def create_app_buttons(self):
+        """
+        Draw every application with a placeholder in place of its icon, set the scroll region to
+        the size of the whole grid and ask for the icons, those in view first.
+        """
+        background = self.canvas['background']
+        for index, record in enumerate(self.app_list):
+            x_position, y_position = self.get_cell_position(index)
+            self.positions.append(index)
+            tags = ('app', 'app-%d' % index)
+            self.canvas.create_rectangle(x_position, y_position,
+                                         x_position + int(self.column_width),
+                                         y_position + self.button_size, fill=background,
+                                         outline='', tags=tags)
+            self.image_items.append(self.canvas.create_image(
+                x_position + int(self.column_width / 2), y_position + int(self.image_height / 2),
+                anchor="center", image=self.placeholder, tags=tags))
+            self.canvas.create_text(x_position + int(self.column_width / 2),
+                                    y_position + self.image_height + int(self.label_height / 2),
+                                    anchor="center", text=self.fit_text(record['name']),
+                                    fill="white", font=self.font, tags=tags)
+        self.set_scroll_region()
+        self.update_visible()
+        for index in self.shown:
+            self.request_icon(index, icon_loader.OFFSCREEN)
+
+    def destroy_app_buttons(self):
+        """
+        Delete every application item from the canvas.
+        """
+        self.canvas.delete('app')
+        self.image_items = []
+        self.positions = []
+
+    def show_filtered(self):
+        """
+        Hide every application, then move the ones being shown to their new grid cells and show
+        them again.
+        """
+        self.canvas.itemconfigure('app', state="hidden")
+        for position, index in enumerate(self.shown):
+            tag = 'app-%d' % index
+            if self.positions[index] != position:
+                old_x, old_y = self.get_cell_position(self.positions[index])
+                new_x, new_y = self.get_cell_position(position)
+                self.canvas.move(tag, new_x - old_x, new_y - old_y)
+                self.positions[index] = position
+            self.canvas.itemconfigure(tag, state="normal")
+
+    def update_visible(self):
+        """
+        Move the icons of the applications in view to the front of the icon loader's queue, and
+        those in the overscan around them just behind.
+        """
+        visible_rows = self.get_visible_rows(0)
+        first_row, last_row = self.get_visible_rows(self.overscan)
+        for row in range(first_row, last_row + 1):
+            priority = icon_loader.VISIBLE if visible_rows[0] <= row <= visible_rows[1] \
+                else icon_loader.OVERSCAN
+            for index in self.shown[row * self.num_columns:(row + 1) * self.num_columns]:
+                self.request_icon(index, priority)
+
+    def show_icon(self, index, icon):
+        """
+        Put a loaded icon on the image item of its application.
+        """
+        self.canvas.itemconfigure(self.image_items[index], image=icon)
+
+    def get_clicked_index(self):
+        """
+        Find the index of the application under the pointer from its canvas tags.
+        """
+        for tag in self.canvas.gettags('current'):
+            if tag.startswith('app-'):
+                return int(tag[4:])
+        return None
+
+    def clicked(self, event): #pylint: disable=unused-argument
+        """
+        The one click binding for the whole grid.
+        """
+        index = self.get_clicked_index()
+        if index is not None and self.command is not None:
+            self.command(self.app_list[index])
 
 class ApplicationsFrame(ui_elements.LauncherFrame): #pylint: disable=too-many-ancestors, too-many-instance-attributes
     """
     The main LauncherFrame is a subclass of the AppFrame which holds a list of all the applications
-    available to be launched.
+    available to be launched. In the "virtual" grid mode (the default) the applications are shown
+    by a VirtualIconList, which only builds the buttons that are in view, in the "canvas" grid mode
+    by a CanvasIconList, which draws them as canvas items, and in the "widgets" grid mode by an
+    IconList with a button for every application. Typing while the Apps tab is showing narrows
+    the applications down to those matching what was typed, and Return launches the best match.
     """
-    def __init__(self, parent, nav_widget_size, width, height):
-        super().__init__(parent, nav_widget_size)
-        self.configure(background=self.parent['background'], width=width,
-                       height=height)
-        self.parent.update()
-        self.iconlist = IconList(self.center)
-        self.center.create_window(0, 0, window=self.iconlist, anchor="nw")
+    def __init__(self, parent, screen_layout, grid_mode=GRID_MODES[0]):
+        super().__init__(parent, screen_layout.nav_widget_size)
+        self.configure(background=self.parent['background'], width=screen_layout.frame_width,
+                       height=screen_layout.frame_height)
+        self.grid_mode = grid_mode
         self.iconscroll = tkinter.ttk.Scrollbar(self.nav_right_trough,
                                                 style="arrowless.Vertical.TScrollbar",
                                                 orient='vertical',
-                                                command=self.center.yview)
+                                                command=self.scroll_view)
+        self.center.config(yscrollcommand=self.view_changed)
+        if self.grid_mode == 'virtual':
+            self.iconlist = VirtualIconList(self.center, screen_layout)
+            self.center.bind('<<applications_update>>', self.update_scrollbar)
+        elif self.grid_mode == 'canvas':
+            self.iconlist = CanvasIconList(self.center, screen_layout,
+                                           command=app_launcher.launch)
+            self.center.bind('<<applications_update>>', self.update_scrollbar)
+        else:
+            self.iconlist = IconList(self.center, screen_layout)
+            self.center.create_window(0, 0, window=self.iconlist, anchor="nw")
+            self.iconlist.bind('<<applications_update>>', self.update_scrollbar, add='+')
+            self.iconlist.bind('<Configure>', self.update_scroll_region)
+        self.update_scrollbar()
+        self.search_query = ''
+        self.winfo_toplevel().bind('<Key>', self.key_pressed, add='+')
+
+    def key_pressed(self, event):
+        """
+        Type-to-filter. Printable characters are added to the search, BackSpace deletes the last
+        one and Escape clears the search. The search is shown in place of the tab name in the
+        menu bar. Return launches the first application shown, if there is a search.
+        """
+        if not self.winfo_ismapped():
+            return
+        if event.keysym in ('Return', 'KP_Enter'):
+            self.launch_first()
+            return
+        if event.keysym == 'Escape':
+            query = ''
+        elif event.keysym == 'BackSpace':
+            query = self.search_query[:-1]
+        elif len(event.char) == 1 and event.char.isprintable():
+            query = self.search_query + event.char
+        else:
+            return
+        self.set_search(query)
+
+    def set_search(self, query):
+        """
+        Filter the applications with a new search query.
+        """
+        if query == self.search_query:
+            return
+        self.search_query = query
+        self.iconlist.filter_applications(query)
+        self.center.yview_moveto(0)
+        self.update_scrollbar()
+        __main__.MAINAPP.menu.title.config(text=query if query else "Apps")
+
+    def clear_search(self):
+        """
+        Go back to showing every application.
+        """
+        self.set_search('')
+
+    def launch_first(self):
+        """
+        Launch the best match for the search, then clear the search.
+        """
+        if not self.search_query or not self.iconlist.shown:
+            return
+        if app_launcher.launch(self.iconlist.app_list[self.iconlist.shown[0]]):
+            self.clear_search()
+
+    def scroll_view(self, *args):
+        """
+        The scroll bar command. Scroll the canvas, and with a canvas grid fill in the rows that
+        came into view straight away rather than waiting for the canvas to redraw.
+        """
+        self.center.yview(*args)
+        if isinstance(self.iconlist, ApplicationGrid):
+            self.iconlist.update_visible()
+
+    def view_changed(self, first, last):
+        """
+        The canvas calls this whenever its view changes, however it was scrolled.
+        """
+        self.iconscroll.set(first, last)
+        if isinstance(self.iconlist, ApplicationGrid):
+            self.iconlist.update_visible()
+
+    def update_scrollbar(self, event=None): #pylint: disable=unused-argument
+        """
+        Show or hide the scrollbar depending on whether the icon list fits on the screen.
+        """
         if self.iconlist.scroll_needed:
             self.iconscroll.place(height=int(self.nav_right_trough['height']*0.8), width=8,
                                   relx=0.5, anchor="center", rely=0.5)
-            self.update()
-            self.center.config(yscrollcommand=self.iconscroll.set,
-                               scrollregion=self.center.bbox("all"))
-        self.update()
+        else:
+            self.iconscroll.place_forget()
+            self.center.yview_moveto(0)
+
+    def update_scroll_region(self, event):
+        """
+        Whenever the geometry manager settles on a new size for the icon list, update the scroll
+        region to match it. Doing this from the Configure event means we never have to force a
+        synchronous update just to find out how big the icon list ended up.
+        """
+        self.center.config(scrollregion=(0, 0, event.width, event.height))
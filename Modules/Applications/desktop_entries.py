@@ -0,0 +1,490 @@
+"""
+This module is responsible for discovering the applications installed on the system. It follows
+the XDG desktop entry spec, reading *.desktop files from the applications directories under
+XDG_DATA_HOME and XDG_DATA_DIRS. Parsing hundreds of desktop files on every start is slow on a
+PocketCHIP, so the parsed entries are kept in a compact index file that is validated against the
+directory mtimes, and only the files that actually changed get parsed again.
+"""
+
+import os
+import json
+import shutil
+import locale
+import tempfile
+import Modules.Cache.icon_cache as icon_cache
+
+try:
+    from gi.repository import Gio
+    from gi.repository import GLib
+except: #pylint: disable=bare-except
+    Gio = None
+    GLib = None
+
+INDEX_VERSION = 1
+ICON_EXTENSIONS = ('.png', '.xpm')
+WATCH_DELAY = 500
+
+def get_data_dirs():
+    """
+    Return the XDG data directories in order of precedence (the user's own directory first).
+    """
+    data_home = os.environ.get('XDG_DATA_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.local/share')
+    data_dirs = os.environ.get('XDG_DATA_DIRS') or '/usr/local/share:/usr/share'
+    return [data_home] + [path for path in data_dirs.split(':') if path]
+
+def get_application_dirs():
+    """
+    Return the applications directories that should be searched for desktop entries.
+    """
+    return [os.path.join(path, 'applications') for path in get_data_dirs()]
+
+def get_current_desktops():
+    """
+    Get the list of desktop names we consider ourselves to be for OnlyShowIn and NotShowIn.
+    """
+    return [name for name in os.environ.get('XDG_CURRENT_DESKTOP', '').split(':') if name]
+
+def get_locale_keys(key):
+    """
+    Return the localized variants of a key in the order they should be preferred, for example
+    Name[en_US], Name[en], Name.
+    """
+    try:
+        lang = locale.getlocale(locale.LC_MESSAGES)[0] or os.environ.get('LANG', '')
+    except (AttributeError, ValueError):
+        lang = os.environ.get('LANG', '')
+    lang = lang.split('.')[0].split('@')[0]
+    keys = []
+    if '_' in lang:
+        keys.append(key + '[' + lang + ']')
+    if lang:
+        keys.append(key + '[' + lang.split('_')[0] + ']')
+    keys.append(key)
+    return keys
+
+def split_list(value):
+    """
+    Split a desktop entry string list (semicolon separated) into a python list.
+    """
+    return [item for item in value.split(';') if item]
+
+def parse_desktop_file(path):
+    """
+    Parse the [Desktop Entry] group of a desktop file into a dictionary of raw keys and values.
+    Only the main group is read, actions and other groups are ignored.
+    """
+    values = {}
+    in_entry = False
+    with open(path, encoding='utf-8', errors='replace') as desktopfile:
+        for line in desktopfile:
+            line = line.strip()
+            if not line or line[0] == '#':
+                continue
+            if line[0] == '[':
+                if in_entry:
+                    break
+                in_entry = line == '[Desktop Entry]'
+                continue
+            if in_entry and '=' in line:
+                key, value = line.split('=', 1)
+                values[key.strip()] = value.strip()
+    return values
+
+def get_localized(values, key):
+    """
+    Get the best localized version of a key from a parsed desktop file.
+    """
+    for locale_key in get_locale_keys(key):
+        if locale_key in values:
+            return values[locale_key]
+    return ''
+
+def make_record(path, values):
+    """
+    Turn the raw keys of a desktop file into an application record. Entries that can never be
+    shown (wrong type, missing Exec, etc.) return None so they are still remembered in the index.
+    """
+    if values.get('Type') != 'Application' or not values.get('Exec'):
+        return None
+    name = get_localized(values, 'Name')
+    if not name:
+        return None
+    return {'name': name,
+            'generic_name': get_localized(values, 'GenericName'),
+            'keywords': split_list(get_localized(values, 'Keywords')),
+            'categories': split_list(values.get('Categories', '')),
+            'shortcut': values['Exec'],
+            'try_exec': values.get('TryExec', ''),
+            'icon_name': values.get('Icon', ''),
+            'terminal': values.get('Terminal', 'false') == 'true',
+            'no_display': values.get('NoDisplay', 'false') == 'true',
+            'hidden': values.get('Hidden', 'false') == 'true',
+            'only_show_in': split_list(values.get('OnlyShowIn', '')),
+            'not_show_in': split_list(values.get('NotShowIn', '')),
+            'desktop_file': path}
+
+def should_show(record, desktops):
+    """
+    Apply the NoDisplay, Hidden, OnlyShowIn, NotShowIn and TryExec rules to a record.
+    """
+    if record is None or record['no_display'] or record['hidden']:
+        return False
+    if record['only_show_in'] and not set(record['only_show_in']) & set(desktops):
+        return False
+    if record['not_show_in'] and set(record['not_show_in']) & set(desktops):
+        return False
+    if record['try_exec'] and shutil.which(record['try_exec']) is None:
+        return False
+    return True
+
+class IconResolver: #pylint: disable=too-few-public-methods
+    """
+    Resolve icon names from desktop files to image files on disk. Rather than probing every
+    possible path for every icon, the hicolor theme and pixmaps directories are listed once and
+    kept in a lookup table.
+    """
+    def __init__(self, icon_size):
+        self.icon_size = icon_size
+        self.icons = {}
+        for data_dir in reversed(get_data_dirs()):
+            self.add_pixmaps_dir(os.path.join(data_dir, 'pixmaps'))
+            self.add_theme_dir(os.path.join(data_dir, 'icons', 'hicolor'))
+
+    def add_icon_dir(self, path, rank):
+        """
+        Add all the icons in a directory to the lookup table, keeping the best ranked one.
+        """
+        try:
+            names = os.listdir(path)
+        except OSError:
+            return
+        for filename in names:
+            name, extension = os.path.splitext(filename)
+            if extension not in ICON_EXTENSIONS:
+                continue
+            if name not in self.icons or rank <= self.icons[name][0]:
+                self.icons[name] = (rank, os.path.join(path, filename))
+
+    def add_pixmaps_dir(self, path):
+        """
+        Pixmaps have no size information, so rank them below any themed icon.
+        """
+        self.add_icon_dir(path, 100000)
+
+    def add_theme_dir(self, path):
+        """
+        Rank themed icons so the smallest icon that is at least as big as we need wins, falling
+        back to the biggest icon that is smaller than we need.
+        """
+        try:
+            size_dirs = os.listdir(path)
+        except OSError:
+            return
+        for size_dir in size_dirs:
+            try:
+                size = int(size_dir.split('x')[0].split('@')[0])
+            except ValueError:
+                continue
+            if size >= self.icon_size:
+                rank = size - self.icon_size
+            else:
+                rank = 10000 + (self.icon_size - size)
+            self.add_icon_dir(os.path.join(path, size_dir, 'apps'), rank)
+
+    def resolve(self, icon_name):
+        """
+        Turn an Icon= value into a path on disk, or None if it can't be found.
+        """
+        if not icon_name:
+            return None
+        if os.path.isabs(icon_name):
+            return icon_name if os.path.isfile(icon_name) else None
+        name, extension = os.path.splitext(icon_name)
+        if extension not in ICON_EXTENSIONS:
+            name = icon_name
+        if name in self.icons:
+            return self.icons[name][1]
+        return None
+
+class DesktopIndex:
+    """
+    The index of all parsed desktop files. The index remembers the mtime of every applications
+    directory, and as long as a directory hasn't changed none of its files are looked at again.
+    If a directory has changed, only the files in it with a new mtime get parsed again.
+    """
+    def __init__(self, icon_size):
+        self.icon_size = icon_size
+        self.index_path = None
+        cache_dir = icon_cache.get_cache_dir('applications')
+        if cache_dir:
+            self.index_path = os.path.join(cache_dir, 'index.json')
+        self.dirs = {}
+        self.files = {}
+        self.dirty = False
+        self.read_index()
+
+    def read_index(self):
+        """
+        Read the index file from the cache directory. A missing or mismatched index just means
+        we start from scratch.
+        """
+        if self.index_path is None:
+            return
+        try:
+            with open(self.index_path, encoding='utf-8') as indexfile:
+                index = json.load(indexfile)
+        except (OSError, ValueError):
+            return
+        if index.get('version') != INDEX_VERSION or index.get('icon_size') != self.icon_size:
+            return
+        self.dirs = index.get('dirs', {})
+        self.files = index.get('files', {})
+
+    def write_index(self):
+        """
+        Write the index file back out if anything in it changed.
+        """
+        if self.index_path is None or not self.dirty:
+            return
+        index = {'version': INDEX_VERSION, 'icon_size': self.icon_size, 'dirs': self.dirs,
+                 'files': self.files}
+        try:
+            handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.index_path),
+                                                 suffix='.tmp')
+            with os.fdopen(handle, 'w', encoding='utf-8') as indexfile:
+                json.dump(index, indexfile, separators=(',', ':'))
+            os.replace(temp_path, self.index_path)
+        except OSError:
+            return
+        self.dirty = False
+
+    def scan_dir(self, path, prefix, entries, seen_dirs):
+        """
+        Collect the records of all desktop files in a directory (and its subdirectories) into the
+        entries dictionary, keyed by desktop file ID.
+        """
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return
+        seen_dirs.add(path)
+        if path in self.dirs and self.dirs[path][0] == mtime:
+            filenames, subdirs = self.dirs[path][1], self.dirs[path][2]
+        else:
+            filenames, subdirs = self.list_dir(path)
+            self.dirs[path] = [mtime, filenames, subdirs]
+            self.dirty = True
+            self.forget_removed_files(path, filenames)
+            for filename in filenames:
+                self.refresh_file(os.path.join(path, filename))
+        for filename in filenames:
+            desktop_id = prefix + filename
+            file_path = os.path.join(path, filename)
+            if desktop_id not in entries and file_path in self.files:
+                entries[desktop_id] = self.files[file_path][1]
+        for subdir in subdirs:
+            self.scan_dir(os.path.join(path, subdir), prefix + subdir + '-', entries, seen_dirs)
+
+    def forget_removed_files(self, path, filenames):
+        """
+        Drop the index entries of the desktop files that are gone from a directory that was
+        listed again, such as those of an application that was uninstalled.
+        """
+        listed = {os.path.join(path, filename) for filename in filenames}
+        for file_path in [file_path for file_path in self.files
+                          if os.path.dirname(file_path) == path and file_path not in listed]:
+            del self.files[file_path]
+            self.dirty = True
+
+    def list_dir(self, path): #pylint: disable=no-self-use
+        """
+        List the desktop files and subdirectories of a directory.
+        """
+        filenames = []
+        subdirs = []
+        try:
+            for entry in os.scandir(path):
+                if entry.is_dir():
+                    subdirs.append(entry.name)
+                elif entry.name.endswith('.desktop'):
+                    filenames.append(entry.name)
+        except OSError:
+            pass
+        return sorted(filenames), sorted(subdirs)
+
+    def refresh_file(self, path):
+        """
+        Parse a desktop file again, but only if its mtime differs from what is in the index.
+        """
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self.files.pop(path, None)
+            return
+        if path in self.files and self.files[path][0] == mtime:
+            return
+        try:
+            record = make_record(path, parse_desktop_file(path))
+        except OSError:
+            record = None
+        self.files[path] = [mtime, record]
+        self.dirty = True
+
+    def resolve_icons(self, entries):
+        """
+        Make sure every record has a resolved icon path. Icons are resolved once and remembered
+        in the index, only resolving again if the remembered file disappears. Icons we couldn't
+        find at all are remembered as None so we don't go looking for them on every start.
+        """
+        resolver = None
+        for record in entries.values():
+            if record is None or 'icon' in record and (record['icon'] is None or
+                                                       os.path.isfile(record['icon'])):
+                continue
+            if resolver is None:
+                resolver = IconResolver(self.icon_size)
+            record['icon'] = resolver.resolve(record['icon_name'])
+            self.dirty = True
+
+    def forget_missing(self, seen_dirs):
+        """
+        Drop index entries for directories that no longer exist.
+        """
+        for path in list(self.dirs):
+            if path not in seen_dirs:
+                del self.dirs[path]
+                self.dirty = True
+        for path in list(self.files):
+            if os.path.dirname(path) not in self.dirs:
+                del self.files[path]
+                self.dirty = True
+
+    def load(self):
+        """
+        Bring the index up to date with the disk and return the visible application records,
+        sorted by name.
+        """
+        entries = {}
+        seen_dirs = set()
+        for path in get_application_dirs():
+            self.scan_dir(path, '', entries, seen_dirs)
+        self.forget_missing(seen_dirs)
+        self.resolve_icons(entries)
+        self.write_index()
+        desktops = get_current_desktops()
+        records = []
+        for desktop_id, record in entries.items():
+            if should_show(record, desktops):
+                records.append(dict(record, desktop_id=desktop_id))
+        records.sort(key=lambda record: record['name'].casefold())
+        return records
+
+def load_applications(icon_size):
+    """
+    Load the list of applications to display, using (and updating) the on-disk index.
+    """
+    return DesktopIndex(icon_size).load()
+
+class DesktopEntryWatcher:
+    """
+    Watch the applications directories for changes (such as a package being installed or
+    removed) and call back once things settle down. This uses GIO file monitors, which are backed
+    by inotify and dispatched on the GLib main loop, so the callback runs on the DBus thread.
+
+    A directory monitor only sees its own directory, so every subdirectory is watched as well.
+    An applications directory that doesn't exist yet (~/.local/share/applications often doesn't
+    until something is installed there) is watched through its nearest parent that does. Once
+    things settle the monitors are brought up to date with the directories that were created or
+    removed in the meantime.
+    """
+    def __init__(self, callback):
+        self.callback = callback
+        self.monitors = {}
+        self.pending = None
+        self.apps_changed = False
+        if Gio is None:
+            return
+        self.update_monitors()
+
+    def get_watched_dirs(self): #pylint: disable=no-self-use
+        """
+        List the directories to watch: the applications directories and their subdirectories,
+        and the nearest existing parent of each applications directory that doesn't exist.
+        """
+        watched = set()
+        for path in get_application_dirs():
+            if os.path.isdir(path):
+                for dirpath, _, _ in os.walk(path, followlinks=True):
+                    watched.add(dirpath)
+                continue
+            parent = os.path.dirname(path)
+            while not os.path.isdir(parent) and parent != os.path.dirname(parent):
+                parent = os.path.dirname(parent)
+            if os.path.isdir(parent):
+                watched.add(parent)
+        return watched
+
+    def update_monitors(self):
+        """
+        Add monitors for the directories that should be watched and aren't yet, and cancel those
+        of the directories that shouldn't be any more. Returns whether an applications directory
+        (or a subdirectory) is watched now that wasn't before, as it may already hold entries
+        that were added before its monitor was.
+        """
+        added = False
+        watched = self.get_watched_dirs()
+        for path in [path for path in self.monitors if path not in watched]:
+            self.monitors.pop(path).cancel()
+        for path in watched:
+            if path in self.monitors:
+                continue
+            try:
+                monitor = Gio.File.new_for_path(path).monitor_directory(
+                    Gio.FileMonitorFlags.NONE, None)
+            except: #pylint: disable=bare-except
+                continue
+            monitor.connect('changed', self.changed)
+            self.monitors[path] = monitor
+            added = added or self.is_application_path(path)
+        return added
+
+    def is_application_path(self, path): #pylint: disable=no-self-use
+        """
+        Whether a path is an applications directory or inside one.
+        """
+        return any(path == apps_dir or path.startswith(apps_dir + os.sep)
+                   for apps_dir in get_application_dirs())
+
+    def changed(self, monitor, changed_file, other_file, event_type): #pylint: disable=unused-argument
+        """
+        Installing a package touches lots of files at once, so wait until things have been quiet
+        for a moment before calling back. The parents watched for a missing applications
+        directory see all sorts of changes, and those only matter to the monitors.
+        """
+        path = changed_file.get_path()
+        if path is not None and self.is_application_path(path):
+            self.apps_changed = True
+        if self.pending is not None:
+            GLib.source_remove(self.pending)
+        self.pending = GLib.timeout_add(WATCH_DELAY, self.settled)
+
+    def settled(self):
+        """
+        Called once the watched directories have been quiet for WATCH_DELAY milliseconds.
+        """
+        self.pending = None
+        if self.update_monitors():
+            self.apps_changed = True
+        if self.apps_changed:
+            self.apps_changed = False
+            self.callback()
+        return False
+
+    def stop(self):
+        """
+        Stop watching the applications directories.
+        """
+        for monitor in self.monitors.values():
+            monitor.cancel()
+        self.monitors = {}
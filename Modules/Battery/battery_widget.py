@@ -3,47 +3,28 @@ The purpose of this module is to manage drawing the menubar widget for the wirel
 """
 
 import tkinter
-from multiprocessing import Value
-import dbus
-from PIL import ImageTk, Image
 import Modules.DBus.dbus_main as dbus_main
+import Modules.DBus.dispatcher as dispatcher
+import Modules.Cache.icon_cache as icon_cache
+import Modules.Status.status_model as status_model
+import Modules.Profiling.metrics as metrics
 import __main__
 
-def check_battery():
-    """
-    This function is to check for the presense of a battery and return true if one is found. This
-    function runs outside of the class because that seemed to interfere with the threading.
-    """
-    proxy = dbus_main.DBUS_BUS.get_object('org.freedesktop.UPower',
-                                          '/org/freedesktop/UPower/devices/DisplayDevice')
-    powerdev = dbus.Interface(proxy, 'org.freedesktop.DBus.Properties')
-    return bool(powerdev.Get('org.freedesktop.UPower.Device', 'IsPresent'))
+UPOWER_BUS = 'org.freedesktop.UPower'
+UPOWER_DEVICE = 'org.freedesktop.UPower.Device'
+DISPLAY_DEVICE = '/org/freedesktop/UPower/devices/DisplayDevice'
 
-def get_battery_details(charging, capacity):
+def probe_battery(reply_handler, error_handler):
     """
-    This function is to check the battery capacity and charge state on initial widget load. Like
-    the function above it this was excluded from the class because it interfered with the
-    threading of the dbus mainloop function.
+    Start looking for a battery without blocking. The display device is fetched into the shared
+    property cache with a single asynchronous GetAll, and the reply handler is given its properties
+    (normally on the DBus thread) once UPower answers. The error handler is called if UPower isn't
+    there or doesn't answer within its probe timeout.
     """
-    proxy = dbus_main.DBUS_BUS.get_object('org.freedesktop.UPower',
-                                          '/org/freedesktop/UPower/devices/DisplayDevice')
-    getmanager = dbus.Interface(proxy, 'org.freedesktop.DBus.Properties')
-    update_battery = False
-    try:
-        new_capacity = int(getmanager.Get('org.freedesktop.UPower.Device', 'Percentage'))
-        if new_capacity != capacity.value:
-            capacity.value = new_capacity
-            update_battery = True
-        new_status = int(getmanager.Get('org.freedesktop.UPower.Device', 'State'))
-        if new_status != charging.value:
-            charging.value = new_status
-            update_battery = True
-    except: #pylint: disable=bare-except
-        print("Error reading battery")
-    if update_battery is True:
-        update_battery = False
+    dbus_main.PROPERTY_CACHE.watch_async(UPOWER_BUS, DISPLAY_DEVICE, UPOWER_DEVICE, reply_handler,
+                                         error_handler, dbus_main.get_probe_timeout(UPOWER_BUS))
 
-class BatteryIcon(tkinter.Label): #pylint: disable=too-many-ancestors
+class BatteryIcon(tkinter.Label): #pylint: disable=too-many-ancestors, too-many-instance-attributes
     """
     This is the class for handling the battery icon. It loads all the images and cycles through
     which ones to display based on the battery level.
@@ -58,82 +39,127 @@ class BatteryIcon(tkinter.Label): #pylint: disable=too-many-ancestors
         self.configure(height=self.widget_size)
         self.configure(background=parent['background'])
         self.load_images()
-        self.battery_capacity = Value('i', 100)
-        self.battery_charging = Value('i', 1)
-        self.present = check_battery()
-        if self.present is True:
-            get_battery_details(self.battery_charging, self.battery_capacity)
-            self.bind('<<battery_update>>', self.select_image)
-            self.select_image()
-            dbus_main.DBUS_BUS.add_signal_receiver(self.dbus_signal_handler,
-                                                   bus_name='org.freedesktop.UPower',
-                                                   dbus_interface=\
-                                                   'org.freedesktop.DBus.Properties',
-                                                   signal_name='PropertiesChanged',
-                                                   path=\
-                                                   '/org/freedesktop/UPower/devices/DisplayDevice')
+        self.status = status_model.BatteryStatus()
+        self.status.subscribe(self.status_changed)
+        self.missing = False
+        self.subscribed = False
+        self.shown_image = None
+        self.select_image()
+        dbus_main.PROPERTY_CACHE.watch_name_owner(UPOWER_BUS, self.owner_changed)
+        probe_battery(self.battery_found, self.battery_not_found)
+
+    def owner_changed(self, owner):
+        """
+        Called (on the DBus thread) when UPower starts, stops or is restarted. The battery is
+        probed again when it comes up, so the icon isn't gone for good if UPower started after
+        us or was too slow to answer the first probe.
+        """
+        if owner:
+            probe_battery(self.battery_found, self.battery_not_found)
         else:
-            raise ValueError('Battery Not Present')
-        self.update()
+            self.battery_not_found()
+
+    def battery_found(self, properties):
+        """
+        Callback for when the battery probe returns. UPower always has a display device, so it's
+        only a battery if it says it's present.
+        """
+        if not bool(properties.get('IsPresent', False)):
+            self.battery_not_found()
+            return
+        try:
+            self.status.update(capacity=int(properties.get('Percentage', 0)),
+                               charging=int(properties.get('State', 0)))
+        except: #pylint: disable=bare-except
+            print("Error reading battery")
+        self.status.update(present=True)
+        if not self.subscribed:
+            self.subscribed = True
+            dbus_main.PROPERTY_CACHE.subscribe(UPOWER_BUS, DISPLAY_DEVICE, UPOWER_DEVICE,
+                                               self.dbus_signal_handler)
+        dispatcher.post(self.show)
+
+    def battery_not_found(self, error=None): #pylint: disable=unused-argument
+        """
+        Callback for when there is no battery, or UPower didn't answer in time.
+        """
+        if 'present' in self.status.update(present=False):
+            print("Could Not Detect Battery")
+            dispatcher.post(self.hide)
+
+    def hide(self, event=None): #pylint: disable=unused-argument
+        """
+        Take the icon out of the menu bar, and make sure the menu bar doesn't put it back.
+        """
+        self.missing = True
+        self.pack_forget()
+
+    def show(self, event=None): #pylint: disable=unused-argument
+        """
+        Have the menu bar put the icon back, if it was hidden.
+        """
+        if self.missing:
+            self.missing = False
+            self.event_generate('<<StatusIconShown>>')
 
     def dbus_signal_handler(self, interface, data, signaltype): #pylint: disable=unused-argument
         """
         This is the callback for handling signals returned from DBus to get the updated battery
         status.
         """
-        update = False
-        if 'State' in data and int(data['State']) != self.battery_charging.value:
-            self.battery_charging.value = int(data['State'])
-            update = True
-        if 'Percentage' in data and int(data['Percentage']) != self.battery_capacity.value:
-            self.battery_capacity.value = int(data['Percentage'])
-            update = True
-        if update is True:
-            self.event_generate('<<battery_update>>')
-            update = False
+        changes = {}
+        if 'State' in data:
+            changes['charging'] = int(data['State'])
+        if 'Percentage' in data:
+            changes['capacity'] = int(data['Percentage'])
+        self.status.update(**changes)
+
+    def status_changed(self, status, changed): #pylint: disable=unused-argument
+        """
+        Called by the status model (normally on the DBus thread) when something we show changes.
+        """
+        dispatcher.post(self.select_image)
 
     def load_images(self):
         """
         Load the actual images and save them to the class so we don't have to keep loading them.
+        They all come out of the one battery atlas.
         """
-        self.status_images['100'] = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Battery/battery_100.png").convert('RGBA').resize((self.image_size,
-                                                                        self.image_size)))
-        self.status_images['75'] = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Battery/battery_75.png").convert('RGBA').resize((self.image_size,
-                                                                       self.image_size)))
-        self.status_images['50'] = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Battery/battery_50.png").convert('RGBA').resize((self.image_size,
-                                                                       self.image_size)))
-        self.status_images['25'] = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Battery/battery_25.png").convert('RGBA').resize((self.image_size,
-                                                                       self.image_size)))
-        self.status_images['10'] = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Battery/battery_10.png").convert('RGBA').resize((self.image_size,
-                                                                       self.image_size)))
-        self.status_images['charge'] = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Battery/battery_charge.png").convert('RGBA').resize((self.image_size,
-                                                                           self.image_size)))
+        atlas = icon_cache.SpriteAtlas(__main__.DIR_PATH + "/Modules/Battery", "battery",
+                                       "battery_")
+        for state in ('100', '75', '50', '25', '10', 'charge'):
+            self.status_images[state] = atlas.get_icon(state, self.image_size)
+        self.status_images['placeholder'] = tkinter.PhotoImage(width=self.image_size,
+                                                               height=self.image_size)
 
     def select_image(self, event=None): #pylint: disable=unused-argument
         """
-        This function is indirectly triggered by the DBus thread whenever there is a change to the
-        battery charging status or capacity detected.
+        This function is posted to the dispatcher whenever there is a change to the battery
+        charging status or capacity detected. The label is only reconfigured if the image
+        actually changes.
         """
-        if self.battery_charging.value == 1:
-            self.configure(image=self.status_images['charge'])
-            return
-        if self.battery_capacity.value > 75:
-            self.configure(image=self.status_images['100'])
-            return
-        if self.battery_capacity.value > 50:
-            self.configure(image=self.status_images['75'])
-            return
-        if self.battery_capacity.value > 25:
-            self.configure(image=self.status_images['50'])
-            return
-        if self.battery_capacity.value > 10:
-            self.configure(image=self.status_images['25'])
-            return
-        self.configure(image=self.status_images['10'])
-        return
+        name = self.get_image_name()
+        metrics.count('select_image', 'battery')
+        if name != self.shown_image:
+            metrics.count('image_swaps', 'battery')
+            self.shown_image = name
+            self.configure(image=self.status_images[name])
+
+    def get_image_name(self):
+        """
+        Work out which of the status images to show. Until the probe returns we show a blank
+        placeholder.
+        """
+        if self.status.present is not True:
+            return 'placeholder'
+        if self.status.charging == 1:
+            return 'charge'
+        if self.status.capacity > 75:
+            return '100'
+        if self.status.capacity > 50:
+            return '75'
+        if self.status.capacity > 25:
+            return '50'
+        if self.status.capacity > 10:
+            return '25'
+        return '10'
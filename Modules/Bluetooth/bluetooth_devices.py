@@ -0,0 +1,276 @@
+"""
+This module keeps the table of bluetooth adapters and devices that both the bluetooth icon and
+the paired devices panel in the settings tab are drawn from. BlueZ's object tree is fetched once,
+with a single GetManagedObjects, and from then on the table is kept current from signals alone:
+
+- InterfacesAdded and InterfacesRemoved of BlueZ's object manager, which carry the properties of
+  new objects along with them, so nothing has to be fetched when a device turns up,
+- PropertiesChanged of the adapter and device interfaces, with one match rule for each interface
+  rather than one per object.
+
+If BlueZ goes away the table is emptied, and when it comes back (or is started after us) its
+object tree is fetched once more.
+
+Only the properties we show are kept, and changes to anything else (such as the RSSI updates
+that keep coming in while discovering) are dropped without telling anyone. Listeners are called
+on the DBus thread whenever the table changed.
+"""
+
+from threading import Lock
+import dbus
+import Modules.DBus.dbus_main as dbus_main
+import Modules.Profiling.metrics as metrics
+
+BLUEZ_BUS = 'org.bluez'
+BLUEZ_ADAPTER = 'org.bluez.Adapter1'
+BLUEZ_DEVICE = 'org.bluez.Device1'
+OBJECT_MANAGER_INTERFACE = 'org.freedesktop.DBus.ObjectManager'
+PROPERTIES_INTERFACE = 'org.freedesktop.DBus.Properties'
+CALL_TIMEOUT = 30.0
+
+#The properties kept of each interface.
+KEPT_PROPERTIES = {BLUEZ_ADAPTER: ('Powered', 'Alias'),
+                   BLUEZ_DEVICE: ('Adapter', 'Alias', 'Address', 'Paired', 'Connected')}
+
+def keep_properties(interface, properties):
+    """
+    Pick out the properties we keep of an interface.
+    """
+    return {name: properties[name] for name in KEPT_PROPERTIES[interface] if name in properties}
+
+class BluetoothTable: #pylint: disable=too-many-instance-attributes
+    """
+    The bluetooth adapters and devices, by object path. Present is None until BlueZ has
+    answered, and then whether there is an adapter.
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.objects = {BLUEZ_ADAPTER: {}, BLUEZ_DEVICE: {}}
+        self.listeners = []
+        self.matches = []
+        self.present = None
+        self.counters = {'object_fetches': 0, 'signals': 0, 'ignored_signals': 0}
+
+    def add_listener(self, callback):
+        """
+        Have callback() called (normally on the DBus thread) whenever the table changes.
+        """
+        with self.lock:
+            self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """
+        Stop calling a listener.
+        """
+        with self.lock:
+            if callback in self.listeners:
+                self.listeners.remove(callback)
+
+    def changed(self):
+        """
+        Tell the listeners the table changed.
+        """
+        with self.lock:
+            self.present = bool(self.objects[BLUEZ_ADAPTER])
+            listeners = list(self.listeners)
+        for callback in listeners:
+            callback()
+
+    def start(self):
+        """
+        Add the match rules and fetch BlueZ's object tree, unless that has been done already.
+        The match rules go first so nothing that changes while the tree is on its way is lost.
+        """
+        with self.lock:
+            if self.matches:
+                return
+            bus = dbus_main.DBUS_BUS
+            self.matches = [
+                bus.add_signal_receiver(self.interfaces_added, bus_name=BLUEZ_BUS,
+                                        dbus_interface=OBJECT_MANAGER_INTERFACE,
+                                        signal_name='InterfacesAdded', path='/'),
+                bus.add_signal_receiver(self.interfaces_removed, bus_name=BLUEZ_BUS,
+                                        dbus_interface=OBJECT_MANAGER_INTERFACE,
+                                        signal_name='InterfacesRemoved', path='/')]
+            for interface in KEPT_PROPERTIES:
+                self.matches.append(
+                    bus.add_signal_receiver(self.properties_changed, bus_name=BLUEZ_BUS,
+                                            dbus_interface=PROPERTIES_INTERFACE,
+                                            signal_name='PropertiesChanged', arg0=interface,
+                                            path_keyword='path'))
+        dbus_main.PROPERTY_CACHE.watch_name_owner(BLUEZ_BUS, self.owner_changed)
+        self.fetch()
+
+    def fetch(self):
+        """
+        Fetch BlueZ's object tree with a single GetManagedObjects.
+        """
+        with self.lock:
+            self.counters['object_fetches'] += 1
+        proxy = dbus_main.PROPERTY_CACHE.get_proxy(BLUEZ_BUS, '/')
+        dbus.Interface(proxy, OBJECT_MANAGER_INTERFACE).GetManagedObjects(
+            reply_handler=self.got_objects, error_handler=self.fetch_failed,
+            timeout=dbus_main.get_probe_timeout(BLUEZ_BUS))
+
+    def owner_changed(self, owner):
+        """
+        Called (on the DBus thread) when BlueZ starts, stops or is restarted. What the old owner
+        told us no longer holds, so the table is emptied, and filled again from the new owner.
+        The listeners hear about it once the new owner's objects are in.
+        """
+        with self.lock:
+            for table in self.objects.values():
+                table.clear()
+        if owner:
+            self.fetch()
+        else:
+            self.changed()
+
+    def got_objects(self, objects):
+        """
+        Reply handler for GetManagedObjects.
+        """
+        for path, interfaces in objects.items():
+            self.add_interfaces(path, interfaces)
+        self.changed()
+
+    def fetch_failed(self, error):
+        """
+        Error handler for GetManagedObjects. BlueZ isn't there (or didn't answer in time), but if
+        it turns up later the table is fetched again, see owner_changed.
+        """
+        print("Could not fetch the bluetooth devices: " + str(error))
+        self.changed()
+
+    def add_interfaces(self, path, interfaces):
+        """
+        Add the interfaces we keep of an object. Returns whether there were any.
+        """
+        added = False
+        with self.lock:
+            for interface, table in self.objects.items():
+                if interface in interfaces:
+                    table.setdefault(str(path), {}).update(keep_properties(interface,
+                                                                           interfaces[interface]))
+                    added = True
+        return added
+
+    def interfaces_added(self, path, interfaces):
+        """
+        Signal handler for InterfacesAdded.
+        """
+        if self.add_interfaces(path, interfaces):
+            self.count_signal(True)
+            self.changed()
+        else:
+            self.count_signal(False)
+
+    def interfaces_removed(self, path, interfaces):
+        """
+        Signal handler for InterfacesRemoved.
+        """
+        removed = False
+        with self.lock:
+            for interface in interfaces:
+                if self.objects.get(str(interface), {}).pop(str(path), None) is not None:
+                    removed = True
+        self.count_signal(removed)
+        if removed:
+            self.changed()
+
+    def properties_changed(self, interface, changed, invalidated, path=None): #pylint: disable=unused-argument
+        """
+        Signal handler for PropertiesChanged of the adapters and devices. Only changes to the
+        properties we keep of objects we know count.
+        """
+        interface = str(interface)
+        changes = keep_properties(interface, changed) if interface in KEPT_PROPERTIES else {}
+        with self.lock:
+            properties = self.objects.get(interface, {}).get(str(path))
+            relevant = properties is not None and any(properties.get(name) != value
+                                                      for name, value in changes.items())
+            if relevant:
+                properties.update(changes)
+        self.count_signal(relevant)
+        if relevant:
+            self.changed()
+
+    def count_signal(self, relevant):
+        """
+        Count a signal, and whether it changed anything.
+        """
+        with self.lock:
+            self.counters['signals'] += 1
+            if not relevant:
+                self.counters['ignored_signals'] += 1
+
+    def get_adapter(self):
+        """
+        Get the path of the first adapter, or None.
+        """
+        with self.lock:
+            adapters = sorted(self.objects[BLUEZ_ADAPTER])
+        return adapters[0] if adapters else None
+
+    def is_powered(self, adapter):
+        """
+        Whether an adapter is powered.
+        """
+        with self.lock:
+            return bool(self.objects[BLUEZ_ADAPTER].get(adapter, {}).get('Powered', False))
+
+    def get_devices(self, adapter, paired_only=True):
+        """
+        List the devices of an adapter (only the paired ones, unless paired_only is False), by
+        name. Each device is a copy of its properties with its path, and its name.
+        """
+        with self.lock:
+            devices = [dict(properties, path=path)
+                       for path, properties in self.objects[BLUEZ_DEVICE].items()
+                       if str(properties.get('Adapter', '')) == adapter and
+                       (bool(properties.get('Paired', False)) or not paired_only)]
+        for device in devices:
+            device['name'] = str(device.get('Alias') or device.get('Address') or device['path'])
+            device['connected'] = bool(device.get('Connected', False))
+        return sorted(devices, key=lambda device: (not device['connected'],
+                                                   device['name'].lower()))
+
+    def is_connected(self, adapter):
+        """
+        Whether any device of an adapter is connected.
+        """
+        with self.lock:
+            return any(bool(properties.get('Connected', False)) and
+                       str(properties.get('Adapter', '')) == adapter
+                       for properties in self.objects[BLUEZ_DEVICE].values())
+
+    def set_powered(self, adapter, powered, error_handler):
+        """
+        Power an adapter on or off. The table follows once BlueZ signals the change.
+        """
+        proxy = dbus_main.PROPERTY_CACHE.get_proxy(BLUEZ_BUS, adapter)
+        dbus.Interface(proxy, PROPERTIES_INTERFACE).Set(
+            BLUEZ_ADAPTER, 'Powered', dbus.Boolean(powered), reply_handler=lambda *args: None,
+            error_handler=error_handler, timeout=CALL_TIMEOUT)
+
+    def set_connected(self, device, connected, error_handler):
+        """
+        Connect or disconnect a device. Connecting can take a while, which is fine since the
+        call doesn't block; the table follows once BlueZ signals the change.
+        """
+        proxy = dbus_main.PROPERTY_CACHE.get_proxy(BLUEZ_BUS, device)
+        method = 'Connect' if connected else 'Disconnect'
+        getattr(dbus.Interface(proxy, BLUEZ_DEVICE), method)(
+            reply_handler=lambda *args: None, error_handler=error_handler, timeout=CALL_TIMEOUT)
+
+    def get_counters(self):
+        """
+        Return a copy of the counters: how many times the object tree was fetched (which should
+        stay at one, plus one each time BlueZ comes back) and how many signals came in, and were
+        ignored.
+        """
+        with self.lock:
+            return dict(self.counters)
+
+BLUETOOTH = BluetoothTable()
+metrics.METRICS.add_provider('bluetooth', BLUETOOTH.get_counters)
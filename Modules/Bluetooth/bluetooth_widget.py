@@ -3,41 +3,13 @@ The purpose of this module is to manage the bluetooth icon that appears in the m
 """
 
 import tkinter
-from multiprocessing import Value
-import dbus
-from PIL import ImageTk, Image
-import Modules.DBus.dbus_main as dbus_main
+import Modules.DBus.dispatcher as dispatcher
+import Modules.Cache.icon_cache as icon_cache
+import Modules.Status.status_model as status_model
+import Modules.Bluetooth.bluetooth_devices as bluetooth_devices
+import Modules.Profiling.metrics as metrics
 import __main__
 
-def get_bluetooth_device():
-    """
-    Function to get the first bluetooth device in the system.
-    """
-    proxy = dbus_main.DBUS_BUS.get_object('org.bluez', '/')
-    get_manager = dbus.Interface(proxy, 'org.freedesktop.DBus.ObjectManager')
-    objects = get_manager.GetManagedObjects()
-    for item in objects:
-        if 'org.bluez.Adapter1' in objects[item]:
-            return item
-    return None
-
-def get_bluetooth_state(power, connect, bt_device):
-    """
-    Function to get the current state of a bluetooth device.
-    """
-    try:
-        proxy = dbus_main.DBUS_BUS.get_object('org.bluez', bt_device)
-        get_manager = dbus.Interface(proxy, 'org.freedesktop.DBus.Properties')
-        power.value = int(get_manager.Get('org.bluez.Adapter1', 'Powered'))
-    except: #pylint: disable=bare-except
-        power.value = 0
-    try:
-        proxy = dbus_main.DBUS_BUS.get_object('org.bluez', bt_device)
-        get_manager = dbus.Interface(proxy, 'org.freedesktop.DBus.Properties')
-        connect.value = int(get_manager.Get('org.bluez.Device1', 'Connected'))
-    except: #pylint: disable=bare-except
-        connect.value = 0
-
 class BluetoothIcon(tkinter.Label): #pylint: disable=too-many-ancestors
     """
     The main class that manages drawing of the bluetooth icon.
@@ -52,55 +24,91 @@ class BluetoothIcon(tkinter.Label): #pylint: disable=too-many-ancestors
         self.configure(height=self.widget_size)
         self.configure(background=parent['background'])
         self.load_images()
-        try:
-            self.bt_device = get_bluetooth_device()
-        except:
-            raise ValueError('Bluetooth Not Present')
-        self.bind('<<bluetooth_update>>', self.select_image)
-        self.bluetooth_connect = Value('i', 0) #0=disconnected, 1=connected
-        self.bluetooth_power = Value('i', 0) #0=off, 1=on
-        get_bluetooth_state(self.bluetooth_connect, self.bluetooth_power, self.bt_device)
+        self.status = status_model.BluetoothStatus()
+        self.status.subscribe(self.status_changed, ('present', 'power', 'connect'))
+        self.missing = False
+        self.shown_image = None
         self.select_image()
-        dbus_main.DBUS_BUS.add_signal_receiver(self.dbus_signal_handler,
-                                               bus_name='org.bluez',
-                                               dbus_interface='org.freedesktop.DBus.Properties',
-                                               signal_name='PropertiesChanged',
-                                               path=self.bt_device)
-        self.update()
+        bluetooth_devices.BLUETOOTH.add_listener(self.devices_changed)
+        bluetooth_devices.BLUETOOTH.start()
 
-    def dbus_signal_handler(self, interface, data, signaltype): #pylint: disable=unused-argument
-        """
-        This is the main DBus callback to process the signal when the bluetooth status changes.
-        """
-        update = False
-        if 'Powered' in data and int(data['Powered']) != self.bluetooth_power.value:
-            self.bluetooth_power.value = int(data['Powered'])
-            update = True
-        if 'Connected' in data and int(data['Connected']) != self.bluetooth_connect.value:
-            self.bluetooth_connect.value = int(data['Connected'])
-            update = True
-        if update is True:
-            self.event_generate('<<bluetooth_update>>')
-            update = False
+    def devices_changed(self):
+        """
+        Listener of the bluetooth table (see bluetooth_devices.py), called on the DBus thread.
+        The icon shows the first adapter, and whether any device is connected to it. The table
+        is still being fetched while present is None. An icon that was hidden comes back once an
+        adapter turns up.
+        """
+        table = bluetooth_devices.BLUETOOTH
+        adapter = table.get_adapter()
+        if adapter is None:
+            if table.present is False:
+                self.bluetooth_not_found()
+            return
+        changed = self.status.update(adapter=adapter, power=int(table.is_powered(adapter)),
+                                     connect=int(table.is_connected(adapter)), present=True)
+        if 'present' in changed:
+            dispatcher.post(self.show)
+
+    def bluetooth_not_found(self):
+        """
+        Called when there is no bluetooth adapter, or BlueZ didn't answer in time.
+        """
+        if 'present' in self.status.update(present=False):
+            print("Could Not Detect Bluetooth")
+            dispatcher.post(self.hide)
+
+    def hide(self, event=None): #pylint: disable=unused-argument
+        """
+        Take the icon out of the menu bar, and make sure the menu bar doesn't put it back.
+        """
+        self.missing = True
+        self.pack_forget()
+
+    def show(self, event=None): #pylint: disable=unused-argument
+        """
+        Have the menu bar put the icon back, if it was hidden.
+        """
+        if self.missing:
+            self.missing = False
+            self.event_generate('<<StatusIconShown>>')
+
+    def status_changed(self, status, changed): #pylint: disable=unused-argument
+        """
+        Called by the status model (normally on the DBus thread) when something we show changes.
+        """
+        dispatcher.post(self.select_image)
 
     def load_images(self):
         """
-        This function manages the loading of the bluetooth icon images.
+        This function manages the loading of the bluetooth icon images, from the bluetooth atlas.
         """
-        self.status_images['conn'] = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Bluetooth/bluetooth_conn.png").convert('RGBA').resize((self.image_size,
-                                                                             self.image_size)))
-        self.status_images['disc'] = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Bluetooth/bluetooth_disc.png").convert('RGBA').resize((self.image_size,
-                                                                             self.image_size)))
+        atlas = icon_cache.SpriteAtlas(__main__.DIR_PATH + "/Modules/Bluetooth", "bluetooth",
+                                       "bluetooth_")
+        for state in ('conn', 'disc'):
+            self.status_images[state] = atlas.get_icon(state, self.image_size)
+        self.status_images['placeholder'] = tkinter.PhotoImage(width=self.image_size,
+                                                               height=self.image_size)
 
     def select_image(self, event=None): #pylint: disable=unused-argument
         """
-        This function is indirectly triggered by the DBus thread whenever there is a change to the
-        bluetooth connection status.
+        This function is posted to the dispatcher whenever there is a change to the bluetooth
+        connection status. The label is only reconfigured if the image actually changes.
         """
-        if self.bluetooth_connect.value == 1 and self.bluetooth_power.value == 1:
-            self.configure(image=self.status_images['conn'])
-            return
-        self.configure(image=self.status_images['disc'])
-        return
+        name = self.get_image_name()
+        metrics.count('select_image', 'bluetooth')
+        if name != self.shown_image:
+            metrics.count('image_swaps', 'bluetooth')
+            self.shown_image = name
+            self.configure(image=self.status_images[name])
+
+    def get_image_name(self):
+        """
+        Work out which of the status images to show. Until the probe returns we show a blank
+        placeholder.
+        """
+        if self.status.present is not True:
+            return 'placeholder'
+        if self.status.connect == 1 and self.status.power == 1:
+            return 'conn'
+        return 'disc'
@@ -0,0 +1,267 @@
+"""
+This module is the shared icon loader for the whole launcher. Decoding and resizing PNGs is one of
+the slowest parts of starting up on a PocketCHIP, so every scaled RGBA image is written to a cache
+directory as raw pixels and read straight back on the next start without touching the decoder.
+Cache entries are keyed by the source path, the target size and the source mtime, so replacing an
+icon on disk invalidates its entry automatically.
+
+The launcher's own status icons are packed into one sprite atlas per widget family (see
+tools/build_atlases.py), so each family is a single file to open and decode. SpriteAtlas cuts the
+individual images back out of it.
+"""
+
+import os
+import json
+import struct
+import hashlib
+import tempfile
+from threading import Lock
+from PIL import ImageTk, Image
+import Modules.Profiling.startup_profiler as startup_profiler
+import Modules.Profiling.metrics as metrics
+
+CACHE_LIMIT = 8 * 1024 * 1024
+CACHE_HEADER = struct.Struct('<4sHH')
+CACHE_MAGIC = b'PMI1'
+CACHE_SUFFIX = '.rgba'
+ATLAS_VERSION = 1
+
+_CACHE_STATE = {'dir': None, 'total': None}
+_CACHE_LOCK = Lock()
+
+def get_cache_dir(name):
+    """
+    Return (and create if necessary) a directory for the named cache under XDG_CACHE_HOME. If the
+    directory cannot be created we return None and callers should simply not cache anything.
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    path = os.path.join(base, 'pocket-menu', name)
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        return None
+    return path
+
+def get_icon_cache_dir():
+    """
+    Get the icon cache directory, only looking it up the first time it's asked for.
+    """
+    if _CACHE_STATE['dir'] is None:
+        _CACHE_STATE['dir'] = get_cache_dir('icons') or ''
+    return _CACHE_STATE['dir']
+
+def normalize_size(size):
+    """
+    Sizes can be passed as a single int for square icons, a (width, height) tuple, or None to keep
+    the image at its original size.
+    """
+    if size is None:
+        return None
+    if isinstance(size, int):
+        return (size, size)
+    return (int(size[0]), int(size[1]))
+
+def get_cache_key(path, size, mtime, variant=''):
+    """
+    Derive the cache file name for a source image scaled to the given size. The variant tells
+    apart different images made from the same file, such as the sprites of an atlas.
+    """
+    size_name = 'orig' if size is None else '%dx%d' % size
+    key = '%s:%s:%d' % (os.path.realpath(path), size_name, mtime)
+    if variant:
+        key += ':' + variant
+    return hashlib.sha1(key.encode('utf-8')).hexdigest() + CACHE_SUFFIX
+
+def read_cached_image(cache_path):
+    """
+    Read a raw RGBA image back from the cache. Returns None on any kind of miss or corruption.
+    A hit touches the entry, so eviction throws away the entries that were used least recently.
+    """
+    try:
+        with open(cache_path, 'rb') as cachefile:
+            blob = cachefile.read()
+    except OSError:
+        return None
+    if len(blob) < CACHE_HEADER.size:
+        return None
+    magic, width, height = CACHE_HEADER.unpack_from(blob)
+    if magic != CACHE_MAGIC or len(blob) != CACHE_HEADER.size + (width * height * 4):
+        return None
+    try:
+        os.utime(cache_path)
+    except OSError:
+        pass
+    return Image.frombytes('RGBA', (width, height), blob[CACHE_HEADER.size:])
+
+def write_cached_image(cache_dir, cache_name, image):
+    """
+    Write a raw RGBA image to the cache. The write goes to a temporary file first and is renamed
+    into place so a crash halfway through never leaves a truncated entry behind, and the
+    temporary file is removed again if the write fails.
+    """
+    blob = CACHE_HEADER.pack(CACHE_MAGIC, image.width, image.height) + image.tobytes()
+    try:
+        handle, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    except OSError:
+        return
+    try:
+        with os.fdopen(handle, 'wb') as cachefile:
+            cachefile.write(blob)
+        os.replace(temp_path, os.path.join(cache_dir, cache_name))
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return
+    account_cache_write(cache_dir, len(blob))
+
+def account_cache_write(cache_dir, written):
+    """
+    Keep a running total of the cache size so that we only have to list the directory once per
+    run, and evict entries once the total grows beyond the cache limit. The icon loader's worker
+    threads write to the cache too, so the total is only touched with the lock held.
+    """
+    with _CACHE_LOCK:
+        if _CACHE_STATE['total'] is None:
+            _CACHE_STATE['total'] = sum(entry.stat().st_size
+                                        for entry in list_cache_entries(cache_dir))
+        else:
+            _CACHE_STATE['total'] += written
+        if _CACHE_STATE['total'] > CACHE_LIMIT:
+            _CACHE_STATE['total'] = evict_cache(cache_dir, int(CACHE_LIMIT * 0.75))
+
+def list_cache_entries(cache_dir):
+    """
+    List all the cache entries in the cache directory.
+    """
+    try:
+        return [entry for entry in os.scandir(cache_dir) if entry.name.endswith(CACHE_SUFFIX)]
+    except OSError:
+        return []
+
+def evict_cache(cache_dir, target):
+    """
+    Remove the least recently used cache entries until the cache is no bigger than the target
+    size. Returns the size of the cache after eviction.
+    """
+    entries = []
+    for entry in list_cache_entries(cache_dir):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    entries.sort()
+    total = sum(entry[1] for entry in entries)
+    for _, entry_size, entry_path in entries:
+        if total <= target:
+            break
+        try:
+            os.remove(entry_path)
+            total -= entry_size
+        except OSError:
+            pass
+    return total
+
+def decode_image(path, size):
+    """
+    Decode an image from disk, convert it to RGBA and resize it. This is the slow path that the
+    cache exists to avoid.
+    """
+    startup_profiler.count('image_decodes')
+    metrics.count('images', 'decodes')
+    image = Image.open(path).convert('RGBA')
+    if size is not None and image.size != size:
+        image = image.resize(size)
+    return image
+
+def load_cached_image(path, size, make_image, variant=''):
+    """
+    Get an image made from the file at path (at the normalized size) from the cache if possible,
+    and otherwise make it with make_image() and cache it.
+    """
+    cache_dir = get_icon_cache_dir()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+    if not cache_dir or mtime is None:
+        return make_image()
+    cache_name = get_cache_key(path, size, mtime, variant)
+    image = read_cached_image(os.path.join(cache_dir, cache_name))
+    if image is None:
+        image = make_image()
+        write_cached_image(cache_dir, cache_name, image)
+    return image
+
+def load_image(path, size=None):
+    """
+    Load an image as an RGBA PIL image at the requested size, from the cache if possible.
+    """
+    size = normalize_size(size)
+    return load_cached_image(path, size, lambda: decode_image(path, size))
+
+def load_icon(path, size=None):
+    """
+    Load an image from disk as a Tk PhotoImage at the requested size. This is the function widgets
+    should use instead of calling Image.open directly.
+    """
+    return ImageTk.PhotoImage(load_image(path, size))
+
+def get_atlas_paths(directory, name):
+    """
+    Get the paths of the atlas image and of its index for a widget family.
+    """
+    base = os.path.join(directory, name + '_atlas')
+    return base + '.png', base + '.json'
+
+class SpriteAtlas:
+    """
+    The images of one widget family, packed into a single atlas image with an index of where each
+    image is in it. Each image is cropped out of the atlas and resized once, and then cached like
+    any other scaled image, so on a warm start the atlas isn't even opened. It is only decoded (or
+    read back from the cache) once, the first time an image misses the cache. If the atlas hasn't
+    been built, or doesn't have an image, we fall back to loading <prefix><name>.png from the same
+    directory.
+    """
+    def __init__(self, directory, name, prefix=''):
+        self.directory = directory
+        self.prefix = prefix
+        self.image_path, index_path = get_atlas_paths(directory, name)
+        self.image = None
+        try:
+            with open(index_path, encoding='utf-8') as indexfile:
+                index = json.load(indexfile)
+            self.sprites = index['sprites'] if index.get('version') == ATLAS_VERSION else {}
+        except (OSError, ValueError, KeyError):
+            self.sprites = {}
+
+    def get_image(self, name, size=None):
+        """
+        Get one image out of the atlas as an RGBA PIL image at the requested size.
+        """
+        if name not in self.sprites:
+            return load_image(os.path.join(self.directory, self.prefix + name + '.png'), size)
+        box = self.sprites[name]
+        size = normalize_size(size)
+        return load_cached_image(self.image_path, size, lambda: self.cut_sprite(box, size),
+                                 'sprite:%s:%d,%d,%d,%d' % (name, *box))
+
+    def cut_sprite(self, box, size):
+        """
+        Crop one image out of the atlas and resize it. This is the slow path.
+        """
+        if self.image is None:
+            self.image = load_image(self.image_path)
+        left, top, width, height = box
+        image = self.image.crop((left, top, left + width, top + height))
+        if size is not None and image.size != size:
+            image = image.resize(size)
+        return image
+
+    def get_icon(self, name, size=None):
+        """
+        Get one image out of the atlas as a Tk PhotoImage at the requested size.
+        """
+        return ImageTk.PhotoImage(self.get_image(name, size))
@@ -0,0 +1,135 @@
+"""
+This module decodes application icons in the background. Decoding and resizing hundreds of PNGs on
+the Tk thread would hold up the first paint of the icon grid, so the grids show placeholder tiles
+straight away and ask the icon loader for the real icons. A small pool of worker threads loads them
+with icon_cache.load_image (Pillow releases the GIL for much of the decoding and resizing), and each
+finished image is handed back to the Tk thread through the dispatcher, where it is turned into a
+PhotoImage, since Tk images must only ever be created on the Tk thread.
+
+Requests are served by priority (lowest first) and then in the order they were made, so the grids
+ask for the icons in view with VISIBLE priority and everything else with a lower priority.
+"""
+
+import os
+import heapq
+import itertools
+from threading import Thread, Condition
+from PIL import ImageTk, Image
+import Modules.Cache.icon_cache as icon_cache
+import Modules.DBus.dispatcher as dispatcher
+
+VISIBLE = 0
+OVERSCAN = 1
+OFFSCREEN = 2
+
+WORKERS = max(1, min(2, os.cpu_count() or 1))
+
+def make_placeholder(size):
+    """
+    Make the tile shown in place of an icon until it has been loaded.
+    """
+    return ImageTk.PhotoImage(Image.new('RGBA', icon_cache.normalize_size(size),
+                                        (255, 255, 255, 24)))
+
+class IconLoader:
+    """
+    A pool of worker threads loading icons. Callbacks are called on the Tk thread with a
+    PhotoImage, or with None if the icon couldn't be loaded. Asking for an icon that has already
+    been asked for (and not loaded yet) doesn't load it twice, but does raise its priority if the
+    new request has a higher priority.
+    """
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self.threads = []
+        self.condition = Condition()
+        self.queue = []
+        self.pending = {}
+        self.sequence = itertools.count()
+
+    def start(self):
+        """
+        Start the worker threads, the first time an icon is asked for.
+        """
+        for number in range(self.workers):
+            thread = Thread(target=self.work, name='icon-loader-%d' % number, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def request(self, path, size, callback, priority=OFFSCREEN):
+        """
+        Ask for an icon to be loaded at the given size. The callback is called on the Tk thread
+        once it has been.
+        """
+        key = (path, icon_cache.normalize_size(size))
+        with self.condition:
+            if not self.threads:
+                self.start()
+            entry = self.pending.get(key)
+            if entry is None:
+                entry = self.pending[key] = {'priority': priority, 'callbacks': []}
+            elif priority >= entry['priority']:
+                if callback not in entry['callbacks']:
+                    entry['callbacks'].append(callback)
+                return
+            entry['priority'] = priority
+            if callback not in entry['callbacks']:
+                entry['callbacks'].append(callback)
+            heapq.heappush(self.queue, (priority, next(self.sequence), key))
+            self.condition.notify()
+
+    def cancel(self, path, size, callback):
+        """
+        Withdraw a request. The icon isn't loaded at all if nobody else has asked for it.
+        """
+        key = (path, icon_cache.normalize_size(size))
+        with self.condition:
+            entry = self.pending.get(key)
+            if entry is not None and callback in entry['callbacks']:
+                entry['callbacks'].remove(callback)
+                if not entry['callbacks']:
+                    del self.pending[key]
+
+    def get_next(self):
+        """
+        Wait for the highest priority request, skipping queue entries that were superseded by a
+        higher priority request for the same icon or cancelled.
+        """
+        with self.condition:
+            while True:
+                while not self.queue:
+                    self.condition.wait()
+                priority, _, key = heapq.heappop(self.queue)
+                entry = self.pending.get(key)
+                if entry is not None and entry['priority'] == priority:
+                    return key
+
+    def work(self):
+        """
+        The worker thread loop.
+        """
+        while True:
+            key = self.get_next()
+            try:
+                image = icon_cache.load_image(*key)
+            except (OSError, ValueError, TypeError):
+                image = None
+            with self.condition:
+                entry = self.pending.pop(key, None)
+                for callback in entry['callbacks'] if entry is not None else []:
+                    dispatcher.post(self.deliver, callback, image, key=(self, callback, key))
+
+    def is_idle(self):
+        """
+        Whether every icon asked for has been loaded and posted to the dispatcher.
+        """
+        with self.condition:
+            return not self.pending
+
+    @staticmethod
+    def deliver(callback, image):
+        """
+        Turn a loaded image into a PhotoImage and hand it over, on the Tk thread.
+        """
+        callback(None if image is None else ImageTk.PhotoImage(image))
+
+ICON_LOADER = IconLoader()
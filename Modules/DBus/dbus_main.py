@@ -1,20 +1,46 @@
 """
 This module is supposed to contain the main DBus loop as well as start running a separate thread
 for the main DBus loop once loaded. All consumers of DBus will reference this module to speak to
-the main DBus thread.
+the main DBus thread. It also provides the shared property cache (PROPERTY_CACHE) which widgets
+should read DBus properties from instead of making their own Get calls, and the subscription
+manager (SUBSCRIPTIONS) for following objects whose path changes.
 """
+import os
 from threading import Thread
 import dbus
 from dbus.mainloop.glib import DBusGMainLoop
 from gi.repository import GLib
 from gi.repository import GObject
+import Modules.Profiling.startup_profiler as startup_profiler
+from Modules.DBus.property_cache import PropertyCache
+from Modules.DBus.subscriptions import SubscriptionManager
+
+#How long (in seconds) we wait for each service to answer the discovery probes at startup. These
+#are kept short so a missing or slow service can't hold up the launcher.
+PROBE_TIMEOUTS = {'org.freedesktop.NetworkManager': 3.0,
+                  'org.bluez': 3.0,
+                  'org.freedesktop.UPower': 3.0}
+DEFAULT_PROBE_TIMEOUT = 3.0
+
+def get_probe_timeout(bus_name):
+    """
+    Get the discovery probe timeout for a service. POCKET_MENU_PROBE_TIMEOUT overrides the timeout
+    of every service at once.
+    """
+    try:
+        return float(os.environ['POCKET_MENU_PROBE_TIMEOUT'])
+    except (KeyError, ValueError):
+        return PROBE_TIMEOUTS.get(bus_name, DEFAULT_PROBE_TIMEOUT)
 
 try:
     DBusGMainLoop(set_as_default=True)
     GObject.threads_init()
     dbus.mainloop.glib.threads_init()
     DBUS_LOOP = DBusGMainLoop()
-    DBUS_BUS = dbus.SystemBus(mainloop=DBUS_LOOP)
+    with startup_profiler.phase('dbus connection'):
+        DBUS_BUS = dbus.SystemBus(mainloop=DBUS_LOOP)
+    PROPERTY_CACHE = PropertyCache(DBUS_BUS)
+    SUBSCRIPTIONS = SubscriptionManager(PROPERTY_CACHE)
     MAINLOOP = GLib.MainLoop()
     DBUS_THREAD = Thread(target=MAINLOOP.run, daemon=True)
     DBUS_THREAD.start()
@@ -0,0 +1,206 @@
+"""
+This module is the bridge from the DBus thread to the Tk main loop. Tk must only ever be touched
+from the main thread, so DBus callbacks never call into Tk themselves: they post the update they
+want made (normally a widget's select_image) to the dispatcher, and the dispatcher runs it on the
+main thread.
+
+Posting counts the update (under a lock held only for that) and appends it to a deque (which is
+safe to do from any thread without a lock) and, if the pump isn't already due to run, wakes the
+main loop by writing a byte to a pipe it is watching. The pump
+then waits one frame before draining the queue, so a burst of signals (such as the wifi strength
+flapping) only redraws each widget once: updates with the same key within a frame are coalesced and
+only the last one is run.
+
+While the launcher is idle (see Modules/Idle/idle_monitor.py) the dispatcher can be paused. Updates
+posted while paused are held back, keeping only the last one for each key, and nothing wakes the
+main loop for them. Resuming runs what was held all at once. Urgent updates, which are the replies
+to something the user just did (such as dragging the backlight slider down to 0, which is itself
+a reason to be idle), are never held back.
+"""
+
+import os
+import tkinter
+from threading import Lock
+from collections import deque
+
+FRAME_MS = 16
+
+class Dispatcher:
+    """
+    Runs updates posted from any thread on the Tk main thread, coalescing repeated updates to the
+    same widget. Updates posted before the dispatcher is attached to a Tk root are kept until it is.
+    """
+    def __init__(self, frame_ms=FRAME_MS):
+        self.frame_ms = frame_ms
+        self.queue = deque()
+        self.root = None
+        self.pump_id = None
+        self.wake_pending = False
+        self.wake_pipe = None
+        self.lock = Lock()
+        self.paused = False
+        self.held = {}
+        self.counters = {'queued': 0, 'coalesced': 0, 'dispatched': 0, 'held': 0,
+                         'wakes': 0}
+
+    def attach(self, root):
+        """
+        Start dispatching on the main loop of the given Tk root. This must be called from the main
+        thread.
+        """
+        self.detach()
+        self.root = root
+        try:
+            self.wake_pipe = os.pipe()
+            os.set_blocking(self.wake_pipe[0], False)
+            os.set_blocking(self.wake_pipe[1], False)
+            self.root.tk.createfilehandler(self.wake_pipe[0], tkinter.READABLE, self.wake)
+        except (AttributeError, OSError, tkinter.TclError):
+            #No file handlers on this platform, so fall back to polling every frame.
+            self.close_pipe()
+        self.wake_pending = False
+        self.schedule()
+
+    def detach(self):
+        """
+        Stop dispatching, for instance because the Tk root is being destroyed.
+        """
+        if self.root is None:
+            return
+        if self.pump_id is not None:
+            try:
+                self.root.after_cancel(self.pump_id)
+            except tkinter.TclError:
+                pass
+            self.pump_id = None
+        if self.wake_pipe is not None:
+            try:
+                self.root.tk.deletefilehandler(self.wake_pipe[0])
+            except (AttributeError, tkinter.TclError):
+                pass
+            self.close_pipe()
+        self.root = None
+
+    def close_pipe(self):
+        """
+        Close the pipe used to wake the main loop.
+        """
+        if self.wake_pipe is not None:
+            for handle in self.wake_pipe:
+                os.close(handle)
+            self.wake_pipe = None
+
+    def post(self, callback, *args, key=None, urgent=False):
+        """
+        Queue callback(*args) to be run on the main thread. This can be called from any thread.
+        If another update with the same key (the callback itself by default) is posted before the
+        next frame only the last one is run. Urgent updates are run even while paused.
+        """
+        if key is None:
+            key = callback
+        with self.lock:
+            self.counters['queued'] += 1
+            if self.paused and not urgent:
+                if key in self.held:
+                    self.counters['coalesced'] += 1
+                self.held[key] = (callback, args)
+                self.counters['held'] += 1
+                return
+        self.queue.append((key, callback, args))
+        if self.wake_pending or self.wake_pipe is None:
+            return
+        self.wake_pending = True
+        try:
+            os.write(self.wake_pipe[1], b'\0')
+        except (OSError, TypeError):
+            pass
+
+    def wake(self, handle, mask): #pylint: disable=unused-argument
+        """
+        File handler callback, run on the main thread when something has been posted.
+        """
+        try:
+            os.read(handle, 4096)
+        except OSError:
+            pass
+        self.counters['wakes'] += 1
+        self.schedule()
+
+    def schedule(self):
+        """
+        Run the pump in one frame's time, unless it's already due to run.
+        """
+        if self.root is not None and self.pump_id is None:
+            self.pump_id = self.root.after(self.frame_ms, self.pump)
+
+    def pump(self):
+        """
+        Drain the queue and run the updates. Without a wake pipe the pump polls every frame, even
+        while paused, since nothing else could wake it for an urgent update.
+        """
+        self.pump_id = None
+        self.flush()
+        if self.wake_pipe is None:
+            self.schedule()
+
+    def pause(self):
+        """
+        Hold back updates until resume is called.
+        """
+        with self.lock:
+            self.paused = True
+
+    def resume(self):
+        """
+        Stop holding back updates, and run the ones that were held right away. This must be
+        called from the main thread.
+        """
+        with self.lock:
+            if not self.paused:
+                return
+            self.paused = False
+            held, self.held = self.held, {}
+        for key, (callback, args) in held.items():
+            self.queue.append((key, callback, args))
+        self.flush()
+        self.schedule()
+
+    def flush(self):
+        """
+        Run everything that has been posted so far, right now. This must be called from the main
+        thread.
+        """
+        self.wake_pending = False
+        updates = {}
+        while True:
+            try:
+                key, callback, args = self.queue.popleft()
+            except IndexError:
+                break
+            if key in updates:
+                self.counters['coalesced'] += 1
+                del updates[key]
+            updates[key] = (callback, args)
+        for callback, args in updates.values():
+            self.counters['dispatched'] += 1
+            try:
+                callback(*args)
+            except: #pylint: disable=bare-except
+                print("Error dispatching update to " + repr(callback))
+
+    def get_counters(self):
+        """
+        Return a copy of the queued, coalesced, dispatched and held update counters, and of how
+        many times the main loop was woken up for them. Every post is counted as queued, including
+        the ones held back while paused.
+        """
+        with self.lock:
+            return dict(self.counters)
+
+DISPATCHER = Dispatcher()
+
+def post(callback, *args, key=None, urgent=False):
+    """
+    Post an update to the shared dispatcher, see Dispatcher.post.
+    """
+    DISPATCHER.post(callback, *args, key=key, urgent=urgent)
@@ -0,0 +1,262 @@
+"""
+This module holds the shared DBus property cache. It is kept apart from dbus_main so that it can
+be used with any bus object, such as the stub bus used by the benchmarks.
+"""
+
+from threading import Lock
+import dbus
+import Modules.Profiling.metrics as metrics
+
+PROPERTIES_INTERFACE = 'org.freedesktop.DBus.Properties'
+OBJECT_MANAGER_INTERFACE = 'org.freedesktop.DBus.ObjectManager'
+
+class PropertyCache:
+    """
+    A shared cache of DBus object properties. Each watched object interface is fetched with a
+    single GetAll and then kept current from its PropertiesChanged signals, so widgets can read
+    property values synchronously without making a round trip to the bus every time. Widgets that
+    want to know when something changes subscribe to the cache rather than adding their own
+    signal receivers. Subscribers are called on the DBus thread with the same arguments as the
+    PropertiesChanged signal (interface, changed, invalidated).
+
+    There is one match rule per watched object interface, narrowed down to the sender, the path
+    and (through arg0) the interface, so the bus daemon only wakes us up for the signals we use.
+    Every watch and watch_async counts as a watcher of the object interface, and unwatch only
+    lets go of one of them: the match rule and the cached properties are kept until the last
+    watcher has let go.
+
+    The *_async methods never block the calling thread. Their reply handlers are normally called
+    on the DBus thread, except when the answer is already in the cache, in which case they are
+    called straight away.
+
+    Services can come and go (or be restarted) while we run. Whoever watches the owner of a
+    service name is told when that happens, and the cached objects of the old owner are dropped
+    so they are fetched again from the new one.
+    """
+    def __init__(self, bus):
+        self.bus = bus
+        self.lock = Lock()
+        self.objects = {}
+        self.matches = {}
+        self.subscribers = {}
+        self.watchers = {}
+        self.owners = {}
+        self.owner_watches = {}
+        self.owner_callbacks = {}
+
+    def watch(self, bus_name, path, interface):
+        """
+        Start caching the properties of an object interface (if we aren't already) and return a
+        copy of them.
+        """
+        path = str(path)
+        key = (bus_name, path, interface)
+        self.add_match(bus_name, path, interface)
+        with self.lock:
+            self.watchers[key] = self.watchers.get(key, 0) + 1
+            if key in self.objects:
+                return dict(self.objects[key])
+        proxy = self.bus.get_object(bus_name, path)
+        properties = dbus.Interface(proxy, PROPERTIES_INTERFACE).GetAll(interface)
+        with self.lock:
+            self.objects.setdefault(key, {}).update(properties)
+            return dict(self.objects[key])
+
+    def get_proxy(self, bus_name, path):
+        """
+        Get a proxy for an object without blocking: the object isn't introspected and the bus
+        name isn't resolved (or activated) up front.
+        """
+        return self.bus.get_object(bus_name, path, introspect=False,
+                                   follow_name_owner_changes=True)
+
+    def watch_async(self, bus_name, path, interface, reply_handler, error_handler, timeout, #pylint: disable=too-many-arguments
+                    fresh=False):
+        """
+        The non-blocking version of watch. The reply handler is given a copy of the properties,
+        and the error handler the DBus exception if the object couldn't be fetched in time. With
+        fresh, the properties are fetched even if they are cached. Objects that were only seeded
+        from GetManagedObjects and never watched had no match rule, so their cached properties
+        may be long out of date.
+        """
+        path = str(path)
+        key = (bus_name, path, interface)
+        with self.lock:
+            self.watchers[key] = self.watchers.get(key, 0) + 1
+            cached = dict(self.objects[key]) if key in self.objects and not fresh else None
+        if cached is not None:
+            self.add_match(bus_name, path, interface)
+            reply_handler(cached)
+            return
+        def got_properties(properties):
+            self.add_match(bus_name, path, interface)
+            with self.lock:
+                self.objects.setdefault(key, {}).update(properties)
+                result = dict(self.objects[key])
+            reply_handler(result)
+        dbus.Interface(self.get_proxy(bus_name, path), PROPERTIES_INTERFACE).GetAll(
+            interface, reply_handler=got_properties, error_handler=error_handler, timeout=timeout)
+
+    def seed(self, bus_name, managed_objects):
+        """
+        Fill the cache from the result of an ObjectManager GetManagedObjects call, so objects
+        that are watched later don't need a GetAll of their own.
+        """
+        with self.lock:
+            for path, interfaces in managed_objects.items():
+                for interface, properties in interfaces.items():
+                    key = (bus_name, str(path), str(interface))
+                    if key not in self.objects:
+                        self.objects[key] = dict(properties)
+
+    def add_match(self, bus_name, path, interface):
+        """
+        Listen for PropertiesChanged on an object interface, once per object interface.
+        """
+        key = (bus_name, path, interface)
+        with self.lock:
+            if key in self.matches:
+                return
+            def handler(changed_interface, changed, invalidated):
+                self.properties_changed(bus_name, path, changed_interface, changed, invalidated)
+            self.matches[key] = \
+                self.bus.add_signal_receiver(handler, bus_name=bus_name,
+                                             dbus_interface=PROPERTIES_INTERFACE,
+                                             signal_name='PropertiesChanged', path=path,
+                                             arg0=interface)
+
+    def unwatch(self, bus_name, path, interface=None):
+        """
+        Let go of a watch of an object interface, or of every interface of the object if none is
+        given. Once nothing else watches an object interface it is no longer cached, and its
+        match rule is removed.
+        """
+        path = str(path)
+        with self.lock:
+            keys = set(self.matches) | set(self.objects) | set(self.watchers)
+            for key in [key for key in keys if key[:2] == (bus_name, path) and
+                        interface in (None, key[2])]:
+                watchers = self.watchers.pop(key, 0) - 1
+                if watchers > 0:
+                    self.watchers[key] = watchers
+                    continue
+                if key in self.matches:
+                    self.matches.pop(key).remove()
+                self.objects.pop(key, None)
+
+    def watch_name_owner(self, bus_name, callback):
+        """
+        Have callback(owner) called (on the DBus thread) whenever a service name changes hands,
+        with the unique name of the new owner, or '' when the service has gone away. There is
+        one watch per service name however many callbacks there are. The owner the name has when
+        the watch starts isn't reported, as the callers probe for the service themselves.
+        """
+        with self.lock:
+            if bus_name in self.owner_callbacks:
+                self.owner_callbacks[bus_name].append(callback)
+                return
+            self.owner_callbacks[bus_name] = [callback]
+        def handler(owner):
+            self.name_owner_changed(bus_name, str(owner))
+        watch = self.bus.watch_name_owner(bus_name, handler)
+        with self.lock:
+            self.owner_watches[bus_name] = watch
+
+    def name_owner_changed(self, bus_name, owner):
+        """
+        Drop the cached objects of a service whose owner changed, and tell the callbacks. The
+        match rules and subscribers are kept, since they follow the name rather than the owner.
+        """
+        with self.lock:
+            known = bus_name in self.owners
+            if known and self.owners[bus_name] == owner:
+                return
+            self.owners[bus_name] = owner
+            for key in [key for key in self.objects if key[0] == bus_name]:
+                del self.objects[key]
+            callbacks = list(self.owner_callbacks.get(bus_name, ())) if known else []
+        for callback in callbacks:
+            callback(owner)
+
+    def properties_changed(self, bus_name, path, interface, changed, invalidated): #pylint: disable=too-many-arguments
+        """
+        Apply a PropertiesChanged signal to the cache and pass it on to any subscribers. Objects
+        that aren't cached (yet) are left out, rather than cached with only the changed
+        properties, which would look like a complete copy to watch_async.
+        """
+        key = (bus_name, path, str(interface))
+        metrics.count('dbus_signals_by_match', bus_name + ' ' + path)
+        with self.lock:
+            properties = self.objects.get(key)
+            if properties is not None:
+                properties.update(changed)
+                for name in invalidated:
+                    properties.pop(name, None)
+            subscribers = list(self.subscribers.get(key, ()))
+        for callback in subscribers:
+            metrics.count('dbus_signals_by_subscriber',
+                          getattr(callback, '__qualname__', repr(callback)))
+            callback(interface, changed, invalidated)
+
+    def get(self, bus_name, path, interface, name, default=None): #pylint: disable=too-many-arguments
+        """
+        Read a single cached property.
+        """
+        with self.lock:
+            return self.objects.get((bus_name, str(path), interface), {}).get(name, default)
+
+    def get_all(self, bus_name, path, interface):
+        """
+        Read a copy of all the cached properties of an object interface.
+        """
+        with self.lock:
+            return dict(self.objects.get((bus_name, str(path), interface), {}))
+
+    def subscribe(self, bus_name, path, interface, callback):
+        """
+        Have callback called whenever a property of the object interface changes. The object
+        is watched if it isn't already.
+        """
+        self.watch(bus_name, path, interface)
+        self.add_subscriber(bus_name, path, interface, callback)
+
+    def add_subscriber(self, bus_name, path, interface, callback):
+        """
+        The non-blocking part of subscribe: add the match rule and the subscriber, without
+        fetching the properties.
+        """
+        path = str(path)
+        self.add_match(bus_name, path, interface)
+        with self.lock:
+            self.subscribers.setdefault((bus_name, path, interface), []).append(callback)
+
+    def get_managed_objects(self, bus_name, path):
+        """
+        Fetch every object (and all their properties) from an ObjectManager with a single call,
+        seeding the cache with the result.
+        """
+        proxy = self.bus.get_object(bus_name, path)
+        objects = dbus.Interface(proxy, OBJECT_MANAGER_INTERFACE).GetManagedObjects()
+        self.seed(bus_name, objects)
+        return objects
+
+    def get_managed_objects_async(self, bus_name, path, reply_handler, error_handler, timeout): #pylint: disable=too-many-arguments
+        """
+        The non-blocking version of get_managed_objects.
+        """
+        def got_objects(objects):
+            self.seed(bus_name, objects)
+            reply_handler(objects)
+        dbus.Interface(self.get_proxy(bus_name, path), OBJECT_MANAGER_INTERFACE).GetManagedObjects(
+            reply_handler=got_objects, error_handler=error_handler, timeout=timeout)
+
+    def unsubscribe(self, bus_name, path, interface, callback):
+        """
+        Stop calling a subscriber.
+        """
+        with self.lock:
+            callbacks = self.subscribers.get((bus_name, str(path), interface), [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                self.subscribers.pop((bus_name, str(path), interface), None)
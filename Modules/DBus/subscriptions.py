@@ -0,0 +1,128 @@
+"""
+This module holds the subscription manager, for subscribing to objects whose path changes over
+time, such as the active access point of a wifi device. A subscription can be moved to another
+path (or to none), and the manager does that in one step: the match rule for the new object is
+added and the subscriber registered before the new object's properties are fetched, so no change
+is missed in between, and the match rule of the old object is removed as soon as nothing follows
+it any more, so we are never woken up for signals from objects we have stopped showing.
+
+follow() builds on that to keep a subscription on whatever object a property of another object
+points at, moving it whenever the property changes.
+
+Each subscription on an object is one watcher of it in the property cache, and moving away lets
+go of that watch, so once nothing follows an object (and nothing else watches it) it is dropped
+from the property cache altogether.
+"""
+
+from threading import Lock
+
+#The path DBus services use to mean "no object".
+NO_OBJECT = '/'
+
+class Subscription:
+    """
+    One subscriber to one interface of an object whose path can be moved. The path is None while
+    the subscription isn't on any object.
+    """
+    def __init__(self, manager, bus_name, interface, callback, timeout):
+        self.manager = manager
+        self.bus_name = bus_name
+        self.interface = interface
+        self.callback = callback
+        self.timeout = timeout
+        self.path = None
+        self.unfollow = None
+
+    def move(self, path):
+        """
+        Move the subscription to another object, see SubscriptionManager.move.
+        """
+        self.manager.move(self, path)
+
+    def cancel(self):
+        """
+        Stop the subscription, and stop following the property that moved it, if any.
+        """
+        unfollow, self.unfollow = self.unfollow, None
+        if unfollow is not None:
+            unfollow()
+        self.manager.move(self, None)
+
+class SubscriptionManager:
+    """
+    Keeps subscriptions on the property cache, with one match rule per object interface however
+    many subscriptions follow it. Each subscription is one watch of its object in the cache.
+    """
+    def __init__(self, cache):
+        self.cache = cache
+        self.lock = Lock()
+        self.followers = {}
+
+    def subscribe(self, bus_name, path, interface, callback, timeout):
+        """
+        Subscribe to an object interface. Once its properties have been fetched the callback is
+        called with all of them, and after that with every change, just like the subscribers of
+        the property cache. Returns the subscription, which can be moved later.
+        """
+        subscription = Subscription(self, bus_name, interface, callback, timeout)
+        self.move(subscription, path)
+        return subscription
+
+    def follow(self, bus_name, path, interface, name, target_interface, callback, timeout): #pylint: disable=too-many-arguments
+        """
+        Subscribe to target_interface of the object that the name property of an object
+        interface points at, and move the subscription whenever that property changes. The
+        property is read from the property cache, so the object holding it must be watched
+        already. Returns the subscription, and cancelling it stops following the property too.
+        """
+        subscription = Subscription(self, bus_name, target_interface, callback, timeout)
+        def pointer_changed(changed_interface, changed, invalidated): #pylint: disable=unused-argument
+            if name in changed and subscription.unfollow is not None:
+                self.move(subscription, changed[name])
+        subscription.unfollow = lambda: self.cache.unsubscribe(bus_name, path, interface,
+                                                               pointer_changed)
+        self.cache.subscribe(bus_name, path, interface, pointer_changed)
+        self.move(subscription, self.cache.get(bus_name, path, interface, name, NO_OBJECT))
+        return subscription
+
+    def move(self, subscription, path):
+        """
+        Move a subscription to another object, or to none if path is None or "/". The new object
+        is subscribed to before the old one is let go of, and the callback is called with the
+        new object's properties once they have been fetched. They are always fetched, as a copy
+        seeded into the cache earlier may be out of date.
+        """
+        path = None if path is None or str(path) == NO_OBJECT else str(path)
+        bus_name, interface = subscription.bus_name, subscription.interface
+        with self.lock:
+            old_path = subscription.path
+            if path == old_path:
+                return
+            subscription.path = path
+            if path is not None:
+                key = (bus_name, path, interface)
+                self.followers[key] = self.followers.get(key, 0) + 1
+                self.cache.add_subscriber(bus_name, path, interface, subscription.callback)
+            if old_path is not None:
+                key = (bus_name, old_path, interface)
+                self.cache.unsubscribe(bus_name, old_path, interface, subscription.callback)
+                self.followers[key] -= 1
+                if not self.followers[key]:
+                    del self.followers[key]
+                self.cache.unwatch(bus_name, old_path, interface)
+        if path is None:
+            return
+        def got_properties(properties):
+            if subscription.path == path:
+                subscription.callback(interface, properties, [])
+        def no_properties(error):
+            print("Could not fetch %s %s: %s" % (path, interface, error))
+        self.cache.watch_async(bus_name, path, interface, got_properties, no_properties,
+                               subscription.timeout, fresh=True)
+
+    def get_followed(self):
+        """
+        Return the object interfaces that are followed right now, and by how many subscriptions.
+        """
+        with self.lock:
+            return dict(self.followers)
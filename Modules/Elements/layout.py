@@ -0,0 +1,94 @@
+"""
+This module is the layout engine for the launcher. Every size used by the UI (the menu height, the
+navigation widget size, the application button size and so on) is derived purely from the screen
+geometry here, so widgets can be handed their sizes up front instead of asking Tk to draw
+themselves halfway through construction just to read those sizes back.
+"""
+
+def clamp(value, minimum, maximum):
+    """
+    Clamp a value between a minimum and a maximum.
+    """
+    return max(minimum, min(maximum, value))
+
+def get_menu_height(screen_height):
+    """
+    The menu is 10% of the screen height rounded to a multiple of 16, but never smaller than 32 or
+    bigger than 96 pixels.
+    """
+    return clamp(round((screen_height * 0.1) / 16) * 16, 32, 96)
+
+def get_menu_font_size(menu_height):
+    """
+    Derive the menu title font size from the menu height.
+    """
+    return int(menu_height / 16) * 8
+
+def get_nav_widget_size(body_width):
+    """
+    The navigation widgets (the notebook tabs and the scrollbar trough) are 8% of the screen width
+    rounded to a multiple of 16, but never smaller than 32 or bigger than 96 pixels.
+    """
+    return clamp(round((body_width * 0.08) / 16) * 16, 32, 96)
+
+def derive_button_size(height):
+    """
+    Based on the height of the application area, determine the optimal button size, which is
+    half the height rounded down to a multiple of 16.
+    """
+    intermediate_size = (height - (height % 16)) / 16
+    return int(((intermediate_size - (intermediate_size % 2)) / 2) * 16)
+
+def get_num_columns(width, button_size):
+    """
+    Determine how many columns of application buttons fit in the given width.
+    """
+    return int((width - (width % button_size)) / button_size)
+
+def get_x_padding(width, button_size, num_columns):
+    """
+    Spread the space left over after fitting the columns evenly around each button.
+    """
+    return int((width % button_size) / num_columns / 2)
+
+def get_button_image_size(button_size):
+    """
+    The image takes up the top three quarters of an application button.
+    """
+    return int(button_size / 16) * 12
+
+def get_button_label_size(button_size):
+    """
+    The label takes up the bottom quarter of an application button.
+    """
+    return int(button_size / 16) * 4
+
+def get_button_font_size(label_height):
+    """
+    Based on the height of a button label, determine the optimal font size.
+    """
+    half_height = (label_height / 2)
+    return int(half_height - (half_height % 4))
+
+class ScreenLayout: #pylint: disable=too-few-public-methods, too-many-instance-attributes
+    """
+    All of the sizes the launcher needs, computed once from the screen size. The body is the area
+    below the menu bar, the frame is the notebook page to the right of the tabs, and the center is
+    the scrollable canvas inside the frame (which has a navigation trough on its right).
+    """
+    def __init__(self, screen_width, screen_height):
+        self.screen_width = int(screen_width)
+        self.screen_height = int(screen_height)
+        self.menu_height = get_menu_height(self.screen_height)
+        self.menu_font_size = get_menu_font_size(self.menu_height)
+        self.body_width = self.screen_width
+        self.body_height = self.screen_height - self.menu_height
+        self.nav_widget_size = get_nav_widget_size(self.body_width)
+        self.frame_width = self.body_width - self.nav_widget_size
+        self.frame_height = self.body_height
+        self.center_width = self.frame_width - (self.nav_widget_size * 2)
+        self.center_height = self.frame_height
+        self.button_size = derive_button_size(self.center_height)
+        self.button_image_size = get_button_image_size(self.button_size)
+        self.num_columns = max(1, get_num_columns(self.center_width, self.button_size))
+        self.x_padding = get_x_padding(self.center_width, self.button_size, self.num_columns)
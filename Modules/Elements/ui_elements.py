@@ -5,8 +5,10 @@ default theme to make it appear pretty.
 
 import tkinter
 import tkinter.ttk
-from PIL import ImageTk, Image
 import __main__
+import Modules.Cache.icon_cache as icon_cache
+import Modules.Elements.layout as layout
+import Modules.Profiling.startup_profiler as startup_profiler
 import Modules.Wifi.wifi_widget as wifi_widget
 import Modules.Bluetooth.bluetooth_widget as bluetooth_widget
 import Modules.Battery.battery_widget as battery_widget
@@ -15,14 +17,15 @@ class AppButton(tkinter.Frame): #pylint: disable=too-many-ancestors, too-many-in
     """
     This class defines a button, consisting of both a frame for the button itself containing an
     icon and a frame for the label. Sizes are defined by the parent which should derive them to
-    make things scalable.
+    make things scalable. The command is called when the icon is clicked. The button keeps the
+    image it shows, since Tk only holds its name and drops the image once Python lets go of it.
     """
-    def __init__(self, parent, imagefile, appname, button_size):
+    def __init__(self, parent, imagefile, appname, button_size, command=None): #pylint: disable=too-many-arguments
         super().__init__(parent)
         self.parent = parent
-        self.parent.update_idletasks()
         self.name = appname
         self.button_width = button_size
+        self.image = imagefile
         self.get_element_sizes()
         self.get_font_size()
         self.configure(background=self.parent['background'])
@@ -34,48 +37,65 @@ class AppButton(tkinter.Frame): #pylint: disable=too-many-ancestors, too-many-in
         self.text_frame.pack(side="bottom", expand=True)
         self.icon = tkinter.Button(self.image_frame, bd=0, background=self.parent['background'],
                                    activebackground=self.parent['background'], image=imagefile,
-                                   height=self.image_height, width=self.button_width)
+                                   height=self.image_height, width=self.button_width,
+                                   command=command)
         self.icon.place(relx=0.5, rely=0.5, anchor="center")
         self.label = tkinter.Label(self.text_frame, bd=0, background=self.parent['background'],
                                    foreground="white", text=self.name,
                                    font=("default", self.font_size), height=self.label_height,
                                    width=self.button_width)
         self.label.place(relx=0.5, rely=0.5, anchor="center")
-        self.update()
+
+    def set_application(self, imagefile, appname, command=None):
+        """
+        Show a different application on this button, so that buttons can be recycled instead of
+        building new ones.
+        """
+        if appname != self.name:
+            self.name = appname
+            self.label.configure(text=self.name)
+        self.image = imagefile
+        self.icon.configure(image=imagefile, command=command or '')
+
+    def set_icon(self, imagefile):
+        """
+        Show a different icon on this button, keeping hold of it for as long as it is shown.
+        """
+        self.image = imagefile
+        self.icon.configure(image=imagefile)
 
     def get_element_sizes(self):
         """
         Based on the size passed to the widget, determine the image and label sizes.
         """
-        self.image_height = (int(self.button_width/16) * 12)
-        self.label_height = (int(self.button_width / 16) * 4)
+        self.image_height = layout.get_button_image_size(self.button_width)
+        self.label_height = layout.get_button_label_size(self.button_width)
 
     def get_font_size(self):
         """
         Based on the size of the label, determine the optimal font size.
         """
-        half_height = (self.label_height / 2)
-        self.font_size = int(half_height - (half_height % 4))
+        self.font_size = layout.get_button_font_size(self.label_height)
 
 class MenuBar(tkinter.Frame): #pylint: disable=too-many-ancestors
     """
     Create a menu bar that is broken up into a left frame with left justified icons, a right frame
     that is broken up into right justified icons, and a center frame that contains the title of
-    the active application screen.
+    the active application screen. All sizes come from the screen layout.
     """
-    def __init__(self, parent):
+    def __init__(self, parent, screen_layout):
         super().__init__(parent)
         self.parent = parent
+        self.screen_layout = screen_layout
         self.configure(background=self.parent['background'])
-        self.configure(height=self.get_menu_height())
-        self.configure(width=self.parent.winfo_width())
-        self.update()
+        self.configure(height=self.screen_layout.menu_height)
+        self.configure(width=self.screen_layout.screen_width)
         self.left_submenu = tkinter.Frame(self, background=self.parent['background'],
-                                          height=self.get_menu_height())
+                                          height=self.screen_layout.menu_height)
         self.right_submenu = tkinter.Frame(self, background=self.parent['background'],
-                                           height=self.get_menu_height())
+                                           height=self.screen_layout.menu_height)
         self.center_submenu = tkinter.Frame(self, background=self.parent['background'],
-                                            height=self.get_menu_height(),
+                                            height=self.screen_layout.menu_height,
                                             width=round(self['width']/3))
         self.left_submenu.pack(side="left", fill="both", expand=True)
         self.right_submenu.pack(side="right", fill="both", expand=True)
@@ -84,51 +104,50 @@ class MenuBar(tkinter.Frame): #pylint: disable=too-many-ancestors
         self.right_widgets = []
         self.title = tkinter.Label(self.center_submenu,
                                    background=self.center_submenu['background'],
-                                   font=("default", self.get_font_size()))
+                                   font=("default", self.screen_layout.menu_font_size))
         self.title.place(relx=0.5, rely=0.5, anchor="center")
         self.add_widgets()
-        self.update()
 
     def add_widgets(self):
         """
         Add widgets to the menubar. I don't care why the fail to load (as there's probably a
-        million reasons they would fail), but if they fail let's not display them at all.
+        million reasons they would fail), but if they fail let's not display them at all. The
+        status widgets probe for their hardware in the background and show a placeholder until
+        they know, hiding themselves if it turns out not to be there. They come back with a
+        <<StatusIconShown>> event if it turns up later.
         """
         try:
-            self.right_widgets.append(wifi_widget.WifiIcon(self.right_submenu))
+            with startup_profiler.phase('MenuBar wifi'):
+                self.right_widgets.append(wifi_widget.WifiIcon(self.right_submenu))
         except: #pylint: disable=bare-except
             print("Could Not Detect Wifi")
         try:
-            self.right_widgets.append(bluetooth_widget.BluetoothIcon(self.right_submenu))
+            with startup_profiler.phase('MenuBar bluetooth'):
+                self.right_widgets.append(bluetooth_widget.BluetoothIcon(self.right_submenu))
         except: #pylint: disable=bare-except
             print("Could Not Detect Bluetooth")
         try:
-            self.left_widgets.append(battery_widget.BatteryIcon(self.left_submenu))
+            with startup_profiler.phase('MenuBar battery'):
+                self.left_widgets.append(battery_widget.BatteryIcon(self.left_submenu))
         except: #pylint: disable=bare-except
             print("Could Not Detect Battery")
-        for widget in self.right_widgets:
-            widget.pack(side="right")
-        for widget in self.left_widgets:
-            widget.pack(side="left")
+        for widget in self.right_widgets + self.left_widgets:
+            widget.bind('<<StatusIconShown>>', self.pack_widgets, add='+')
+        self.pack_widgets()
 
-    def get_menu_height(self):
-        """
-        Derive the height of the menu based on the screen size (which should be the root window).
+    def pack_widgets(self, event=None): #pylint: disable=unused-argument
         """
-        height = self.parent['height']
-        menu_height = round((height * 0.1) / 16) * 16
-        if menu_height > 96:
-            menu_height = 96
-        if menu_height < 32:
-            menu_height = 32
-        return menu_height
-
-    def get_font_size(self):
+        Pack the status widgets that aren't missing. They are all packed again in order whenever
+        one of them comes back, as packing it on its own would put it at the end of the row.
         """
-        Derive the font size from the given menu height.
-        """
-        menu_height = self.get_menu_height()
-        return int(menu_height / 16) * 8
+        for widget in self.right_widgets + self.left_widgets:
+            widget.pack_forget()
+        for widget in self.right_widgets:
+            if not widget.missing:
+                widget.pack(side="right")
+        for widget in self.left_widgets:
+            if not widget.missing:
+                widget.pack(side="left")
 
 class PrettyScale(tkinter.ttk.Scale): #pylint: disable=too-many-ancestors
     """
@@ -138,10 +157,8 @@ class PrettyScale(tkinter.ttk.Scale): #pylint: disable=too-many-ancestors
     def __init__(self, parent):
         super().__init__(parent, orient="horizontal")
         self.parent = parent
-        self.update()
         self.configure(style="custom.Horizontal.TScale")
         self.configure(length=int(self.parent['width']*0.6))
-        self.update()
 
 class CustomStyle(tkinter.ttk.Style): #pylint: disable=too-many-ancestors
     """
@@ -151,10 +168,9 @@ class CustomStyle(tkinter.ttk.Style): #pylint: disable=too-many-ancestors
         super().__init__(parent)
         self.parent = parent
         self.theme_use('default')
-        self.img_slider = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-                        "/Modules/Elements/circle.png").convert('RGBA').resize((32, 32)))
-        self.img_trough = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-                        "/Modules/Elements/slider.png").convert('RGBA'))
+        atlas = icon_cache.SpriteAtlas(__main__.DIR_PATH + "/Modules/Elements", "elements")
+        self.img_slider = atlas.get_icon("circle", 32)
+        self.img_trough = atlas.get_icon("slider")
         self.element_create('custom.Horizontal.Scale.slider', 'image', self.img_slider,
                             ('active', self.img_slider))
         self.element_create('custom.Vertical.Scrollbar.thumb', 'image', self.img_slider,
@@ -223,4 +239,3 @@ class LauncherFrame(tkinter.Frame): #pylint: disable=too-many-ancestors, too-man
         self.nav_right_top.pack(expand=True, side="top")
         self.nav_right_bottom.pack(expand=True, side="bottom")
         self.nav_right_trough.pack(expand=True, side="top")
-        self.update()
@@ -0,0 +1,213 @@
+"""
+This module decides when the launcher is idle. There is no point in redrawing status icons that
+nobody can see, so while the launcher is idle the dispatcher is paused: updates from the DBus
+thread (and the icon loader) are held back, keeping only the latest one for each widget, and
+nothing wakes the main loop for them. When the launcher wakes up again everything that was held
+back is run at once, so the screen catches up with the current state in a single pass.
+
+The launcher is idle while any of these hold:
+
+- the backlight is off (its brightness is 0, or bl_power says it's powered down),
+- the launcher window is unmapped or completely covered by another window,
+- there has been no input for IDLE_TIMEOUT_MS.
+
+Changes to the backlight brightness are watched through sysfs notifications and the window
+through Tk events. Input idle time comes from the X screensaver extension (tk inactive) where
+there is one, and from watching our own input events where there isn't, and is checked every
+IDLE_CHECK_MS, but only while the launcher is awake: while idle there are no timers at all.
+"""
+
+import os
+import time
+import tkinter
+import Modules.DBus.dispatcher as dispatcher
+
+IDLE_TIMEOUT_MS = 60000
+IDLE_CHECK_MS = 15000
+BACKLIGHT_DIR = '/sys/class/backlight'
+FB_BLANK_POWERDOWN = 4
+
+def read_attribute(handle):
+    """
+    Read an integer sysfs attribute from an open file, or None if it can't be read.
+    """
+    try:
+        return int(os.pread(handle, 32, 0))
+    except (OSError, ValueError):
+        return None
+
+def open_attribute(path):
+    """
+    Open a sysfs attribute for reading, or return None if it doesn't exist.
+    """
+    try:
+        return os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+
+class IdleMonitor:
+    """
+    Tracks the reasons the launcher is idle ("backlight", "hidden" and "input") and pauses the
+    dispatcher while there are any.
+    """
+    def __init__(self, timeout_ms=IDLE_TIMEOUT_MS, check_ms=IDLE_CHECK_MS):
+        self.timeout_ms = timeout_ms
+        self.check_ms = check_ms
+        self.root = None
+        self.reasons = set()
+        self.check_id = None
+        self.last_input = time.monotonic()
+        self.brightness_fd = None
+        self.power_fd = None
+        self.idle_since = None
+        self.counters = {'idle_periods': 0, 'idle_ms': 0}
+
+    def attach(self, root):
+        """
+        Start watching the Tk root, its input and the backlight.
+        """
+        self.root = root
+        self.root.bind('<Map>', self.mapped, add='+')
+        self.root.bind('<Unmap>', self.unmapped, add='+')
+        self.root.bind('<Visibility>', self.visibility_changed, add='+')
+        for sequence in ('<Motion>', '<ButtonPress>', '<KeyPress>'):
+            self.root.bind(sequence, self.input_received, add='+')
+        self.watch_backlight()
+        self.schedule_check()
+
+    def watch_backlight(self):
+        """
+        Open the brightness and power attributes of the first backlight, and watch the brightness
+        for changes.
+        """
+        try:
+            name = sorted(os.listdir(BACKLIGHT_DIR))[0]
+        except (OSError, IndexError):
+            return
+        self.brightness_fd = open_attribute(os.path.join(BACKLIGHT_DIR, name,
+                                                         'actual_brightness'))
+        self.power_fd = open_attribute(os.path.join(BACKLIGHT_DIR, name, 'bl_power'))
+        if self.brightness_fd is None:
+            return
+        try:
+            self.root.tk.createfilehandler(self.brightness_fd, tkinter.EXCEPTION,
+                                           self.backlight_changed)
+        except (AttributeError, tkinter.TclError):
+            pass
+        self.backlight_changed()
+
+    def is_backlight_off(self):
+        """
+        Whether the backlight is off, as far as sysfs can tell us.
+        """
+        if self.power_fd is not None and read_attribute(self.power_fd) == FB_BLANK_POWERDOWN:
+            return True
+        return self.brightness_fd is not None and read_attribute(self.brightness_fd) == 0
+
+    def backlight_changed(self, handle=None, mask=None): #pylint: disable=unused-argument
+        """
+        File handler callback, run when the backlight brightness changed.
+        """
+        self.set_reason('backlight', self.is_backlight_off())
+
+    def mapped(self, event):
+        """
+        The launcher window was mapped.
+        """
+        if event.widget is self.root:
+            self.set_reason('hidden', False)
+
+    def unmapped(self, event):
+        """
+        The launcher window was unmapped.
+        """
+        if event.widget is self.root:
+            self.set_reason('hidden', True)
+
+    def visibility_changed(self, event):
+        """
+        The launcher window was covered or uncovered by another window.
+        """
+        if event.widget is self.root:
+            self.set_reason('hidden', event.state == 'VisibilityFullyObscured')
+
+    def input_received(self, event=None): #pylint: disable=unused-argument
+        """
+        Any input on the launcher wakes it up.
+        """
+        self.last_input = time.monotonic()
+        if 'input' in self.reasons:
+            self.set_reason('input', False)
+
+    def get_input_idle_ms(self):
+        """
+        How long it has been since the last input, from the X screensaver extension if we can.
+        """
+        try:
+            inactive = int(self.root.tk.call('tk', 'inactive'))
+        except (tkinter.TclError, ValueError):
+            inactive = -1
+        if inactive >= 0:
+            return inactive
+        return (time.monotonic() - self.last_input) * 1000
+
+    def schedule_check(self):
+        """
+        Check the input idle time and the backlight power later, unless that's already due.
+        """
+        if self.root is not None and self.check_id is None:
+            self.check_id = self.root.after(self.check_ms, self.check)
+
+    def check(self):
+        """
+        The periodic check, which only runs while the launcher is awake. bl_power isn't notified
+        by the kernel, so it's read here too.
+        """
+        self.check_id = None
+        self.set_reason('backlight', self.is_backlight_off())
+        if self.get_input_idle_ms() >= self.timeout_ms:
+            self.set_reason('input', True)
+        if not self.reasons:
+            self.schedule_check()
+
+    def set_reason(self, reason, active):
+        """
+        Add or remove a reason for being idle, pausing or resuming the dispatcher when the first
+        reason appears or the last one goes away.
+        """
+        was_idle = bool(self.reasons)
+        if active:
+            self.reasons.add(reason)
+        else:
+            self.reasons.discard(reason)
+        if self.reasons and not was_idle:
+            self.idle_since = time.monotonic()
+            self.counters['idle_periods'] += 1
+            if self.check_id is not None:
+                self.root.after_cancel(self.check_id)
+                self.check_id = None
+            dispatcher.DISPATCHER.pause()
+        elif was_idle and not self.reasons:
+            self.counters['idle_ms'] += int((time.monotonic() - self.idle_since) * 1000)
+            self.idle_since = None
+            self.last_input = time.monotonic()
+            dispatcher.DISPATCHER.resume()
+            self.schedule_check()
+
+    def is_idle(self):
+        """
+        Whether the launcher is idle right now.
+        """
+        return bool(self.reasons)
+
+    def get_counters(self):
+        """
+        Return a copy of the idle counters: how many times the launcher went idle and how long
+        it has been idle in total, in milliseconds.
+        """
+        counters = dict(self.counters)
+        if self.idle_since is not None:
+            counters['idle_ms'] += int((time.monotonic() - self.idle_since) * 1000)
+        return counters
+
+IDLE_MONITOR = IdleMonitor()
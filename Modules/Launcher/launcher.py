@@ -7,8 +7,9 @@ settings menu.
 
 import tkinter
 import tkinter.ttk
-from PIL import ImageTk, Image
 import __main__
+import Modules.Cache.icon_cache as icon_cache
+import Modules.Profiling.startup_profiler as startup_profiler
 import Modules.Applications.applications as applications
 import Modules.Settings.settings as settings
 
@@ -16,19 +17,23 @@ class MainAppWindow(tkinter.Frame): #pylint: disable=too-many-ancestors, too-man
     """
     The MainAppWindow is a frame that contains a notebook style widget. This allows us to easily
     switch between our settings and applications "tabs". We draw our applications to the various
-    frames we register, and use the icons to switch between them.
+    frames we register, and use the icons to switch between them. With lazy_settings enabled the
+    settings tab is only a placeholder until it is first selected (or until the launcher goes idle
+    after the first paint, if preload_settings is also enabled), so none of the settings code runs
+    before the launcher is on screen. The grid_mode is passed on to the ApplicationsFrame.
     """
-    def __init__(self, parent):
+    def __init__(self, parent, screen_layout, lazy_settings=True, preload_settings=False, #pylint: disable=too-many-arguments
+                 grid_mode=applications.GRID_MODES[0]):
         super().__init__(parent)
         self.parent = parent
-        self.parent.update()
-        self.get_nav_widget_size()
-        self.appsimage = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Launcher/app.png").convert('RGBA').resize((self.nav_widget_size,
-                                                                 self.nav_widget_size)))
-        self.settingsimage = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Launcher/settings.png").convert('RGBA').resize((self.nav_widget_size,
-                                                                      self.nav_widget_size)))
+        self.screen_layout = screen_layout
+        self.nav_widget_size = self.screen_layout.nav_widget_size
+        self.frame_width = self.screen_layout.frame_width
+        self.frame_height = self.screen_layout.frame_height
+        self.appsimage = icon_cache.load_icon(__main__.DIR_PATH + "/Modules/Launcher/app.png",
+                                              self.nav_widget_size)
+        self.settingsimage = icon_cache.load_icon(__main__.DIR_PATH + \
+            "/Modules/Launcher/settings.png", self.nav_widget_size)
         self.notebook = tkinter.ttk.Notebook(parent, style='TNotebook', padding=(0, 0, 0, 0),
                                              width=self.parent['width'],
                                              height=self.parent['height'])
@@ -45,31 +50,27 @@ class MainAppWindow(tkinter.Frame): #pylint: disable=too-many-ancestors, too-man
         self.notebook.add(self.settingstab, image=self.settingsimage)
         self.tabs[1] = "Settings"
         self.notebook.pack()
-        self.notebook.update()
-        self.appwindow = applications.ApplicationsFrame(self.appstab, self.nav_widget_size,
-                                                        width=self.frame_width,
-                                                        height=self.frame_height)
-        self.settingswindow = settings.SettingsFrame(self.settingstab, self.nav_widget_size,
-                                                     width=self.frame_width,
-                                                     height=self.frame_height)
+        with startup_profiler.phase('icon grid'):
+            self.appwindow = applications.ApplicationsFrame(self.appstab, self.screen_layout,
+                                                            grid_mode)
         self.appwindow.pack()
-        self.settingswindow.pack()
+        self.settingswindow = None
+        if not lazy_settings:
+            self.build_settings_tab()
+        elif preload_settings:
+            self.after_idle(self.after, 1, self.build_settings_tab)
         self.notebook.bind('<<NotebookTabChanged>>', self.get_active_tab_name)
-        self.update()
 
-    def get_nav_widget_size(self):
+    def build_settings_tab(self):
         """
-        Derive the size of the navigation widgets (used to determine the left and right margins).
+        Build the real settings frame on the placeholder tab. This is safe to call more than once,
+        only the first call does anything.
         """
-        width = self.parent['width']
-        widget_width = round((width * 0.08) / 16) * 16
-        if widget_width > 96:
-            widget_width = 96
-        if widget_width < 32:
-            widget_width = 32
-        self.nav_widget_size = widget_width
-        self.frame_width = int(self.parent['width'] - self.nav_widget_size)
-        self.frame_height = int(self.parent['height'])
+        if self.settingswindow is not None:
+            return
+        with startup_profiler.phase('settings tab'):
+            self.settingswindow = settings.SettingsFrame(self.settingstab, self.screen_layout)
+        self.settingswindow.pack()
 
     def get_active_tab_name(self, event): #pylint: disable=unused-argument
         """
@@ -80,6 +81,8 @@ class MainAppWindow(tkinter.Frame): #pylint: disable=too-many-ancestors, too-man
         self.activetab = int(self.notebook.index(self.notebook.select()))
         if self.activetab == 0:
             self.active_tab_name = "Apps"
+            self.appwindow.clear_search()
         if self.activetab == 1:
             self.active_tab_name = "Settings"
+            self.build_settings_tab()
         __main__.MAINAPP.menu.title.config(text=self.active_tab_name, fg="white")
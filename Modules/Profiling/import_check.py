@@ -0,0 +1,67 @@
+"""
+This module is the import self-check (main.py --import-check). With deferred imports the launcher
+paints its root window before PIL, dbus, gi or any of the UI modules are loaded, and imports them
+afterwards. The self-check makes sure that is still true, since a stray import at the top of a
+light module is enough to pull one of them in early, and then imports the deferred modules one at
+a time and reports how long each took, so we know where the time goes on the device.
+
+Like the startup profiler this must stay free of heavy imports.
+"""
+
+import sys
+import time
+import importlib
+
+#The packages that must not be loaded before the first paint.
+HEAVY_PACKAGES = ('PIL', 'dbus', 'gi')
+
+#The modules the launcher imports after the first paint, in the order it imports them. Each one
+#is timed including whatever it imports that wasn't loaded already.
+DEFERRED_MODULES = ('PIL.Image', 'PIL.ImageTk', 'dbus', 'gi.repository.GLib',
+                    'Modules.DBus.dbus_main', 'Modules.Cache.icon_cache',
+                    'Modules.Elements.ui_elements', 'Modules.Applications.applications',
+                    'Modules.Settings.settings', 'Modules.Launcher.launcher')
+
+def get_loaded_heavy_packages():
+    """
+    List the heavy packages that have already been imported.
+    """
+    return [package for package in HEAVY_PACKAGES if package in sys.modules]
+
+def time_import(module):
+    """
+    Import a module, returning how long it took in milliseconds, how many modules were loaded
+    along with it and the error if it couldn't be imported.
+    """
+    loaded = len(sys.modules)
+    start = time.perf_counter()
+    try:
+        importlib.import_module(module)
+        error = None
+    except: #pylint: disable=bare-except
+        error = sys.exc_info()[1]
+    return (time.perf_counter() - start) * 1000, len(sys.modules) - loaded, error
+
+def run(early_packages, modules=DEFERRED_MODULES):
+    """
+    Print the self-check report: which heavy packages were loaded before the first paint (there
+    should be none) and the import time of each deferred module. Returns the exit status, which
+    is non-zero if a heavy package was loaded early or a module couldn't be imported.
+    """
+    status = 0
+    if early_packages:
+        print("Imported before the first paint: " + ", ".join(early_packages))
+        status = 1
+    else:
+        print("Nothing heavy was imported before the first paint")
+    total = 0
+    for module in modules:
+        elapsed, count, error = time_import(module)
+        total += elapsed
+        if error is not None:
+            print("%-36s failed: %s" % (module, error))
+            status = 1
+            continue
+        print("%-36s %9.3f ms  %4d modules" % (module, elapsed, count))
+    print("%-36s %9.3f ms" % ("total", total))
+    return status
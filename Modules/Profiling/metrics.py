@@ -0,0 +1,239 @@
+"""
+This module is the runtime metrics registry, for finding out in the field what the launcher is
+spending its time on. Counters are kept in groups (DBus signals per match rule and per subscriber,
+select_image calls and image swaps per widget, Tk callbacks and update() calls, image decodes and
+so on), and other modules can register providers for counters they already keep (such as the
+dispatcher). A snapshot also includes the resident set size of the process.
+
+Once attached to the Tk root the registry can be read in two ways, with the snapshot always taken
+on the Tk loop so providers never run on another thread:
+
+- SIGUSR1 writes a snapshot to metrics.json in the cache directory.
+- Connecting to the Unix socket metrics.sock in the runtime directory returns a snapshot and
+  closes the connection (tools/read_metrics.py does this). The snapshot is sent from a
+  short-lived thread, so a slow client never holds up the Tk loop.
+
+Counting is always on, and cheap enough to leave in the hot paths. Like the startup profiler this
+module must stay free of heavy imports.
+"""
+
+import os
+import json
+import time
+import signal
+import socket
+import tempfile
+import tkinter
+from threading import Lock, Thread
+
+def get_metrics_paths():
+    """
+    Get the paths of the SIGUSR1 dump file (in the cache directory) and of the socket (in the
+    runtime directory, falling back to the cache directory).
+    """
+    cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                             os.path.join(os.path.expanduser('~'), '.cache'), 'pocket-menu')
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    runtime_dir = os.path.join(runtime_dir, 'pocket-menu') if runtime_dir else cache_dir
+    return os.path.join(cache_dir, 'metrics.json'), os.path.join(runtime_dir, 'metrics.sock')
+
+def get_rss_kb():
+    """
+    Get the resident set size of this process in KiB, or None if it can't be read.
+    """
+    try:
+        with open('/proc/self/statm', encoding='ascii') as statmfile:
+            pages = int(statmfile.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+class Metrics: #pylint: disable=too-many-instance-attributes
+    """
+    The registry. count can be called from any thread.
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.groups = {}
+        self.providers = {}
+        self.started = time.monotonic()
+        self.root = None
+        self.signal_pipe = None
+        self.server = None
+        self.tk_counted = False
+
+    def count(self, group, name, amount=1):
+        """
+        Add to a counter.
+        """
+        with self.lock:
+            counters = self.groups.setdefault(group, {})
+            counters[name] = counters.get(name, 0) + amount
+
+    def add_provider(self, name, callback):
+        """
+        Have a snapshot include whatever callback() returns under the given name.
+        """
+        self.providers[name] = callback
+
+    def get_snapshot(self):
+        """
+        Take a snapshot of every counter, every provider and the RSS.
+        """
+        with self.lock:
+            groups = {group: dict(counters) for group, counters in self.groups.items()}
+        snapshot = {'version': 1,
+                    'pid': os.getpid(),
+                    'time': time.time(),
+                    'uptime_s': round(time.monotonic() - self.started, 3),
+                    'rss_kb': get_rss_kb(),
+                    'counters': groups}
+        for name, callback in self.providers.items():
+            try:
+                snapshot[name] = callback()
+            except: #pylint: disable=bare-except
+                snapshot[name] = None
+        return snapshot
+
+    def install_tk_counters(self):
+        """
+        Wrap tkinter so every callback from Tk into python (event bindings, widget commands and
+        after callbacks) and every update() and update_idletasks() call is counted. Tk calls each
+        registered callback through a CallWrapper, and __call__ is looked up on the class at call
+        time, so callbacks registered before this (the widgets are built before attach) are
+        counted too. File handlers are not: Tk calls them directly, without a CallWrapper, so
+        dispatcher wake-ups (which the dispatcher counts itself), launch exits and backlight
+        changes don't show up here. Installing twice does nothing.
+        """
+        if self.tk_counted:
+            return
+        self.tk_counted = True
+        original_call = tkinter.CallWrapper.__call__
+        original_update = tkinter.Misc.update
+        original_update_idletasks = tkinter.Misc.update_idletasks
+        metrics = self
+
+        def counted_call(self, *args):
+            metrics.count('tk', 'callbacks')
+            return original_call(self, *args)
+
+        def counted_update(self):
+            metrics.count('tk', 'update_calls')
+            return original_update(self)
+
+        def counted_update_idletasks(self):
+            metrics.count('tk', 'update_idletasks_calls')
+            return original_update_idletasks(self)
+
+        tkinter.CallWrapper.__call__ = counted_call
+        tkinter.Misc.update = counted_update
+        tkinter.Misc.update_idletasks = counted_update_idletasks
+
+    def attach(self, root):
+        """
+        Start counting Tk callbacks, and serve snapshots on SIGUSR1 and the socket from the loop
+        of the given Tk root. This must be called from the main thread.
+        """
+        self.root = root
+        self.install_tk_counters()
+        self.handle_signals()
+        self.serve()
+
+    def handle_signals(self):
+        """
+        Dump a snapshot on SIGUSR1. Python signal handlers only run once the interpreter gets
+        control back, which it doesn't while Tk is waiting for events, so the signal is also
+        written to a pipe the Tk loop is watching, and the dump happens from there.
+        """
+        try:
+            self.signal_pipe = os.pipe()
+            os.set_blocking(self.signal_pipe[0], False)
+            os.set_blocking(self.signal_pipe[1], False)
+            signal.signal(signal.SIGUSR1, lambda number, frame: None)
+            signal.set_wakeup_fd(self.signal_pipe[1])
+            self.root.tk.createfilehandler(self.signal_pipe[0], tkinter.READABLE,
+                                           self.signal_received)
+        except (AttributeError, OSError, ValueError, tkinter.TclError):
+            print("Cannot dump metrics on SIGUSR1")
+
+    def signal_received(self, handle, mask): #pylint: disable=unused-argument
+        """
+        File handler callback, run when a signal was written to the pipe.
+        """
+        try:
+            numbers = os.read(handle, 64)
+        except OSError:
+            return
+        if signal.SIGUSR1 in numbers:
+            self.dump()
+
+    def dump(self):
+        """
+        Write a snapshot to the dump file.
+        """
+        dump_path = get_metrics_paths()[0]
+        try:
+            os.makedirs(os.path.dirname(dump_path), exist_ok=True)
+            handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(dump_path), suffix='.tmp')
+            with os.fdopen(handle, 'w', encoding='utf-8') as dumpfile:
+                json.dump(self.get_snapshot(), dumpfile, indent=1, sort_keys=True)
+            os.replace(temp_path, dump_path)
+        except OSError as error:
+            print("Could not write metrics: " + str(error))
+            return
+        print("Metrics written to " + dump_path)
+
+    def serve(self):
+        """
+        Listen on the metrics socket, replacing any socket left behind by an earlier run.
+        """
+        socket_path = get_metrics_paths()[1]
+        try:
+            os.makedirs(os.path.dirname(socket_path), mode=0o700, exist_ok=True)
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(socket_path)
+            os.chmod(socket_path, 0o600)
+            self.server.listen(4)
+            self.server.setblocking(False)
+            self.root.tk.createfilehandler(self.server.fileno(), tkinter.READABLE,
+                                           self.client_connected)
+        except (AttributeError, OSError, tkinter.TclError):
+            print("Cannot serve metrics on " + socket_path)
+            if self.server is not None:
+                self.server.close()
+                self.server = None
+
+    def client_connected(self, handle, mask): #pylint: disable=unused-argument
+        """
+        File handler callback, run when a client connects to the socket. The snapshot is taken
+        here, and handed to a thread of its own to send.
+        """
+        try:
+            client, _ = self.server.accept()
+        except OSError:
+            return
+        data = json.dumps(self.get_snapshot(), sort_keys=True).encode() + b'\n'
+        Thread(target=send_snapshot, args=(client, data), name='metrics-client',
+               daemon=True).start()
+
+def send_snapshot(client, data):
+    """
+    Send a snapshot to a client of the metrics socket and close the connection, giving up on
+    clients that don't read it within a second.
+    """
+    with client:
+        try:
+            client.settimeout(1)
+            client.sendall(data)
+        except OSError:
+            pass
+
+METRICS = Metrics()
+
+def count(group, name, amount=1):
+    """
+    Add to a counter of the shared registry, see Metrics.count.
+    """
+    METRICS.count(group, name, amount)
@@ -0,0 +1,138 @@
+"""
+This module is the startup profiler. When it is enabled (main.py --profile-startup) each phase of
+starting up is timestamped along with how many images were decoded and how many times update()
+was called during it, and a JSON report is written when the launcher exits. When it is not
+enabled every call in here is close to free, so the phase markers can stay in the code.
+
+This module must stay free of heavy imports, since it is loaded before anything else.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import contextlib
+import tkinter
+from threading import Lock
+
+_STATE = {'enabled': False, 'output': None, 'start': None, 'depth': 0}
+PHASES = []
+MARKS = {}
+COUNTERS = {'image_decodes': 0, 'update_calls': 0}
+#Images are decoded on the icon loader threads too, so the counters are only touched under this.
+COUNTERS_LOCK = Lock()
+
+def is_enabled():
+    """
+    Return True if startup profiling has been switched on.
+    """
+    return _STATE['enabled']
+
+def get_elapsed():
+    """
+    Milliseconds elapsed since the profiler was enabled.
+    """
+    return (time.perf_counter() - _STATE['start']) * 1000
+
+def enable(output_path):
+    """
+    Switch on startup profiling. The report is written to output_path when the program exits.
+    """
+    if _STATE['enabled']:
+        return
+    _STATE['enabled'] = True
+    _STATE['output'] = output_path
+    _STATE['start'] = time.perf_counter()
+    install_update_counter()
+    atexit.register(write_report)
+
+def install_update_counter():
+    """
+    Wrap tkinter's update() and update_idletasks() so we can count how often they are called.
+    """
+    original_update = tkinter.Misc.update
+    original_update_idletasks = tkinter.Misc.update_idletasks
+
+    def counted_update(self):
+        count('update_calls')
+        return original_update(self)
+
+    def counted_update_idletasks(self):
+        count('update_calls')
+        return original_update_idletasks(self)
+
+    tkinter.Misc.update = counted_update
+    tkinter.Misc.update_idletasks = counted_update_idletasks
+
+def count(name, amount=1):
+    """
+    Increment one of the profiler counters. This can be called from any thread.
+    """
+    with COUNTERS_LOCK:
+        COUNTERS[name] = COUNTERS.get(name, 0) + amount
+
+def get_counters():
+    """
+    Get a copy of the profiler counters.
+    """
+    with COUNTERS_LOCK:
+        return dict(COUNTERS)
+
+@contextlib.contextmanager
+def _timed_phase(name):
+    """
+    Record how long the body of the with statement took, and how much the counters moved.
+    """
+    start = get_elapsed()
+    counters = get_counters()
+    record = {'name': name, 'depth': _STATE['depth'], 'start_ms': round(start, 3)}
+    PHASES.append(record)
+    _STATE['depth'] += 1
+    try:
+        yield
+    finally:
+        _STATE['depth'] -= 1
+        record['duration_ms'] = round(get_elapsed() - start, 3)
+        for counter, value in get_counters().items():
+            record[counter] = value - counters.get(counter, 0)
+
+def phase(name):
+    """
+    Mark a phase of startup, to be used as a with statement. Phases can be nested.
+    """
+    if not _STATE['enabled']:
+        return contextlib.nullcontext()
+    return _timed_phase(name)
+
+def mark(name):
+    """
+    Record a single point in time, such as when the main loop first goes idle. Only the first
+    occurrence of each mark is kept.
+    """
+    if _STATE['enabled'] and name not in MARKS:
+        MARKS[name] = round(get_elapsed(), 3)
+
+def get_report():
+    """
+    Build the report as a dictionary.
+    """
+    return {'version': 1,
+            'python': sys.version.split()[0],
+            'pid': os.getpid(),
+            'total_ms': round(get_elapsed(), 3),
+            'phases': PHASES,
+            'marks': MARKS,
+            'counters': get_counters()}
+
+def write_report():
+    """
+    Write the JSON report to the output file given when the profiler was enabled.
+    """
+    if not _STATE['enabled']:
+        return
+    try:
+        with open(_STATE['output'], 'w', encoding='utf-8') as reportfile:
+            json.dump(get_report(), reportfile, indent=1)
+    except OSError as error:
+        print("Could not write startup profile: " + str(error))
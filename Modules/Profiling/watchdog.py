@@ -0,0 +1,201 @@
+"""
+This module is the stall watchdog (main.py --watchdog). Anything slow done from a Tk callback, such
+as a blocking DBus call, freezes the whole launcher until it returns, and on a real device it is
+hard to tell which call it was. The watchdog finds out:
+
+- A heartbeat on the Tk loop runs every HEARTBEAT_MS and measures how late it ran. When it was
+  late by STALL_THRESHOLD_MS or more, the loop was stalled for that long, and the stall is added
+  to a histogram of stall durations.
+- A helper thread wakes up whenever the next heartbeat is overdue by the threshold, and for as
+  long as it stays overdue samples the stack of the main thread every SAMPLE_MS. The stacks seen
+  most often are the calls that block the loop.
+
+After every stall the helper thread rewrites the log with the histogram, the most frequent stacks
+and the most recent stalls, and the log is written one last time when the launcher exits. The
+heartbeat keeps the loop from ever going fully idle, so this is only meant for diagnosing.
+
+Like the startup profiler this must stay free of heavy imports.
+"""
+
+import os
+import sys
+import time
+import atexit
+import linecache
+import tempfile
+import threading
+import traceback
+
+HEARTBEAT_MS = 50
+STALL_THRESHOLD_MS = 100
+SAMPLE_MS = 10
+#How many of the innermost frames of a sample make up its stack.
+STACK_DEPTH = 12
+#The upper bounds of the histogram buckets, in milliseconds. Longer stalls go in the last bucket.
+BUCKETS_MS = (250, 500, 1000, 2500, 5000)
+TOP_STACKS = 10
+RECENT_STALLS = 20
+
+class Watchdog:
+    """
+    The heartbeat, the sampling thread and what they found.
+    """
+    def __init__(self, threshold_ms=STALL_THRESHOLD_MS, heartbeat_ms=HEARTBEAT_MS,
+                 sample_ms=SAMPLE_MS):
+        self.threshold = threshold_ms / 1000
+        self.interval = heartbeat_ms / 1000
+        self.sample_interval = sample_ms / 1000
+        self.lock = threading.Lock()
+        self.root = None
+        self.log_path = None
+        self.main_thread_id = threading.main_thread().ident
+        self.expected = None
+        self.histogram = [0] * (len(BUCKETS_MS) + 1)
+        self.stacks = {}
+        self.stall_stacks = {}
+        self.recent = []
+        self.counters = {'heartbeats': 0, 'stalls': 0, 'stalled_ms': 0, 'max_lag_ms': 0,
+                         'samples': 0}
+        self.log_wanted = threading.Event()
+
+    def start(self, root, log_path, threshold_ms=None):
+        """
+        Start the heartbeat on the given Tk root and the sampling thread, writing the log to
+        log_path. This must be called from the main thread.
+        """
+        self.root = root
+        self.log_path = log_path
+        if threshold_ms is not None:
+            self.threshold = threshold_ms / 1000
+        with self.lock:
+            self.expected = time.monotonic() + self.interval
+        self.root.after(int(self.interval * 1000), self.heartbeat)
+        threading.Thread(target=self.sample_main_thread, name='watchdog', daemon=True).start()
+        atexit.register(self.write_log)
+
+    def heartbeat(self):
+        """
+        Tk timer callback. Measure how late this heartbeat ran and record a stall if it was late
+        by more than the threshold.
+        """
+        now = time.monotonic()
+        with self.lock:
+            lag = now - self.expected
+            self.expected = now + self.interval
+            self.counters['heartbeats'] += 1
+            lag_ms = int(lag * 1000)
+            self.counters['max_lag_ms'] = max(self.counters['max_lag_ms'], lag_ms)
+            if lag >= self.threshold:
+                self.record_stall(lag_ms)
+        self.root.after(int(self.interval * 1000), self.heartbeat)
+
+    def record_stall(self, lag_ms):
+        """
+        Add a stall to the histogram, and remember where it was spent. Called with the lock held.
+        """
+        self.counters['stalls'] += 1
+        self.counters['stalled_ms'] += lag_ms
+        bucket = 0
+        while bucket < len(BUCKETS_MS) and lag_ms > BUCKETS_MS[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+        top = max(self.stall_stacks.items(), key=lambda item: item[1], default=(None, 0))[0]
+        self.recent.append((time.time(), lag_ms, top))
+        del self.recent[:-RECENT_STALLS]
+        self.stall_stacks = {}
+        self.log_wanted.set()
+
+    def sample_main_thread(self):
+        """
+        The sampling thread. It sleeps until the next heartbeat would be overdue by the threshold,
+        then samples the main thread for as long as the heartbeat doesn't come.
+        """
+        while True:
+            with self.lock:
+                overdue = time.monotonic() - self.expected
+            if overdue < self.threshold:
+                time.sleep(max(self.threshold - overdue, self.sample_interval))
+            else:
+                self.take_sample()
+                time.sleep(self.sample_interval)
+            if self.log_wanted.is_set():
+                self.log_wanted.clear()
+                self.write_log()
+
+    def take_sample(self):
+        """
+        Record the innermost frames of the main thread's stack.
+        """
+        frame = sys._current_frames().get(self.main_thread_id) #pylint: disable=protected-access
+        if frame is None:
+            return
+        stack = tuple((summary.filename, summary.lineno, summary.name)
+                      for summary in traceback.extract_stack(frame, limit=STACK_DEPTH))
+        del frame
+        with self.lock:
+            self.counters['samples'] += 1
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.stall_stacks[stack] = self.stall_stacks.get(stack, 0) + 1
+
+    def get_counters(self):
+        """
+        Return a copy of the watchdog counters.
+        """
+        with self.lock:
+            return dict(self.counters)
+
+    def format_log(self):
+        """
+        Format the log: the counters, the stall histogram, the most frequent stacks and the most
+        recent stalls.
+        """
+        with self.lock:
+            counters = dict(self.counters)
+            histogram = list(self.histogram)
+            stacks = sorted(self.stacks.items(), key=lambda item: -item[1])[:TOP_STACKS]
+            recent = list(self.recent)
+        lines = ["Stall watchdog, pid %d, threshold %d ms, heartbeat %d ms, sampling every %d ms"
+                 % (os.getpid(), self.threshold * 1000, self.interval * 1000,
+                    self.sample_interval * 1000), ""]
+        lines.append("%(stalls)d stalls, %(stalled_ms)d ms stalled in total, longest lag "
+                     "%(max_lag_ms)d ms, %(heartbeats)d heartbeats, %(samples)d samples"
+                     % counters)
+        lines += ["", "Stall durations:"]
+        lower = self.threshold * 1000
+        for upper, stalls in zip(BUCKETS_MS + (None,), histogram):
+            label = "%5d - %5d ms" % (lower, upper) if upper else "%5d ms and up" % lower
+            lines.append("  %-16s %6d %s" % (label, stalls, '#' * min(stalls, 50)))
+            lower = upper
+        lines += ["", "Most frequent stacks (innermost call last):"]
+        for stack, samples in stacks:
+            lines.append("")
+            sampled_ms = samples * self.sample_interval * 1000
+            lines.append("  %d samples, about %d ms" % (samples, sampled_ms))
+            for filename, lineno, name in stack:
+                lines.append("    %s:%d in %s" % (filename, lineno, name))
+                source = linecache.getline(filename, lineno).strip()
+                if source:
+                    lines.append("      " + source)
+        lines += ["", "Most recent stalls:"]
+        for timestamp, lag_ms, stack in reversed(recent):
+            where = "%s:%d in %s" % stack[-1] if stack else "not sampled"
+            lines.append("  %s %6d ms  %s" % (time.strftime('%H:%M:%S', time.localtime(timestamp)),
+                                               lag_ms, where))
+        return "\n".join(lines) + "\n"
+
+    def write_log(self):
+        """
+        Replace the log with the current findings.
+        """
+        if self.log_path is None:
+            return
+        log_dir = os.path.dirname(os.path.abspath(self.log_path))
+        try:
+            handle, temp_path = tempfile.mkstemp(dir=log_dir, suffix='.tmp')
+            with os.fdopen(handle, 'w', encoding='utf-8') as logfile:
+                logfile.write(self.format_log())
+            os.replace(temp_path, self.log_path)
+        except OSError as error:
+            print("Could not write the watchdog log: " + str(error))
+
+WATCHDOG = Watchdog()
@@ -0,0 +1,170 @@
+"""
+This module is the volume control backend. The settings tab only talks to a mixer object, which
+gets and sets the playback volume as a percentage and hands out the file descriptors that become
+readable whenever the volume changes, so the volume slider can follow changes made elsewhere
+without polling.
+
+AlsaMixer drives an ALSA simple mixer control through pyalsaaudio (the python3-alsaaudio package)
+on the control device directly, so setting the volume is an ioctl rather than a subprocess.
+FakeMixer keeps the volume in memory and signals changes through a pipe, for testing the settings
+tab on machines without a sound card (set POCKET_MENU_MIXER=fake).
+"""
+
+import abc
+import os
+
+try:
+    import alsaaudio
+except: #pylint: disable=bare-except
+    alsaaudio = None
+
+#The ALSA controls to try, in order, if none is given.
+ALSA_CONTROLS = ('Master', 'PCM', 'Speaker', 'Headphone', 'Power Amplifier')
+
+class MixerBackend(abc.ABC):
+    """
+    The base class for the mixer backends. Volumes are percentages from 0 to 100.
+    """
+    @abc.abstractmethod
+    def get_volume(self):
+        """
+        Get the current playback volume.
+        """
+
+    @abc.abstractmethod
+    def set_volume(self, volume):
+        """
+        Set the playback volume.
+        """
+
+    def get_event_fds(self): #pylint: disable=no-self-use
+        """
+        Get the file descriptors that become readable when the volume changes. Backends that can't
+        tell us about changes return an empty list.
+        """
+        return []
+
+    def handle_events(self):
+        """
+        Acknowledge the change events once their file descriptors became readable.
+        """
+
+    def close(self):
+        """
+        Release the mixer.
+        """
+
+class AlsaMixer(MixerBackend):
+    """
+    A mixer backed by an ALSA simple mixer control. The volume of every channel is set together
+    and the volume of the first channel is reported.
+    """
+    def __init__(self, control=None, cardindex=-1):
+        if alsaaudio is None:
+            raise OSError("pyalsaaudio is not installed")
+        try:
+            controls = [control] if control else \
+                [name for name in ALSA_CONTROLS if name in alsaaudio.mixers(cardindex=cardindex)]
+            if not controls:
+                raise OSError("No playback volume control found")
+            self.mixer = alsaaudio.Mixer(controls[0], cardindex=cardindex)
+        except alsaaudio.ALSAAudioError as error:
+            raise OSError(str(error)) from error
+
+    def get_volume(self):
+        """
+        Get the current playback volume.
+        """
+        return int(self.mixer.getvolume()[0])
+
+    def set_volume(self, volume):
+        """
+        Set the playback volume of every channel.
+        """
+        self.mixer.setvolume(int(volume))
+
+    def get_event_fds(self):
+        """
+        The ALSA control device becomes readable when any control on the card changes. Older
+        versions of pyalsaaudio can't acknowledge the events, so they don't get any.
+        """
+        if not hasattr(self.mixer, 'handleevents'):
+            return []
+        return [handle for handle, _ in self.mixer.polldescriptors()]
+
+    def handle_events(self):
+        """
+        Read the pending events from the control device.
+        """
+        self.mixer.handleevents()
+
+    def close(self):
+        """
+        Close the control device.
+        """
+        self.mixer.close()
+
+class FakeMixer(MixerBackend):
+    """
+    A mixer that only keeps the volume in memory. Every change, including our own, makes the read
+    end of a pipe readable just like a real control device does. simulate_change stands in for
+    the volume being changed by another program.
+    """
+    def __init__(self, volume=50):
+        self.volume = volume
+        self.event_pipe = os.pipe()
+        os.set_blocking(self.event_pipe[0], False)
+        os.set_blocking(self.event_pipe[1], False)
+
+    def get_volume(self):
+        """
+        Get the current playback volume.
+        """
+        return self.volume
+
+    def set_volume(self, volume):
+        """
+        Set the playback volume, and signal the change.
+        """
+        self.simulate_change(volume)
+
+    def simulate_change(self, volume):
+        """
+        Change the volume and signal the change.
+        """
+        self.volume = max(0, min(100, int(volume)))
+        try:
+            os.write(self.event_pipe[1], b'\0')
+        except OSError:
+            pass
+
+    def get_event_fds(self):
+        """
+        The read end of the event pipe.
+        """
+        return [self.event_pipe[0]]
+
+    def handle_events(self):
+        """
+        Drain the event pipe.
+        """
+        try:
+            os.read(self.event_pipe[0], 4096)
+        except OSError:
+            pass
+
+    def close(self):
+        """
+        Close the event pipe.
+        """
+        for handle in self.event_pipe:
+            os.close(handle)
+
+def get_mixer():
+    """
+    Get the mixer the volume control should use: the fake mixer if POCKET_MENU_MIXER is "fake",
+    otherwise the ALSA mixer. Raises OSError if there is no mixer to control.
+    """
+    if os.environ.get('POCKET_MENU_MIXER') == 'fake':
+        return FakeMixer()
+    return AlsaMixer()
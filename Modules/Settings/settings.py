@@ -7,12 +7,39 @@ launcher application.
 import tkinter
 import tkinter.ttk
 from tkinter.messagebox import askyesno
+from tkinter.simpledialog import askstring
+import abc
 import os
+import time
 import dbus
-from PIL import ImageTk, Image
 import __main__
+import Modules.Cache.icon_cache as icon_cache
 import Modules.DBus.dbus_main as dbus_main
+import Modules.DBus.dispatcher as dispatcher
 import Modules.Elements.ui_elements as ui_elements
+import Modules.Elements.layout as layout
+import Modules.Settings.mixer as mixer
+import Modules.Wifi.access_points as access_points
+import Modules.Bluetooth.bluetooth_devices as bluetooth_devices
+
+#The shortest time between two SetBrightness calls, and between two mixer writes, while a slider
+#is being dragged.
+BACKLIGHT_INTERVAL_MS = 50
+VOLUME_INTERVAL_MS = 30
+#The most networks the wifi picker lists, and the size of their signal icons.
+MAX_NETWORKS = 15
+NETWORK_ICON_SIZE = 20
+
+def bind_tab_changes(widget, callback):
+    """
+    Have callback called whenever the tab of the notebook a widget is on changes, which may have
+    shown or hidden the widget.
+    """
+    notebook = widget.master
+    while notebook is not None and not isinstance(notebook, tkinter.ttk.Notebook):
+        notebook = notebook.master
+    if notebook is not None:
+        notebook.bind('<<NotebookTabChanged>>', callback, add='+')
 
 class SettingsElementFrame(tkinter.Frame): #pylint: disable=too-many-ancestors
     """
@@ -22,9 +49,7 @@ class SettingsElementFrame(tkinter.Frame): #pylint: disable=too-many-ancestors
     def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
-        self.parent.update()
         self.configure(background=self.parent['background'])
-        self.update()
         self.titleframe = tkinter.Label(self, background=self.parent['background'],
                                         width=self['width'], fg="white")
         self.titleframe.pack(side="top")
@@ -39,13 +64,11 @@ class SettingsDivider(tkinter.Frame): #pylint: disable=too-many-ancestors
     def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
-        self.parent.update()
         self.configure(background=self.parent['background'], width=self.parent['width'], height=20)
         self.pack()
         self.dividingline = tkinter.Frame(self, background="#404040", height=2,
                                           width=int(self.parent['width']*0.9))
         self.dividingline.place(relx=0.5, rely=0.5, anchor="center")
-        self.update()
 
 class PowerSettings(SettingsElementFrame): #pylint: disable=too-many-ancestors
     """
@@ -54,16 +77,13 @@ class PowerSettings(SettingsElementFrame): #pylint: disable=too-many-ancestors
     def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
-        self.update()
         self.button_size = 64
-        self.icon_size = (int(self.button_size/16) * 12)
+        self.icon_size = layout.get_button_image_size(self.button_size)
         self.titleframe.configure(text="Power Settings")
-        self.shutdown_image = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Settings/shutdown.png").convert('RGBA').resize((self.icon_size,
-                                                                      self.icon_size)))
-        self.restart_image = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Settings/restart.png").convert('RGBA').resize((self.icon_size,
-                                                                     self.icon_size)))
+        self.shutdown_image = icon_cache.load_icon(__main__.DIR_PATH + \
+            "/Modules/Settings/shutdown.png", self.icon_size)
+        self.restart_image = icon_cache.load_icon(__main__.DIR_PATH + \
+            "/Modules/Settings/restart.png", self.icon_size)
         self.shutdown_button = ui_elements.AppButton(self.widgetframe, self.shutdown_image,
                                                      "Shutdown", self.button_size)
         self.restart_button = ui_elements.AppButton(self.widgetframe, self.restart_image,
@@ -75,7 +95,6 @@ class PowerSettings(SettingsElementFrame): #pylint: disable=too-many-ancestors
         self.columnconfigure(1, weight=1)
         self.shutdown_button.icon.configure(command=self.shutdown_confirm)
         self.restart_button.icon.configure(command=self.restart_confirm)
-        self.update()
 
     def shutdown_confirm(self): #pylint: disable=no-self-use
         """
@@ -99,50 +118,184 @@ class PowerSettings(SettingsElementFrame): #pylint: disable=too-many-ancestors
             iface = dbus.Interface(obj, 'org.freedesktop.login1.Manager')
             iface.Reboot(1)
 
-class BacklightSettings(SettingsElementFrame): #pylint: disable=too-many-ancestors, too-many-instance-attributes
+class SliderSettings(SettingsElementFrame, abc.ABC): #pylint: disable=too-many-ancestors, too-many-instance-attributes
     """
-    This class draws a scale to allow users to adjust the backlight value.
+    This class isn't used directly, but is the parent class of the settings drawn as a slider
+    between a low and a high icon, which apply their value live while the slider is dragged. Each
+    move of the slider asks for the new value, but values are applied (with apply_value) at least
+    interval_ms apart and never while the last one is still being applied, so moves made in
+    between are coalesced into the latest one. Subclasses call value_applied or value_failed once
+    a value has been applied, and value_changed when the value was changed elsewhere, which moves
+    the slider unless it's being dragged or we are still applying a value ourselves.
     """
-    def __init__(self, parent):
+    def __init__(self, parent, title, images, maximum, interval_ms): #pylint: disable=too-many-arguments
         super().__init__(parent)
         self.parent = parent
+        self.interval_ms = interval_ms
+        self.value = self.get_value()
+        self.wanted_value = None
+        self.applying = False
+        self.last_apply = 0
+        self.apply_id = None
+        self.dragging = False
+        self.updating_slider = False
+        self.titleframe.configure(text=title)
+        self.slider = ui_elements.PrettyScale(self.widgetframe)
+        self.slider.configure(from_=0, to=maximum, length=int(self.parent['width']*0.6))
+        self.set_slider(self.value)
+        self.low_image = icon_cache.load_icon(__main__.DIR_PATH + images[0], 32)
+        self.high_image = icon_cache.load_icon(__main__.DIR_PATH + images[1], 32)
+        self.low_label = tkinter.Label(self.widgetframe, image=self.low_image,
+                                       background=self.parent['background'])
+        self.high_label = tkinter.Label(self.widgetframe, image=self.high_image,
+                                        background=self.parent['background'])
+        self.low_label.grid(row=0, column=0)
+        self.slider.grid(row=0, column=1)
+        self.high_label.grid(row=0, column=2)
+        self.slider.configure(command=self.slider_moved)
+        self.slider.bind("<ButtonPress-1>", self.drag_started)
+        self.slider.bind("<ButtonRelease-1>", self.drag_finished)
+
+    @abc.abstractmethod
+    def get_value(self):
+        """
+        Read the current value.
+        """
+
+    @abc.abstractmethod
+    def apply_value(self, value):
+        """
+        Start applying a value, and call value_applied or value_failed once done.
+        """
+
+    def set_slider(self, value):
+        """
+        Move the slider without it asking for the value to change.
+        """
+        self.updating_slider = True
+        try:
+            self.slider.set(value)
+        finally:
+            self.updating_slider = False
+
+    def slider_moved(self, value):
+        """
+        The slider command, called every time the slider's value changes. The slider can be a
+        float but the values are ints, so that's what we ask for.
+        """
+        if self.updating_slider:
+            return
+        self.wanted_value = round(float(value))
+        self.schedule_apply()
+
+    def drag_started(self, event=None): #pylint: disable=unused-argument
+        """
+        Stop following outside changes while the slider is being dragged.
+        """
+        self.dragging = True
+
+    def drag_finished(self, event=None): #pylint: disable=unused-argument
+        """
+        Once the slider is let go, snap it to the int value it asked for.
+        """
+        self.dragging = False
+        self.set_slider(round(self.slider.get()))
+
+    def schedule_apply(self):
+        """
+        Apply the value we want as soon as the rate limit allows, unless a value is still being
+        applied (in which case it's applied when that one is done) or it's already scheduled.
+        """
+        if self.applying or self.apply_id is not None or self.wanted_value is None:
+            return
+        elapsed = (time.monotonic() - self.last_apply) * 1000
+        self.apply_id = self.after(max(0, int(self.interval_ms - elapsed)), self.apply_wanted)
+
+    def apply_wanted(self):
+        """
+        Apply the latest value asked for.
+        """
+        self.apply_id = None
+        value, self.wanted_value = self.wanted_value, None
+        if value is None or value == self.value:
+            return
+        self.applying = True
+        self.last_apply = time.monotonic()
+        self.apply_value(value)
+
+    def value_applied(self, value):
+        """
+        A value has been applied, so apply the next one if the slider moved meanwhile.
+        """
+        self.applying = False
+        self.value = value
+        self.schedule_apply()
+
+    def value_failed(self, value):
+        """
+        A value couldn't be applied. If nothing else has been asked for since, set the slider
+        back to the actual value.
+        """
+        self.applying = False
+        print("Unable to apply " + self.titleframe['text'] + " value " + str(value))
+        if self.wanted_value is None and not self.dragging:
+            self.value = self.get_value()
+            self.set_slider(self.value)
+        self.schedule_apply()
+
+    def value_changed(self, value):
+        """
+        The value was changed, possibly elsewhere. Move the slider to match if it isn't being
+        dragged and we aren't applying a value of our own.
+        """
+        self.value = value
+        if self.dragging or self.applying or self.wanted_value is not None:
+            return
+        if round(self.slider.get()) != value:
+            self.set_slider(value)
+
+class BacklightSettings(SliderSettings): #pylint: disable=too-many-ancestors, too-many-instance-attributes
+    """
+    This class draws a scale to allow users to adjust the backlight value. The backlight follows
+    the slider while it's being dragged, with only one SetBrightness call in flight at a time. The
+    slider also follows brightness changes made elsewhere (hardware keys, other tools) by watching
+    the actual_brightness sysfs attribute, which the kernel notifies whenever the brightness
+    changes.
+    """
+    def __init__(self, parent):
         self.backlight_name = self.get_backlight_name()
         self.backlight_max = self.get_backlight_max(self.backlight_name)
-        self.titleframe.configure(text="Backlight Settings")
-        self.backlightslider = ui_elements.PrettyScale(self.widgetframe)
-        self.backlightslider.configure(from_=0, to=self.backlight_max,
-                                       length=int(self.parent['width']*0.6))
-        self.backlightslider.set(self.get_backlight_value(self.backlight_name))
-        self.light_off_img = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Settings/light-off.png").convert('RGBA').resize((32, 32)))
-        self.light_on_img = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Settings/light-on.png").convert('RGBA').resize((32, 32)))
-        self.light_off_label = tkinter.Label(self.widgetframe, image=self.light_off_img,
-                                             background=self.parent['background'])
-        self.light_on_label = tkinter.Label(self.widgetframe, image=self.light_on_img,
-                                            background=self.parent['background'])
-        self.light_off_label.grid(row=0, column=0)
-        self.backlightslider.grid(row=0, column=1)
-        self.light_on_label.grid(row=0, column=2)
-        self.update()
-        self.backlightslider.bind("<ButtonRelease-1>", self.update_backlight)
-
-    def update_backlight(self, frame=None, event=None): #pylint: disable=unused-argument
-        """
-        Update the backlight once the slider is done being triggered, and then set the slider to
-        the new backlight value (slider can be float, but backlight can only be int, so set the
-        slider to a matching int). If the backlight can't be set then set the slider back to what
-        it was. We set with DBus since it allows us to do so without root.
-        """
-        backlight_value = round(self.backlightslider.get())
+        self.brightness_fd = self.open_backlight_value(self.backlight_name)
+        super().__init__(parent, "Backlight Settings", ("/Modules/Settings/light-off.png",
+                                                        "/Modules/Settings/light-on.png"),
+                         self.backlight_max, BACKLIGHT_INTERVAL_MS)
+        self.watch_backlight_value()
+        self.bind('<Destroy>', self.stop_watching, add='+')
+
+    def get_value(self):
+        """
+        Get the current value of the backlight.
+        """
+        return self.read_backlight_value()
+
+    def apply_value(self, value):
+        """
+        Ask logind for a new brightness. We set it with DBus since that allows us to do so without
+        root. The call is made asynchronously, and its reply comes back on the main thread
+        through the dispatcher. The reply is urgent: setting the brightness to 0 makes the
+        launcher idle, and a held back reply would leave the slider stuck.
+        """
         try:
-            obj = dbus_main.DBUS_BUS.get_object('org.freedesktop.login1',
-                                                '/org/freedesktop/login1/session/auto')
-            iface = dbus.Interface(obj, 'org.freedesktop.login1.Session')
-            iface.SetBrightness('backlight', self.backlight_name, dbus.UInt32(backlight_value))
-            self.backlightslider.set(backlight_value)
+            proxy = dbus_main.PROPERTY_CACHE.get_proxy('org.freedesktop.login1',
+                                                       '/org/freedesktop/login1/session/auto')
+            proxy.SetBrightness('backlight', self.backlight_name, dbus.UInt32(value),
+                                dbus_interface='org.freedesktop.login1.Session',
+                                reply_handler=lambda: dispatcher.post(self.value_applied, value,
+                                                                      urgent=True),
+                                error_handler=lambda error: dispatcher.post(self.value_failed,
+                                                                            value, urgent=True))
         except: #pylint: disable=bare-except
-            self.backlightslider.set(self.get_backlight_value(self.backlight_name))
+            self.value_failed(value)
 
     def get_backlight_name(self): #pylint: disable=no-self-use
         """
@@ -161,37 +314,491 @@ class BacklightSettings(SettingsElementFrame): #pylint: disable=too-many-ancesto
             max_brightness = int(backlightfile.readline())
         return max_brightness
 
-    def get_backlight_value(self, backlight_name): #pylint: disable=no-self-use
+    def open_backlight_value(self, backlight_name): #pylint: disable=no-self-use
         """
-        Get the current value of the backlight from sysfs.
+        Open the sysfs attribute holding the current value of the backlight. It's kept open, both
+        to read it without opening it again every time and so it can be watched for changes.
         """
-        with open('/sys/class/backlight/'+backlight_name+'/brightness') as backlightfile:
-            brightness = int(backlightfile.readline())
-        return brightness
+        try:
+            return os.open('/sys/class/backlight/'+backlight_name+'/actual_brightness',
+                           os.O_RDONLY)
+        except OSError:
+            return os.open('/sys/class/backlight/'+backlight_name+'/brightness', os.O_RDONLY)
 
-class VolumeSettings(SettingsElementFrame): #pylint: disable=too-many-ancestors
+    def read_backlight_value(self):
+        """
+        Get the current value of the backlight from sysfs. Reading the attribute also re-arms the
+        change notification.
+        """
+        return int(os.pread(self.brightness_fd, 32, 0))
+
+    def watch_backlight_value(self):
+        """
+        Have the Tk loop tell us when the backlight changes. Sysfs attributes the kernel notifies
+        show up as an exceptional condition on the open file, so no polling is needed.
+        """
+        try:
+            self.tk.createfilehandler(self.brightness_fd, tkinter.EXCEPTION,
+                                      self.backlight_changed)
+        except (AttributeError, tkinter.TclError):
+            print("Cannot watch backlight for changes")
+
+    def backlight_changed(self, handle, mask): #pylint: disable=unused-argument
+        """
+        File handler callback, run when the backlight changed.
+        """
+        try:
+            self.value_changed(self.read_backlight_value())
+        except (OSError, ValueError):
+            return
+
+    def stop_watching(self, event=None):
+        """
+        Stop watching the backlight and close the sysfs attribute when the widget is destroyed.
+        """
+        if event is not None and event.widget is not self:
+            return
+        if self.brightness_fd is None:
+            return
+        try:
+            self.tk.deletefilehandler(self.brightness_fd)
+        except (AttributeError, tkinter.TclError):
+            pass
+        os.close(self.brightness_fd)
+        self.brightness_fd = None
+
+class VolumeSettings(SliderSettings): #pylint: disable=too-many-ancestors, too-many-instance-attributes
     """
-    This widget draws a scale to allow users to adjust the volume.
+    This widget draws a scale to allow users to adjust the volume, from 0 to 100 percent. The
+    volume follows the slider while it's being dragged, and the slider follows volume changes made
+    elsewhere through the change events of the mixer (see mixer.py).
     """
     def __init__(self, parent):
+        self.mixer = mixer.get_mixer()
+        super().__init__(parent, "Volume Settings", ("/Modules/Settings/volume-low.png",
+                                                     "/Modules/Settings/volume-high.png"),
+                         100, VOLUME_INTERVAL_MS)
+        self.event_fds = self.mixer.get_event_fds()
+        for handle in self.event_fds:
+            self.tk.createfilehandler(handle, tkinter.READABLE, self.mixer_changed)
+        self.bind('<Destroy>', self.close_mixer, add='+')
+
+    def get_value(self):
+        """
+        Get the current volume.
+        """
+        return self.mixer.get_volume()
+
+    def apply_value(self, value):
+        """
+        Set the volume. The mixer does this straight away, so there's nothing to wait for.
+        """
+        try:
+            self.mixer.set_volume(value)
+        except: #pylint: disable=bare-except
+            self.value_failed(value)
+            return
+        self.value_applied(value)
+
+    def mixer_changed(self, handle, mask): #pylint: disable=unused-argument
+        """
+        File handler callback, run when the mixer has change events for us.
+        """
+        try:
+            self.mixer.handle_events()
+            self.value_changed(self.mixer.get_volume())
+        except: #pylint: disable=bare-except
+            print("Unable to read the volume")
+
+    def close_mixer(self, event=None):
+        """
+        Stop watching the mixer and release it when the widget is destroyed.
+        """
+        if event is not None and event.widget is not self:
+            return
+        for handle in self.event_fds:
+            self.tk.deletefilehandler(handle)
+        self.event_fds = []
+        self.mixer.close()
+
+class ListRow(tkinter.Frame, abc.ABC): #pylint: disable=too-many-ancestors
+    """
+    This class isn't used directly, but is the parent class of the rows of a RowListSettings
+    list. Each row shows one item of the list in a line of labels, and tapping anywhere on it
+    calls command with that item.
+    """
+    def __init__(self, parent, command):
+        super().__init__(parent, background=parent['background'])
+        self.command = command
+        self.item = None
+        self.shown = None
+        self.bind('<ButtonRelease-1>', self.clicked)
+
+    def add_label(self, column, **options):
+        """
+        Add a label in the next column of the row, passing taps on it on to the row.
+        """
+        label = tkinter.Label(self, background=self['background'], **options)
+        label.grid(row=0, column=column)
+        label.bind('<ButtonRelease-1>', self.clicked)
+        return label
+
+    def show(self, item):
+        """
+        Show an item, reconfiguring the labels only if what they show changed since the last time.
+        """
+        self.item = item
+        shown = self.get_shown(item)
+        if shown != self.shown:
+            self.draw(item, shown)
+            self.shown = shown
+
+    @abc.abstractmethod
+    def get_shown(self, item):
+        """
+        Pick out what the row shows of an item. Overridden by the rows.
+        """
+
+    @abc.abstractmethod
+    def draw(self, item, shown):
+        """
+        Reconfigure the labels for an item. self.shown still holds what was shown before, or None
+        the first time. Overridden by the rows.
+        """
+
+    def clicked(self, event=None): #pylint: disable=unused-argument
+        """
+        Pass the tap on.
+        """
+        self.command(self.item)
+
+class NetworkRow(ListRow): #pylint: disable=too-many-ancestors
+    """
+    One network in the wifi picker: its name, whether it's secured and its signal level.
+    """
+    def __init__(self, parent, images, command):
+        super().__init__(parent, command)
+        self.images = images
+        self.name_label = self.add_label(0, fg="white", anchor="w", width=22)
+        self.lock_label = self.add_label(1, fg="#A0A0A0", width=7)
+        self.signal_label = self.add_label(2)
+
+    def get_shown(self, item):
+        """
+        A network is shown by its name, whether it's active, whether it's secured and its level.
+        """
+        return (item['ssid'], item['active'], item['secured'], item['level'])
+
+    def draw(self, item, shown):
+        """
+        Reconfigure only the labels whose part of the network changed.
+        """
+        if self.shown is None or shown[:2] != self.shown[:2]:
+            self.name_label.configure(text=item['ssid'],
+                                      fg="#0078D4" if item['active'] else "white")
+        if self.shown is None or shown[2] != self.shown[2]:
+            self.lock_label.configure(text="secured" if item['secured'] else "open")
+        if self.shown is None or shown[3] != self.shown[3]:
+            self.signal_label.configure(image=self.images[item['level']])
+
+class DeviceRow(ListRow): #pylint: disable=too-many-ancestors
+    """
+    One paired device in the bluetooth panel: its name and whether it's connected.
+    """
+    def __init__(self, parent, command):
+        super().__init__(parent, command)
+        self.name_label = self.add_label(0, fg="white", anchor="w", width=22)
+        self.state_label = self.add_label(1, fg="#A0A0A0", width=10)
+
+    def get_shown(self, item):
+        """
+        A device is shown by its name and whether it's connected.
+        """
+        return (item['name'], item['connected'])
+
+    def draw(self, item, shown): #pylint: disable=unused-argument
+        """
+        Reconfigure both labels.
+        """
+        self.name_label.configure(text=item['name'],
+                                  fg="#0078D4" if item['connected'] else "white")
+        self.state_label.configure(text="connected" if item['connected'] else "")
+
+class RowListSettings(SettingsElementFrame, abc.ABC): #pylint: disable=too-many-ancestors
+    """
+    This class isn't used directly, but is the parent class of the settings widgets that list the
+    items of a table (such as the access points or the bluetooth devices) under a status line and
+    a button. The list is updated row by row rather than rebuilt: rows are keyed, and only
+    created, destroyed, moved or reconfigured when what they show changed. The table's listener
+    is removed again when the widget is destroyed.
+    """
+    def __init__(self, parent, table, title, button_command):
         super().__init__(parent)
         self.parent = parent
-        self.titleframe.configure(text="Volume Settings")
-        self.scale_value = tkinter.DoubleVar
-        self.volumeslider = ui_elements.PrettyScale(self.widgetframe)
-        self.volumeslider.configure(from_=0, to=10, length=int(self.parent['width']*0.6))
-        self.light_off_img = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Settings/volume-low.png").convert('RGBA').resize((32, 32)))
-        self.light_on_img = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Settings/volume-high.png").convert('RGBA').resize((32, 32)))
-        self.light_off_label = tkinter.Label(self.widgetframe, image=self.light_off_img,
-                                             background=self.parent['background'])
-        self.light_on_label = tkinter.Label(self.widgetframe, image=self.light_on_img,
-                                            background=self.parent['background'])
-        self.light_off_label.grid(row=0, column=0)
-        self.volumeslider.grid(row=0, column=1)
-        self.light_on_label.grid(row=0, column=2)
-        self.update()
+        self.table = table
+        self.rows = {}
+        self.order = []
+        self.titleframe.configure(text=title)
+        self.status_label = tkinter.Label(self.widgetframe, background=self.parent['background'],
+                                          fg="#A0A0A0")
+        self.button = tkinter.Button(self.widgetframe, fg="white", background="#404040",
+                                     activebackground="#606060", activeforeground="white",
+                                     relief="flat", highlightthickness=0, command=button_command)
+        self.row_list = tkinter.Frame(self.widgetframe, background=self.parent['background'])
+        self.status_label.grid(row=0, column=0)
+        self.button.grid(row=0, column=1)
+        self.row_list.grid(row=1, column=0, columnspan=2)
+        self.table.add_listener(self.table_changed)
+        self.bind('<Map>', self.visibility_changed, add='+')
+        self.bind('<Destroy>', self.stop_listening, add='+')
+        bind_tab_changes(self, self.visibility_changed)
+
+    def table_changed(self):
+        """
+        Table listener, called on the DBus thread.
+        """
+        dispatcher.post(self.refresh)
+
+    def visibility_changed(self, event=None): #pylint: disable=unused-argument
+        """
+        The settings tab may have been shown or hidden. Tk only knows once it has caught up.
+        """
+        self.after_idle(self.update_visibility)
+
+    def update_visibility(self):
+        """
+        Called once Tk knows whether the widget is on screen. Overridden by widgets that do more
+        than redraw.
+        """
+        self.refresh()
+
+    @abc.abstractmethod
+    def refresh(self):
+        """
+        Bring the widget up to date with the table. Overridden by the widgets.
+        """
+
+    def show_rows(self, items, key, make_row):
+        """
+        Show a list of items, one row each. key gives the key of an item, which its row is kept
+        under for as long as the item is listed, and make_row(parent) a new row.
+        """
+        keys = [key(item) for item in items]
+        for old_key in [old_key for old_key in self.rows if old_key not in keys]:
+            self.rows.pop(old_key).destroy()
+        for index, item in enumerate(items):
+            row = self.rows.get(keys[index])
+            if row is None:
+                row = self.rows[keys[index]] = make_row(self.row_list)
+            row.show(item)
+            if index >= len(self.order) or self.order[index] != keys[index]:
+                row.grid(row=index, column=0, sticky="w")
+        self.order = keys
+
+    def set_status(self, text):
+        """
+        Change the status line, if it changed.
+        """
+        if self.status_label['text'] != text:
+            self.status_label.configure(text=text)
+
+    def stop_listening(self, event=None):
+        """
+        Stop following the table when the widget is destroyed. Returns whether it was.
+        """
+        if event is not None and event.widget is not self:
+            return False
+        self.table.remove_listener(self.table_changed)
+        return True
+
+class WifiSettings(RowListSettings): #pylint: disable=too-many-ancestors
+    """
+    The wifi network picker. It lists the networks around us (see access_points.py), the one
+    we're connected to first, and connects to a network when it's tapped, asking for a password
+    if it's secured and NetworkManager has no profile for it yet. The table of access points is
+    only kept live while the picker is on screen. When the table changes the updates are posted
+    through the dispatcher so a burst of changes costs a single pass.
+    """
+    def __init__(self, parent):
+        super().__init__(parent, access_points.ACCESS_POINTS, "Wi-Fi Networks", self.scan)
+        self.live = False
+        self.message = None
+        atlas = icon_cache.SpriteAtlas(__main__.DIR_PATH + "/Modules/Wifi", "wifi", "wifi_")
+        self.signal_images = {level: atlas.get_icon(str(level), NETWORK_ICON_SIZE)
+                              for level in (100, 75, 50, 25)}
+        self.button.configure(text="Scan")
+        self.refresh()
+
+    def update_visibility(self):
+        """
+        Keep the table live while the picker is on screen, and asking for a scan when it comes
+        on screen.
+        """
+        if not self.winfo_exists():
+            return
+        visible = bool(self.winfo_viewable())
+        if visible and not self.live:
+            self.live = True
+            self.table.start()
+            self.table.request_scan()
+        elif self.live and not visible:
+            self.live = False
+            self.table.stop()
+        self.refresh()
+
+    def table_changed(self):
+        """
+        Table listener, called on the DBus thread.
+        """
+        dispatcher.post(self.refresh, True)
+
+    def refresh(self, table_changed=False): #pylint: disable=arguments-differ
+        """
+        Bring the list and the status line up to date with the table. Messages such as
+        "Scanning..." stay on the status line until the table next changes.
+        """
+        if not self.winfo_exists():
+            return
+        if table_changed:
+            self.message = None
+        networks = self.table.get_networks(MAX_NETWORKS) if self.live else []
+        if not self.table.has_device():
+            self.set_status("No wifi device")
+        elif self.message is not None:
+            self.set_status(self.message)
+        else:
+            self.set_status("Looking for networks..." if self.live and not networks else "")
+        self.show_rows(networks, lambda network: network['ssid'],
+                       lambda parent: NetworkRow(parent, self.signal_images, self.connect))
+
+    def show_message(self, message):
+        """
+        Put a message on the status line until the table next changes.
+        """
+        self.message = message
+        self.refresh()
+
+    def scan(self):
+        """
+        Ask for a scan, if we haven't done so too recently.
+        """
+        if self.table.request_scan():
+            self.show_message("Scanning...")
+
+    def connect(self, network):
+        """
+        Connect to a network that was tapped.
+        """
+        if network['active']:
+            return
+        self.show_message("Connecting to " + network['ssid'] + "...")
+        self.table.connect(network, lambda network: dispatcher.post(self.ask_password, network,
+                                                                     urgent=True),
+                           self.connect_failed)
+
+    def ask_password(self, network):
+        """
+        Ask for the password of a secured network NetworkManager has no profile for.
+        """
+        password = askstring(title="Connect to " + network['ssid'], prompt="Password:",
+                             show="*", parent=self)
+        if not password:
+            self.show_message(None)
+            return
+        self.table.add_connection(network, password, self.connect_failed)
+
+    def connect_failed(self, error):
+        """
+        Error handler for connecting, called on the DBus thread.
+        """
+        print("Unable to connect: " + str(error))
+        dispatcher.post(self.show_message, "Could not connect", urgent=True)
+
+    def stop_listening(self, event=None):
+        """
+        Also stop keeping the table live.
+        """
+        if not super().stop_listening(event):
+            return False
+        if self.live:
+            self.live = False
+            self.table.stop()
+        return True
+
+class BluetoothSettings(RowListSettings): #pylint: disable=too-many-ancestors
+    """
+    The bluetooth panel: a button to power the adapter on and off, and the paired devices, which
+    are connected or disconnected when tapped. It is drawn from the same table as the bluetooth
+    icon (see bluetooth_devices.py), so it never fetches anything itself. Changes to the table
+    are only drawn while the panel is on screen.
+    """
+    def __init__(self, parent):
+        super().__init__(parent, bluetooth_devices.BLUETOOTH, "Bluetooth Devices",
+                         self.toggle_power)
+        self.stale = True
+        self.table.start()
+        self.refresh()
+
+    def table_changed(self):
+        """
+        Table listener, called on the DBus thread.
+        """
+        self.stale = True
+        dispatcher.post(self.refresh)
+
+    def refresh(self):
+        """
+        Bring the panel up to date with the table, if it's on screen and the table changed since
+        the last time.
+        """
+        if not self.winfo_exists() or not self.stale or not self.winfo_viewable():
+            return
+        self.stale = False
+        adapter = self.table.get_adapter()
+        powered = adapter is not None and self.table.is_powered(adapter)
+        devices = self.table.get_devices(adapter) if powered else []
+        if adapter is None:
+            status = "No bluetooth adapter" if self.table.present is False else ""
+        elif not powered:
+            status = "Bluetooth is off"
+        else:
+            status = "" if devices else "No paired devices"
+        self.set_status(status)
+        button_text = "Turn off" if powered else "Turn on"
+        if self.button['text'] != button_text:
+            self.button.configure(text=button_text)
+        if bool(adapter) != bool(self.button.winfo_manager()):
+            if adapter:
+                self.button.grid(row=0, column=1)
+            else:
+                self.button.grid_remove()
+        self.show_rows(devices, lambda device: device['path'],
+                       lambda parent: DeviceRow(parent, self.toggle_connection))
+
+    def toggle_power(self):
+        """
+        Power the adapter on or off.
+        """
+        adapter = self.table.get_adapter()
+        if adapter is not None:
+            self.table.set_powered(adapter, not self.table.is_powered(adapter),
+                                   self.call_failed)
+
+    def toggle_connection(self, device):
+        """
+        Connect or disconnect a device that was tapped. The status line is redrawn from the table
+        when the table next changes.
+        """
+        if not device['connected']:
+            self.set_status("Connecting to " + device['name'] + "...")
+        self.table.set_connected(device['path'], not device['connected'], self.call_failed)
+
+    def call_failed(self, error):
+        """
+        Error handler for the BlueZ calls, called on the DBus thread.
+        """
+        print("Bluetooth call failed: " + str(error))
+        dispatcher.post(self.set_status, "Bluetooth request failed", urgent=True)
 
 class AllSettings(tkinter.Frame): #pylint: disable=too-many-ancestors
     """
@@ -201,67 +808,78 @@ class AllSettings(tkinter.Frame): #pylint: disable=too-many-ancestors
     def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
-        self.parent.update()
         self.configure(background=self.parent['background'], width=self.parent['width'],
                        height=self.parent['height'])
-        self.update()
         self.settings_providers = []
         self.separators = []
+        self.scroll_needed = False
         self.register_settings_providers()
-        self.is_scroll_needed()
-        self.update()
-        self.parent.update()
 
     def register_settings_providers(self):
         """
         Iterate through the (currently hard-coded) settings providers to register them one by one.
         """
         self.settings_providers.append(PowerSettings(self))
-        self.settings_providers.append(VolumeSettings(self))
+        try:
+            self.settings_providers.append(VolumeSettings(self))
+        except: #pylint: disable=bare-except
+            print("Cannot register volume control")
         try:
             self.settings_providers.append(BacklightSettings(self))
         except: #pylint: disable=bare-except
             print("Cannot register backlight control")
+        try:
+            self.settings_providers.append(WifiSettings(self))
+        except: #pylint: disable=bare-except
+            print("Cannot register wifi settings")
+        try:
+            self.settings_providers.append(BluetoothSettings(self))
+        except: #pylint: disable=bare-except
+            print("Cannot register bluetooth settings")
         for settings_provider in self.settings_providers:
             settings_provider.pack(side="top", expand=True)
             if settings_provider != self.settings_providers[-1]:
                 self.separators.append(SettingsDivider(self))
 
-    def is_scroll_needed(self):
+    def is_scroll_needed(self, height):
         """
-        Determine if the scrollbar element should be visible.
+        Determine if the scrollbar element should be visible, given the height the geometry
+        manager settled on for all the settings widgets.
         """
-        widget_heights = 0
-        for settings_provider in self.settings_providers:
-            #This is one of the few times we don't already know the hight of a given widget.
-            widget_heights += settings_provider.winfo_reqheight()
-        for separator in self.separators:
-            widget_heights += separator.winfo_reqheight()
-        if widget_heights > self['height']:
+        if height > self.parent['height']:
             self.scroll_needed = True
         else:
             self.scroll_needed = False
+        return self.scroll_needed
 
 class SettingsFrame(ui_elements.LauncherFrame): #pylint: disable=too-many-ancestors, too-many-instance-attributes
     """
     The main SettingsFrame is a subclass of the AppFrame which holds a list of all the various user
     adjustable settings.
     """
-    def __init__(self, parent, nav_widget_size, width, height):
-        super().__init__(parent, nav_widget_size)
-        self.configure(background="black", width=width,
-                       height=height)
-        self.update()
+    def __init__(self, parent, screen_layout):
+        super().__init__(parent, screen_layout.nav_widget_size)
+        self.configure(background="black", width=screen_layout.frame_width,
+                       height=screen_layout.frame_height)
         self.settingslist = AllSettings(self.center)
         self.center.create_window(0, 0, window=self.settingslist, anchor="nw")
         self.settingsscroll = tkinter.ttk.Scrollbar(self.nav_right_trough,
                                                     style="arrowless.Vertical.TScrollbar",
                                                     orient='vertical',
                                                     command=self.center.yview)
-        if self.settingslist.scroll_needed:
+        self.center.config(yscrollcommand=self.settingsscroll.set)
+        self.settingslist.bind('<Configure>', self.update_scroll_region)
+
+    def update_scroll_region(self, event):
+        """
+        The settings widgets are the one place where we don't know the sizes up front, so wait
+        for the geometry manager to tell us how big they ended up and then decide whether the
+        scrollbar is needed.
+        """
+        self.center.config(scrollregion=(0, 0, event.width, event.height))
+        if self.settingslist.is_scroll_needed(event.height):
             self.settingsscroll.place(height=int(self.nav_right_trough['height']*0.8), width=8,
                                       relx=0.5, anchor="center", rely=0.5)
-            self.update()
-            self.center.config(yscrollcommand=self.settingsscroll.set,
-                               scrollregion=(self.center.bbox("all")))
-        self.update()
+        else:
+            self.settingsscroll.place_forget()
+            self.center.yview_moveto(0)
@@ -0,0 +1,91 @@
+"""
+This module holds the status models for the menu bar widgets. Each device the launcher shows the
+status of (the battery, the wifi and bluetooth) has a small model object holding the few values
+its widget renders. The DBus handlers write to the model, and the model calls its subscribers only
+when a field actually changes, so a signal that doesn't change anything we show never causes a
+redraw.
+
+The models are plain objects with __slots__, which keeps them small and cheap to import. Fields
+are written from the DBus thread and read from the main thread, which is safe since each field is
+a single attribute assignment.
+"""
+
+from threading import Lock
+
+class StatusModel:
+    """
+    The base class for the status models. Subclasses list their fields and default values in
+    DEFAULTS and use them as their __slots__.
+    """
+    __slots__ = ('lock', 'subscribers')
+    DEFAULTS = {}
+
+    def __init__(self, **values):
+        self.lock = Lock()
+        self.subscribers = []
+        for field, default in self.DEFAULTS.items():
+            setattr(self, field, values.get(field, default))
+
+    def update(self, **changes):
+        """
+        Set any number of fields at once. Subscribers interested in the fields that changed value
+        are called once with the model and the set of changed fields. Returns that set.
+        """
+        changed = set()
+        for field, value in changes.items():
+            if field not in self.DEFAULTS:
+                raise AttributeError(field)
+            if getattr(self, field) != value:
+                setattr(self, field, value)
+                changed.add(field)
+        if changed:
+            with self.lock:
+                subscribers = list(self.subscribers)
+            for callback, fields in subscribers:
+                if fields is None or not changed.isdisjoint(fields):
+                    callback(self, changed)
+        return changed
+
+    def subscribe(self, callback, fields=None):
+        """
+        Have callback(model, changed) called whenever one of the given fields (or any field, if
+        fields is None) changes.
+        """
+        with self.lock:
+            self.subscribers.append((callback, None if fields is None else frozenset(fields)))
+
+    def unsubscribe(self, callback):
+        """
+        Stop calling a subscriber.
+        """
+        with self.lock:
+            self.subscribers = [subscriber for subscriber in self.subscribers
+                                if subscriber[0] != callback]
+
+    def as_dict(self):
+        """
+        Return a copy of the fields as a dictionary.
+        """
+        return {field: getattr(self, field) for field in self.DEFAULTS}
+
+class BatteryStatus(StatusModel):
+    """
+    The status of the battery. Charging uses the UPower device state, where 1 is charging.
+    """
+    DEFAULTS = {'present': None, 'capacity': 100, 'charging': 1}
+    __slots__ = tuple(DEFAULTS)
+
+class WifiStatus(StatusModel):
+    """
+    The status of the wifi. Status is 0 when the wifi is off, 1 when connected and 2 when
+    disconnected. The connection is the path of the active access point, or "/" if there is none.
+    """
+    DEFAULTS = {'present': None, 'device': None, 'connection': None, 'status': 1, 'signal': 100}
+    __slots__ = tuple(DEFAULTS)
+
+class BluetoothStatus(StatusModel):
+    """
+    The status of the first bluetooth adapter. Power and connect are 0 or 1.
+    """
+    DEFAULTS = {'present': None, 'adapter': None, 'power': 0, 'connect': 0}
+    __slots__ = tuple(DEFAULTS)
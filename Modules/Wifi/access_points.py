@@ -0,0 +1,418 @@
+"""
+This module keeps the table of wifi access points for the network picker in the settings tab. The
+table is only live while something is showing it: once started it fetches the access points of
+the wifi device from NetworkManager and keeps them current from three signals:
+
+- AccessPointAdded and AccessPointRemoved on the wifi device,
+- PropertiesChanged of the org.freedesktop.NetworkManager.AccessPoint interface of any object,
+  with a single match rule for all of them rather than one per access point.
+
+When it is stopped the match rules are removed again, so a busy area full of access points costs
+nothing while the picker isn't on screen. Scans are only requested when asked for, and at most
+once every SCAN_INTERVAL_S, so the radio isn't kept scanning.
+
+Listeners are called on the DBus thread whenever the table changed (or the active access point
+did), and read it with get_networks, which merges the access points of each network into one
+entry. Networks are ordered by signal level rather than by exact strength, so the small changes
+in strength that keep coming in don't keep reordering the list.
+"""
+
+import time
+from threading import Lock
+import dbus
+import Modules.DBus.dbus_main as dbus_main
+
+NM_BUS = 'org.freedesktop.NetworkManager'
+NM_DEVICE = 'org.freedesktop.NetworkManager.Device'
+NM_WIRELESS = 'org.freedesktop.NetworkManager.Device.Wireless'
+NM_ACCESS_POINT = 'org.freedesktop.NetworkManager.AccessPoint'
+NM_SETTINGS_CONNECTION = 'org.freedesktop.NetworkManager.Settings.Connection'
+NM_PATH = '/org/freedesktop/NetworkManager'
+PROPERTIES_INTERFACE = 'org.freedesktop.DBus.Properties'
+
+SCAN_INTERVAL_S = 30
+CALL_TIMEOUT = 10.0
+#The NM80211ApFlags privacy flag, set on WEP networks (and on WPA ones too).
+AP_FLAGS_PRIVACY = 0x1
+#The NM80211ApSecurityFlags key management flags for WPA personal and WPA3 personal.
+AP_SEC_KEY_MGMT_PSK = 0x100
+AP_SEC_KEY_MGMT_SAE = 0x400
+#The NMWepKeyType values, for WEP keys given as the key itself or as a passphrase.
+WEP_KEY_TYPE_KEY = 1
+WEP_KEY_TYPE_PASSPHRASE = 2
+#The access point properties the picker uses. Changes to any others are ignored.
+AP_PROPERTIES = ('Ssid', 'Strength', 'Flags', 'WpaFlags', 'RsnFlags')
+
+def decode_ssid(ssid):
+    """
+    SSIDs are arrays of bytes, which are normally (but not always) UTF-8.
+    """
+    return bytes(bytearray(int(byte) for byte in ssid)).decode('utf-8', 'replace')
+
+def get_signal_level(strength):
+    """
+    Round a signal strength to one of the four levels the wifi icons show.
+    """
+    if strength > 75:
+        return 100
+    if strength > 50:
+        return 75
+    if strength > 25:
+        return 50
+    return 25
+
+def get_security(properties):
+    """
+    Work out the security of an access point from its flags: 'wpa' for WPA personal (or WPA2),
+    'sae' for WPA3 personal only, 'wep' when only the privacy flag is set, or None if it's open.
+    """
+    wpa_flags = int(properties.get('WpaFlags', 0))
+    rsn_flags = int(properties.get('RsnFlags', 0))
+    if rsn_flags & AP_SEC_KEY_MGMT_SAE and not (wpa_flags | rsn_flags) & AP_SEC_KEY_MGMT_PSK:
+        return 'sae'
+    if wpa_flags or rsn_flags:
+        return 'wpa'
+    if int(properties.get('Flags', 0)) & AP_FLAGS_PRIVACY:
+        return 'wep'
+    return None
+
+def get_wep_key_type(key):
+    """
+    WEP keys are either the key itself (5 or 13 characters, or 10 or 26 hex digits) or a
+    passphrase it is derived from.
+    """
+    if len(key) in (5, 13):
+        return WEP_KEY_TYPE_KEY
+    if len(key) in (10, 26) and all(character in '0123456789abcdefABCDEF' for character in key):
+        return WEP_KEY_TYPE_KEY
+    return WEP_KEY_TYPE_PASSPHRASE
+
+def get_security_settings(security, password):
+    """
+    Build the 802-11-wireless-security settings of a new connection profile.
+    """
+    if security == 'wep':
+        return {'key-mgmt': 'none', 'wep-key0': password,
+                'wep-key-type': dbus.UInt32(get_wep_key_type(password))}
+    return {'key-mgmt': 'sae' if security == 'sae' else 'wpa-psk', 'psk': password}
+
+def get_access_point_info(properties):
+    """
+    Pick out what the picker shows of an access point from its properties.
+    """
+    security = get_security(properties)
+    return {'ssid': decode_ssid(properties.get('Ssid', [])),
+            'strength': int(properties.get('Strength', 0)),
+            'security': security,
+            'secured': security is not None}
+
+class AccessPointTable: #pylint: disable=too-many-instance-attributes
+    """
+    The access points of the wifi device, by object path.
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.device = None
+        self.access_points = {}
+        self.listeners = []
+        self.matches = []
+        self.users = 0
+        self.last_scan = None
+
+    def set_device(self, device):
+        """
+        Set the wifi device whose access points we list, or None if there is none. Called by the
+        wifi icon once it has found the device, and again if NetworkManager goes away or comes
+        back with another one.
+        """
+        with self.lock:
+            old_device, self.device = self.device, device
+            started = self.users > 0
+            listeners = list(self.listeners)
+        if started and device != old_device:
+            self.unwatch(old_device)
+            self.watch()
+        for callback in listeners:
+            callback()
+
+    def has_device(self):
+        """
+        Whether there is a wifi device to list the access points of.
+        """
+        return self.device is not None
+
+    def add_listener(self, callback):
+        """
+        Have callback() called (normally on the DBus thread) whenever the table changes.
+        """
+        with self.lock:
+            self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """
+        Stop calling a listener.
+        """
+        with self.lock:
+            if callback in self.listeners:
+                self.listeners.remove(callback)
+
+    def changed(self):
+        """
+        Tell the listeners the table changed.
+        """
+        with self.lock:
+            listeners = list(self.listeners)
+        for callback in listeners:
+            callback()
+
+    def start(self):
+        """
+        Start keeping the table live. Every start needs a matching stop.
+        """
+        with self.lock:
+            self.users += 1
+            first = self.users == 1
+        if first:
+            self.watch()
+
+    def stop(self):
+        """
+        Stop keeping the table live once nothing is using it, forgetting the access points.
+        """
+        with self.lock:
+            self.users = max(0, self.users - 1)
+            if self.users:
+                return
+            device = self.device
+        self.unwatch(device)
+
+    def unwatch(self, device):
+        """
+        Remove the match rules of a device and forget its access points.
+        """
+        with self.lock:
+            matches, self.matches = self.matches, []
+            self.access_points = {}
+        for match in matches:
+            match.remove()
+        if matches:
+            dbus_main.PROPERTY_CACHE.unsubscribe(NM_BUS, device, NM_WIRELESS, self.device_changed)
+
+    def watch(self):
+        """
+        Add the match rules and fetch the access points of the device.
+        """
+        with self.lock:
+            device = self.device
+            if device is None or self.matches:
+                return
+            bus = dbus_main.DBUS_BUS
+            self.matches = [
+                bus.add_signal_receiver(self.access_point_added, bus_name=NM_BUS,
+                                        dbus_interface=NM_WIRELESS,
+                                        signal_name='AccessPointAdded', path=device),
+                bus.add_signal_receiver(self.access_point_removed, bus_name=NM_BUS,
+                                        dbus_interface=NM_WIRELESS,
+                                        signal_name='AccessPointRemoved', path=device),
+                bus.add_signal_receiver(self.properties_changed, bus_name=NM_BUS,
+                                        dbus_interface=PROPERTIES_INTERFACE,
+                                        signal_name='PropertiesChanged', arg0=NM_ACCESS_POINT,
+                                        path_keyword='path')]
+        dbus_main.PROPERTY_CACHE.add_subscriber(NM_BUS, device, NM_WIRELESS, self.device_changed)
+        proxy = dbus_main.PROPERTY_CACHE.get_proxy(NM_BUS, device)
+        dbus.Interface(proxy, NM_WIRELESS).GetAllAccessPoints(
+            reply_handler=self.got_access_points, error_handler=self.call_failed,
+            timeout=CALL_TIMEOUT)
+
+    def is_live(self):
+        """
+        Whether the table is being kept live.
+        """
+        return bool(self.matches)
+
+    def got_access_points(self, paths):
+        """
+        Reply handler for GetAllAccessPoints.
+        """
+        for path in paths:
+            self.access_point_added(path)
+
+    def access_point_added(self, path):
+        """
+        Fetch the properties of an access point that appeared.
+        """
+        path = str(path)
+        if not self.is_live():
+            return
+        proxy = dbus_main.PROPERTY_CACHE.get_proxy(NM_BUS, path)
+        dbus.Interface(proxy, PROPERTIES_INTERFACE).GetAll(
+            NM_ACCESS_POINT,
+            reply_handler=lambda properties: self.got_properties(path, properties),
+            error_handler=self.call_failed, timeout=CALL_TIMEOUT)
+
+    def got_properties(self, path, properties):
+        """
+        Reply handler for the GetAll of an access point.
+        """
+        with self.lock:
+            if not self.matches:
+                return
+            self.access_points[path] = {name: properties[name] for name in AP_PROPERTIES
+                                        if name in properties}
+        self.changed()
+
+    def access_point_removed(self, path):
+        """
+        Forget an access point that went away.
+        """
+        with self.lock:
+            removed = self.access_points.pop(str(path), None)
+        if removed is not None:
+            self.changed()
+
+    def properties_changed(self, interface, changed, invalidated, path=None): #pylint: disable=unused-argument
+        """
+        Apply a PropertiesChanged signal of an access point we know of. Changes to anything we
+        don't show are ignored.
+        """
+        changes = {name: changed[name] for name in AP_PROPERTIES if name in changed}
+        with self.lock:
+            access_point = self.access_points.get(str(path))
+            if access_point is None or all(access_point.get(name) == value
+                                           for name, value in changes.items()):
+                return
+            access_point.update(changes)
+        self.changed()
+
+    def device_changed(self, interface, changed, invalidated): #pylint: disable=unused-argument
+        """
+        Property cache subscriber for the wifi device, so the listeners hear about us connecting
+        to another network.
+        """
+        if 'ActiveAccessPoint' in changed:
+            self.changed()
+
+    def call_failed(self, error):
+        """
+        Error handler for the NetworkManager calls.
+        """
+        print("NetworkManager call failed: " + str(error))
+
+    def get_active_ssid(self):
+        """
+        Get the SSID of the network we're connected to, or None.
+        """
+        if self.device is None:
+            return None
+        path = str(dbus_main.PROPERTY_CACHE.get(NM_BUS, self.device, NM_WIRELESS,
+                                                'ActiveAccessPoint', '/'))
+        with self.lock:
+            properties = self.access_points.get(path)
+        if properties is None:
+            properties = dbus_main.PROPERTY_CACHE.get_all(NM_BUS, path, NM_ACCESS_POINT)
+        return get_access_point_info(properties)['ssid'] if properties else None
+
+    def get_networks(self, limit=None):
+        """
+        List the networks, the one we're connected to first and then by signal level. Each
+        network is the strongest of its access points, with the object path of that access point
+        and its signal level, and networks with a hidden SSID are left out.
+        """
+        networks = {}
+        with self.lock:
+            access_points = [(path, get_access_point_info(properties))
+                             for path, properties in self.access_points.items()]
+        for path, access_point in access_points:
+            ssid = access_point['ssid']
+            if ssid and (ssid not in networks or
+                         access_point['strength'] > networks[ssid]['strength']):
+                networks[ssid] = dict(access_point, path=path)
+        active = self.get_active_ssid()
+        for network in networks.values():
+            network['active'] = network['ssid'] == active
+            network['level'] = get_signal_level(network['strength'])
+        return sorted(networks.values(),
+                      key=lambda network: (not network['active'], -network['level'],
+                                           network['ssid'].lower()))[:limit]
+
+    def request_scan(self):
+        """
+        Ask NetworkManager to scan, unless we did so less than SCAN_INTERVAL_S ago. Returns
+        whether a scan was requested.
+        """
+        now = time.monotonic()
+        with self.lock:
+            if self.device is None or (self.last_scan is not None and
+                                       now - self.last_scan < SCAN_INTERVAL_S):
+                return False
+            self.last_scan = now
+            device = self.device
+        proxy = dbus_main.PROPERTY_CACHE.get_proxy(NM_BUS, device)
+        dbus.Interface(proxy, NM_WIRELESS).RequestScan(
+            dbus.Dictionary({}, signature='sv'), reply_handler=lambda *args: None,
+            error_handler=self.call_failed, timeout=CALL_TIMEOUT)
+        return True
+
+    def connect(self, network, password_handler, error_handler):
+        """
+        Connect to a network. A connection profile NetworkManager already has for the network is
+        activated if there is one. Otherwise open networks get a new profile straight away, and
+        for secured ones the password handler is called with the network (normally on the DBus
+        thread), which should call add_connection once it has the password. The error handler is
+        called if NetworkManager refuses.
+        """
+        proxy = dbus_main.PROPERTY_CACHE.get_proxy(NM_BUS, self.device)
+        dbus.Interface(proxy, PROPERTIES_INTERFACE).Get(
+            NM_DEVICE, 'AvailableConnections',
+            reply_handler=lambda paths: self.find_connection(network, list(paths),
+                                                             password_handler, error_handler),
+            error_handler=error_handler, timeout=CALL_TIMEOUT)
+
+    def find_connection(self, network, paths, password_handler, error_handler):
+        """
+        Go through the connection profiles available on the device one at a time, looking for
+        one for the network.
+        """
+        if not paths:
+            if network['secured']:
+                password_handler(network)
+            else:
+                self.add_connection(network, None, error_handler)
+            return
+        def got_settings(settings):
+            wireless = settings.get('802-11-wireless', {})
+            if decode_ssid(wireless.get('ssid', [])) == network['ssid']:
+                self.activate_connection(paths[0], network, error_handler)
+            else:
+                self.find_connection(network, paths[1:], password_handler, error_handler)
+        proxy = dbus_main.PROPERTY_CACHE.get_proxy(NM_BUS, paths[0])
+        dbus.Interface(proxy, NM_SETTINGS_CONNECTION).GetSettings(
+            reply_handler=got_settings, error_handler=error_handler, timeout=CALL_TIMEOUT)
+
+    def activate_connection(self, path, network, error_handler):
+        """
+        Activate a connection profile on the device, on the access point of the network.
+        """
+        proxy = dbus_main.PROPERTY_CACHE.get_proxy(NM_BUS, NM_PATH)
+        dbus.Interface(proxy, NM_BUS).ActivateConnection(
+            dbus.ObjectPath(path), dbus.ObjectPath(self.device), dbus.ObjectPath(network['path']),
+            reply_handler=lambda *args: None, error_handler=error_handler,
+            timeout=CALL_TIMEOUT)
+
+    def add_connection(self, network, password, error_handler):
+        """
+        Make a new connection profile for the network and activate it, with the password as the
+        key of whichever security the access point has. NetworkManager fills in everything we
+        leave out from the access point.
+        """
+        settings = {}
+        if password is not None and network.get('security'):
+            settings['802-11-wireless-security'] = get_security_settings(network['security'],
+                                                                         password)
+        proxy = dbus_main.PROPERTY_CACHE.get_proxy(NM_BUS, NM_PATH)
+        dbus.Interface(proxy, NM_BUS).AddAndActivateConnection(
+            dbus.Dictionary(settings, signature='sa{sv}'), dbus.ObjectPath(self.device),
+            dbus.ObjectPath(network['path']), reply_handler=lambda *args: None,
+            error_handler=error_handler, timeout=CALL_TIMEOUT)
+
+ACCESS_POINTS = AccessPointTable()
@@ -3,28 +3,62 @@ The purpose of this module is to manage the wifi icon that appears in the menu b
 """
 
 import tkinter
-from multiprocessing import Value
-import dbus
-from PIL import ImageTk, Image
 import Modules.DBus.dbus_main as dbus_main
+import Modules.DBus.dispatcher as dispatcher
+import Modules.Cache.icon_cache as icon_cache
+import Modules.Status.status_model as status_model
+import Modules.Wifi.access_points as access_points
+import Modules.Profiling.metrics as metrics
 import __main__
 
-def get_wifi_dev():
+NM_BUS = 'org.freedesktop.NetworkManager'
+NM_DEVICE = 'org.freedesktop.NetworkManager.Device'
+NM_WIRELESS = 'org.freedesktop.NetworkManager.Device.Wireless'
+NM_ACCESS_POINT = 'org.freedesktop.NetworkManager.AccessPoint'
+
+def find_wifi_dev(objects):
     """
-    Get the first wifi device in the system.
+    Find the first wifi device in NetworkManager's managed objects.
     """
-    proxy = dbus_main.DBUS_BUS.get_object('org.freedesktop.NetworkManager',
-                                          '/org/freedesktop/NetworkManager')
-    getmanager = dbus.Interface(proxy, 'org.freedesktop.NetworkManager')
-    devices = getmanager.GetDevices()
-    for device in devices:
-        deviceobject = dbus_main.DBUS_BUS.get_object('org.freedesktop.NetworkManager', device)
-        deviceinterface = dbus.Interface(deviceobject,
-                                         dbus_interface='org.freedesktop.DBus.Properties')
-        if deviceinterface.Get('org.freedesktop.NetworkManager.Device', 'DeviceType') == 2:
-            return device
+    for path in sorted(objects):
+        if NM_DEVICE in objects[path] and objects[path][NM_DEVICE].get('DeviceType') == 2:
+            return str(path)
     return None
 
+def probe_wifi(reply_handler, error_handler):
+    """
+    Start looking for the first wifi device and its active access point without blocking.
+    NetworkManager's object manager gives us every device and its properties in one asynchronous
+    call (which also seeds the property cache), and once the device is known we fetch its active
+    access point. The reply handler is called (normally on the DBus thread) with the device and the
+    access point properties, which are empty when we're not connected. The error handler is called
+    if there is no wifi device or NetworkManager doesn't answer within its probe timeout.
+    """
+    timeout = dbus_main.get_probe_timeout(NM_BUS)
+
+    def got_objects(objects):
+        wifi_dev = find_wifi_dev(objects)
+        if wifi_dev is None:
+            error_handler(None)
+            return
+        dbus_main.PROPERTY_CACHE.watch_async(NM_BUS, wifi_dev, NM_WIRELESS,
+                                             lambda properties: got_device(wifi_dev, properties),
+                                             error_handler, timeout)
+
+    def got_device(wifi_dev, properties):
+        connection = str(properties.get('ActiveAccessPoint', '/'))
+        if connection == '/':
+            reply_handler(wifi_dev, connection, {})
+            return
+        dbus_main.PROPERTY_CACHE.watch_async(NM_BUS, connection, NM_ACCESS_POINT,
+                                             lambda access_point: reply_handler(wifi_dev,
+                                                                                connection,
+                                                                                access_point),
+                                             error_handler, timeout)
+
+    dbus_main.PROPERTY_CACHE.get_managed_objects_async(NM_BUS, '/org/freedesktop', got_objects,
+                                                       error_handler, timeout)
+
 class WifiIcon(tkinter.Label): #pylint: disable=too-many-ancestors, too-many-instance-attributes
     """
     This is the main class for the wifi icon that gets displayed in the menubar.
@@ -39,102 +73,143 @@ class WifiIcon(tkinter.Label): #pylint: disable=too-many-ancestors, too-many-ins
         self.configure(height=self.widget_size)
         self.configure(background=self.parent['background'])
         self.load_images()
-        self.wifi_dev = get_wifi_dev()
-        self.wifi_signal = Value('i', 100)
-        self.wifi_status = Value('i', 1) #0=off, 1=connected, 2=disconnected
-        self.wifi_connection = None
-        self.get_active_wifi_connection()
-        self.get_wifi_connection_strength()
-        self.bind('<<wifi_update>>', self.select_image)
+        self.status = status_model.WifiStatus()
+        self.status.subscribe(self.status_changed, ('present', 'status', 'signal'))
+        self.missing = False
+        self.shown_image = None
+        self.device = None
+        self.access_point = None
         self.select_image()
-        dbus_main.DBUS_BUS.add_signal_receiver(self.dbus_signal_handler,
-                                               bus_name='org.freedesktop.NetworkManager',
-                                               dbus_interface='org.freedesktop.DBus.Properties',
-                                               signal_name='PropertiesChanged',
-                                               path=self.wifi_dev)
-        dbus_main.DBUS_BUS.add_signal_receiver(self.dbus_signal_handler,
-                                               bus_name='org.freedesktop.NetworkManager',
-                                               dbus_interface='org.freedesktop.DBus.Properties',
-                                               signal_name='PropertiesChanged',
-                                               path=self.wifi_connection)
-        self.update()
+        dbus_main.PROPERTY_CACHE.watch_name_owner(NM_BUS, self.owner_changed)
+        probe_wifi(self.wifi_found, self.wifi_not_found)
+
+    def owner_changed(self, owner):
+        """
+        Called (on the DBus thread) when NetworkManager starts, stops or is restarted. The wifi
+        device is probed again when it comes up, so the icon isn't gone for good if
+        NetworkManager started after us or was too slow to answer the first probe.
+        """
+        if owner:
+            probe_wifi(self.wifi_found, self.wifi_not_found)
+        else:
+            self.wifi_not_found()
+
+    def wifi_found(self, wifi_dev, connection, access_point):
+        """
+        Callback for when the wifi probe returns with a device. NetworkManager uses "/" as the path
+        when there is no active access point, in which case we are disconnected. From here on the
+        access point is watched by the subscription following it, so the probe lets go of its own
+        watch.
+        """
+        if connection == '/':
+            self.status.update(device=wifi_dev, connection=connection, status=2, present=True)
+        else:
+            self.status.update(device=wifi_dev, connection=connection, status=1,
+                               signal=int(access_point.get('Strength', 0)), present=True)
+        self.stop_following()
+        self.device = wifi_dev
+        dbus_main.PROPERTY_CACHE.subscribe(NM_BUS, wifi_dev, NM_WIRELESS, self.dbus_signal_handler)
+        access_points.ACCESS_POINTS.set_device(wifi_dev)
+        self.access_point = dbus_main.SUBSCRIPTIONS.follow(NM_BUS, wifi_dev, NM_WIRELESS,
+                                                           'ActiveAccessPoint', NM_ACCESS_POINT,
+                                                           self.access_point_handler,
+                                                           dbus_main.get_probe_timeout(NM_BUS))
+        if connection != '/':
+            dbus_main.PROPERTY_CACHE.unwatch(NM_BUS, connection, NM_ACCESS_POINT)
+        dispatcher.post(self.show)
+
+    def stop_following(self):
+        """
+        Let go of the wifi device and its active access point, if we were following them.
+        """
+        if self.device is None:
+            return
+        dbus_main.PROPERTY_CACHE.unsubscribe(NM_BUS, self.device, NM_WIRELESS,
+                                             self.dbus_signal_handler)
+        self.access_point.cancel()
+        self.device = None
+        self.access_point = None
+
+    def wifi_not_found(self, error=None): #pylint: disable=unused-argument
+        """
+        Callback for when there is no wifi device, or NetworkManager didn't answer in time.
+        """
+        self.stop_following()
+        access_points.ACCESS_POINTS.set_device(None)
+        if 'present' in self.status.update(present=False):
+            print("Could Not Detect Wifi")
+            dispatcher.post(self.hide)
+
+    def hide(self, event=None): #pylint: disable=unused-argument
+        """
+        Take the icon out of the menu bar, and make sure the menu bar doesn't put it back.
+        """
+        self.missing = True
+        self.pack_forget()
+
+    def show(self, event=None): #pylint: disable=unused-argument
+        """
+        Have the menu bar put the icon back, if it was hidden.
+        """
+        if self.missing:
+            self.missing = False
+            self.event_generate('<<StatusIconShown>>')
 
     def dbus_signal_handler(self, interface, data, signaltype): #pylint: disable=unused-argument
         """
-        This is the main DBus callback that gets made whenever DBus signals a change to the wifi.
+        This is the main DBus callback that gets made whenever DBus signals a change to the wifi
+        device. The subscription manager moves the access point subscription when the active
+        access point changes, so all we need to do here is track whether we're connected.
         """
-        update = False
-        if 'Strength' in data and int(data['Strength']) != self.wifi_signal.value:
-            self.wifi_signal.value = int(data['Strength'])
-            update = True
-        if 'ActiveAccessPoint' in data and str(data['ActiveAccessPoint']) != self.wifi_connection:
-            self.wifi_connection = str(data['ActiveAccessPoint'])
-            update = True
-        if update is True:
-            self.event_generate('<<battery_update>>')
-            update = False
+        if 'ActiveAccessPoint' in data:
+            connection = str(data['ActiveAccessPoint'])
+            self.status.update(connection=connection, status=2 if connection == '/' else 1)
 
-    def get_active_wifi_connection(self):
+    def access_point_handler(self, interface, data, signaltype): #pylint: disable=unused-argument
         """
-        Get the active wifi connection for the main wifi device.
+        The DBus callback for the active access point, called with all of its properties when we
+        move to a new one and with the changes after that.
         """
-        proxy = dbus_main.DBUS_BUS.get_object('org.freedesktop.NetworkManager', self.wifi_dev)
-        getmanager = dbus.Interface(proxy, dbus_interface='org.freedesktop.DBus.Properties')
-        self.wifi_connection = str(getmanager.Get('org.freedesktop.NetworkManager.Device.Wireless',
-                                                  'ActiveAccessPoint'))
+        if 'Strength' in data:
+            self.status.update(signal=int(data['Strength']))
 
-    def get_wifi_connection_strength(self):
+    def status_changed(self, status, changed): #pylint: disable=unused-argument
         """
-        Get the wifi strength of the active wifi connection.
+        Called by the status model (normally on the DBus thread) when something we show changes.
         """
-        apobject = dbus_main.DBUS_BUS.get_object('org.freedesktop.NetworkManager',
-                                                 self.wifi_connection)
-        apinterface = dbus.Interface(apobject, dbus_interface='org.freedesktop.DBus.Properties')
-        self.wifi_signal.value = int(apinterface.Get('org.freedesktop.NetworkManager.AccessPoint',
-                                                     'Strength'))
+        dispatcher.post(self.select_image)
 
     def load_images(self):
         """
-        This function loads all the images necessary for the wifi status icon.
-        """
-        self.status_images['100'] = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Wifi/wifi_100.png").convert('RGBA').resize((self.image_size,
-                                                                  self.image_size)))
-        self.status_images['75'] = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Wifi/wifi_75.png").convert('RGBA').resize((self.image_size,
-                                                                 self.image_size)))
-        self.status_images['50'] = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Wifi/wifi_50.png").convert('RGBA').resize((self.image_size,
-                                                                 self.image_size)))
-        self.status_images['25'] = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Wifi/wifi_25.png").convert('RGBA').resize((self.image_size,
-                                                                 self.image_size)))
-        self.status_images['disc'] = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Wifi/wifi_disc.png").convert('RGBA').resize((self.image_size,
-                                                                   self.image_size)))
-        self.status_images['off'] = ImageTk.PhotoImage(Image.open(__main__.DIR_PATH + \
-            "/Modules/Wifi/wifi_off.png").convert('RGBA').resize((self.image_size,
-                                                                  self.image_size)))
+        This function loads all the images necessary for the wifi status icon, from the wifi atlas.
+        """
+        atlas = icon_cache.SpriteAtlas(__main__.DIR_PATH + "/Modules/Wifi", "wifi", "wifi_")
+        for state in ('100', '75', '50', '25', 'disc', 'off'):
+            self.status_images[state] = atlas.get_icon(state, self.image_size)
+        self.status_images['placeholder'] = tkinter.PhotoImage(width=self.image_size,
+                                                               height=self.image_size)
 
     def select_image(self, event=None): #pylint: disable=unused-argument
         """
-        This function is indirectly triggered by the DBus thread whenever there is a change to the
-        wifi connection status or signal strength.
+        This function is posted to the dispatcher whenever there is a change to the wifi connection
+        status or signal strength. The label is only reconfigured if the image actually changes.
         """
-        if self.wifi_status.value == 0:
-            self.configure(image=self.status_images['off'])
-            return
-        if self.wifi_status.value == 2:
-            self.configure(image=self.status_images['disc'])
-            return
-        if self.wifi_signal.value > 75:
-            self.configure(image=self.status_images['100'])
-            return
-        if self.wifi_signal.value > 50:
-            self.configure(image=self.status_images['75'])
-            return
-        if self.wifi_signal.value > 25:
-            self.configure(image=self.status_images['50'])
-            return
-        self.configure(image=self.status_images['25'])
-        return
+        name = self.get_image_name()
+        metrics.count('select_image', 'wifi')
+        if name != self.shown_image:
+            metrics.count('image_swaps', 'wifi')
+            self.shown_image = name
+            self.configure(image=self.status_images[name])
+
+    def get_image_name(self):
+        """
+        Work out which of the status images to show. Until the probe returns we show a blank
+        placeholder.
+        """
+        if self.status.present is not True:
+            return 'placeholder'
+        if self.status.status == 0:
+            return 'off'
+        if self.status.status == 2:
+            return 'disc'
+        return str(access_points.get_signal_level(self.status.signal))
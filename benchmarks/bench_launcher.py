@@ -0,0 +1,356 @@
+#!/usr/bin/python3
+
+"""
+Headless benchmarks for the launcher. This builds the launcher against the DBus stub (see
+dbus_stub.py) on a virtual X server and times the paths we care about: constructing Main,
+building the icon grid with 8, 100 and 500 applications (and filling in its icons in the
+background), building and scrolling through the virtual and canvas icon grids with 100 and 500
+applications, building the settings tab, switching tabs and dispatching status icon updates.
+Results are reported as the median and percentiles of each benchmark, and compared against a
+stored baseline.
+
+If DISPLAY isn't set an Xvfb server is started for the duration of the run. The icon cache and the
+XDG data directories point at an empty scratch directory and the volume control uses the fake
+mixer, so Main always shows the built-in placeholder applications and the numbers don't depend on
+what is installed on the machine.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+BENCH_DIR = os.path.dirname(os.path.realpath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+APP_ICONS = ['browser', 'chat', 'console', 'controller', 'internet', 'mail', 'music', 'notepad']
+
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+def start_xvfb(geometry):
+    """
+    Start an Xvfb server on a free display number and point DISPLAY at it.
+    """
+    if shutil.which('Xvfb') is None:
+        sys.exit("DISPLAY is not set and Xvfb is not installed")
+    for display in range(99, 199):
+        if not os.path.exists('/tmp/.X11-unix/X%d' % display) and \
+           not os.path.exists('/tmp/.X%d-lock' % display):
+            break
+    server = subprocess.Popen(['Xvfb', ':%d' % display, '-screen', '0', geometry + 'x24',
+                               '-nolisten', 'tcp'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        if os.path.exists('/tmp/.X11-unix/X%d' % display):
+            break
+        time.sleep(0.05)
+    os.environ['DISPLAY'] = ':%d' % display
+    return server
+
+def set_mainapp(mainapp):
+    """
+    The launcher modules find the running launcher (and the directory it lives in) through
+    __main__, which here is this script rather than main.py.
+    """
+    sys.modules['__main__'].MAINAPP = mainapp
+    sys.modules['__main__'].DIR_PATH = REPO_DIR
+
+def make_app_list(count):
+    """
+    Build a synthetic list of applications using the bundled icons.
+    """
+    return [{'name': 'Application %d' % number,
+             'icon': os.path.join(REPO_DIR, 'Modules/Applications',
+                                  APP_ICONS[number % len(APP_ICONS)] + '.png'),
+             'shortcut': '/usr/bin/true'}
+            for number in range(count)]
+
+def get_percentile(samples, percentile):
+    """
+    Nearest rank percentile of a list of samples.
+    """
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(percentile / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+def summarize(samples):
+    """
+    Summarize a list of timings in milliseconds.
+    """
+    return {'runs': len(samples),
+            'min': round(min(samples), 3),
+            'median': round(statistics.median(samples), 3),
+            'p90': round(get_percentile(samples, 90), 3),
+            'p99': round(get_percentile(samples, 99), 3),
+            'max': round(max(samples), 3)}
+
+class Benchmarks:
+    """
+    The benchmarks themselves. Every bench_* method returns the time taken by one run in
+    milliseconds, doing any setup and teardown outside of the timed section.
+    """
+    def __init__(self, main_module, bus):
+        self.main = main_module
+        self.bus = bus
+        self.root = None
+
+    def make_root(self):
+        """
+        Build a bare root window with the launcher style, for the benchmarks that don't want to
+        build the whole of Main.
+        """
+        import tkinter #pylint: disable=import-outside-toplevel
+        root = tkinter.Tk()
+        root.configure(background="#505050")
+        root.accent_color = '#0078D4'
+        root.style = self.main.ui_elements.CustomStyle(root)
+        return root
+
+    def wait_for_icons(self):
+        """
+        Wait for the icon loader to finish, and hand the icons it loaded to whoever asked for them.
+        """
+        import Modules.Cache.icon_loader as icon_loader #pylint: disable=import-outside-toplevel
+        while not icon_loader.ICON_LOADER.is_idle():
+            time.sleep(0.001)
+        self.main.dispatcher.DISPATCHER.flush()
+
+    def bench_main(self):
+        """
+        Construct the whole launcher and let it draw its first frame.
+        """
+        start = time.perf_counter()
+        mainapp = self.main.Main()
+        set_mainapp(mainapp)
+        mainapp.update()
+        elapsed = time.perf_counter() - start
+        mainapp.destroy()
+        return elapsed * 1000
+
+    def bench_icon_list(self, count, fill=False):
+        """
+        Build the icon grid for a fixed number of applications, up to its first paint with
+        placeholder tiles or, with fill, until every icon has been filled in.
+        """
+        root = self.make_root()
+        screen_layout = self.main.layout.ScreenLayout(480, 272)
+        app_list = make_app_list(count)
+        import Modules.Applications.applications as applications #pylint: disable=import-outside-toplevel
+        start = time.perf_counter()
+        iconlist = applications.IconList(root, screen_layout, app_list=app_list)
+        iconlist.pack()
+        root.update()
+        if fill:
+            self.wait_for_icons()
+            root.update()
+        elapsed = time.perf_counter() - start
+        self.wait_for_icons()
+        root.destroy()
+        return elapsed * 1000
+
+    def bench_canvas_grid(self, count, grid_class='VirtualIconList'):
+        """
+        Build one of the canvas based icon grids for a fixed number of applications, and scroll it
+        from top to bottom a row at a time.
+        """
+        import tkinter #pylint: disable=import-outside-toplevel
+        import Modules.Applications.applications as applications #pylint: disable=import-outside-toplevel
+        root = self.make_root()
+        screen_layout = self.main.layout.ScreenLayout(480, 272)
+        canvas = tkinter.Canvas(root, background=root['background'], highlightthickness=0,
+                                width=screen_layout.center_width,
+                                height=screen_layout.center_height)
+        canvas.pack()
+        app_list = make_app_list(count)
+        start = time.perf_counter()
+        iconlist = getattr(applications, grid_class)(canvas, screen_layout, app_list=app_list)
+        root.update()
+        for row in range(iconlist.get_num_rows()):
+            canvas.yview_moveto(row / iconlist.get_num_rows())
+            iconlist.update_visible()
+        root.update()
+        elapsed = time.perf_counter() - start
+        self.wait_for_icons()
+        root.destroy()
+        return elapsed * 1000
+
+    def bench_settings_frame(self):
+        """
+        Build the settings tab.
+        """
+        import tkinter #pylint: disable=import-outside-toplevel
+        import Modules.Settings.settings as settings #pylint: disable=import-outside-toplevel
+        root = self.make_root()
+        screen_layout = self.main.layout.ScreenLayout(480, 272)
+        tab = tkinter.Frame(root, background=root['background'], width=screen_layout.frame_width,
+                            height=screen_layout.frame_height)
+        tab.pack()
+        start = time.perf_counter()
+        settingsframe = settings.SettingsFrame(tab, screen_layout)
+        settingsframe.pack()
+        root.update()
+        elapsed = time.perf_counter() - start
+        root.destroy()
+        return elapsed * 1000
+
+    def bench_tab_switch(self):
+        """
+        Switch to the settings tab and back again on an already built launcher.
+        """
+        mainapp = self.get_shared_main()
+        notebook = mainapp.applauncher.notebook
+        start = time.perf_counter()
+        notebook.select(1)
+        mainapp.update()
+        notebook.select(0)
+        mainapp.update()
+        return (time.perf_counter() - start) * 1000
+
+    def bench_status_update(self):
+        """
+        Push a burst of battery, wifi and bluetooth property changes through the widgets' DBus
+        handlers and let them redraw. The dispatcher is flushed rather than waiting a frame for it,
+        so this measures the handlers and the (coalesced) redraws.
+        """
+        import dbus_stub #pylint: disable=import-outside-toplevel
+        mainapp = self.get_shared_main()
+        start = time.perf_counter()
+        for step in range(20):
+            self.bus.emit_properties_changed(dbus_stub.BATTERY_DEVICE,
+                                             'org.freedesktop.UPower.Device',
+                                             {'Percentage': float(5 + step * 5), 'State': 2})
+            self.bus.emit_properties_changed(dbus_stub.WIFI_ACCESS_POINT,
+                                             'org.freedesktop.NetworkManager.AccessPoint',
+                                             {'Strength': 10 + step * 4})
+            self.bus.emit_properties_changed(dbus_stub.BLUETOOTH_ADAPTER, 'org.bluez.Adapter1',
+                                             {'Powered': bool(step % 2)})
+        self.main.dispatcher.DISPATCHER.flush()
+        mainapp.update()
+        return (time.perf_counter() - start) * 1000
+
+    def get_shared_main(self):
+        """
+        Some benchmarks run against one launcher that is built once and then reused.
+        """
+        if self.root is None:
+            self.root = self.main.Main()
+            set_mainapp(self.root)
+            self.root.update()
+        return self.root
+
+    def get_benchmarks(self):
+        """
+        Return the benchmarks to run, in order, as (name, callable) pairs.
+        """
+        return [('main', self.bench_main),
+                ('icon_list_8', lambda: self.bench_icon_list(8)),
+                ('icon_list_100', lambda: self.bench_icon_list(100)),
+                ('icon_list_500', lambda: self.bench_icon_list(500)),
+                ('icon_fill_100', lambda: self.bench_icon_list(100, fill=True)),
+                ('virtual_list_100', lambda: self.bench_canvas_grid(100)),
+                ('virtual_list_500', lambda: self.bench_canvas_grid(500)),
+                ('canvas_list_100', lambda: self.bench_canvas_grid(100, 'CanvasIconList')),
+                ('canvas_list_500', lambda: self.bench_canvas_grid(500, 'CanvasIconList')),
+                ('settings_frame', self.bench_settings_frame),
+                ('tab_switch', self.bench_tab_switch),
+                ('status_update', self.bench_status_update)]
+
+def run_benchmarks(benchmarks, runs, warmup, only):
+    """
+    Run every benchmark the requested number of times and summarize the results.
+    """
+    results = {}
+    for name, function in benchmarks.get_benchmarks():
+        if only and name not in only:
+            continue
+        for _ in range(warmup):
+            function()
+        samples = [function() for _ in range(runs)]
+        results[name] = summarize(samples)
+        print("%-16s median %9.3f ms   p90 %9.3f ms   p99 %9.3f ms" %
+              (name, results[name]['median'], results[name]['p90'], results[name]['p99']))
+    return results
+
+def compare_baseline(results, baseline, tolerance):
+    """
+    Compare the medians against the baseline, returning the names of the benchmarks that got
+    slower by more than the tolerance.
+    """
+    regressions = []
+    print("\n%-16s %12s %12s %8s" % ('benchmark', 'baseline', 'current', 'change'))
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['median']
+        change = ((result['median'] - before) / before * 100) if before else 0.0
+        flag = ''
+        if change > tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print("%-16s %9.3f ms %9.3f ms %+7.1f%%%s" % (name, before, result['median'], change,
+                                                     flag))
+    return regressions
+
+def parse_arguments(argv):
+    """
+    Parse the command line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Pocket Menu headless benchmarks")
+    parser.add_argument('--runs', type=int, default=15, help="timed runs per benchmark")
+    parser.add_argument('--warmup', type=int, default=2, help="untimed runs per benchmark")
+    parser.add_argument('--only', action='append', help="only run the named benchmark")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline file to compare to")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=10.0,
+                        help="percent slowdown of a median that counts as a regression")
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    parser.add_argument('--geometry', default='480x272', help="Xvfb screen size")
+    return parser.parse_args(argv)
+
+def main(argv):
+    """
+    Set up the stubbed, headless environment and run the benchmarks.
+    """
+    arguments = parse_arguments(argv)
+    server = None
+    if not os.environ.get('DISPLAY'):
+        server = start_xvfb(arguments.geometry)
+    scratch = tempfile.mkdtemp(prefix='pocket-menu-bench-')
+    os.environ['XDG_CACHE_HOME'] = os.path.join(scratch, 'cache')
+    os.environ['XDG_DATA_HOME'] = os.path.join(scratch, 'data')
+    os.environ['XDG_DATA_DIRS'] = os.path.join(scratch, 'data')
+    os.environ['POCKET_MENU_MIXER'] = 'fake'
+    try:
+        import dbus_stub #pylint: disable=import-outside-toplevel
+        bus = dbus_stub.install()
+        import main as main_module #pylint: disable=import-outside-toplevel
+        set_mainapp(None)
+        benchmarks = Benchmarks(main_module, bus)
+        results = run_benchmarks(benchmarks, arguments.runs, arguments.warmup, arguments.only)
+        regressions = []
+        if os.path.exists(arguments.baseline) and not arguments.save_baseline:
+            with open(arguments.baseline, encoding='utf-8') as baselinefile:
+                regressions = compare_baseline(results, json.load(baselinefile),
+                                               arguments.tolerance)
+        if arguments.save_baseline:
+            with open(arguments.baseline, 'w', encoding='utf-8') as baselinefile:
+                json.dump(results, baselinefile, indent=1, sort_keys=True)
+        if arguments.output:
+            with open(arguments.output, 'w', encoding='utf-8') as outputfile:
+                json.dump(results, outputfile, indent=1, sort_keys=True)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+        if server is not None:
+            server.terminate()
+            server.wait()
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
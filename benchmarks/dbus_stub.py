@@ -0,0 +1,221 @@
+"""
+A stand-in for Modules.DBus.dbus_main used by the benchmarks. It answers the calls the widgets make
+from a table of canned objects instead of talking to a real system bus, so the launcher can be
+built on a machine (or a CI runner) without NetworkManager, BlueZ or UPower. Signals can be
+injected with emit_properties_changed, and services can be made to come and go with
+set_name_owner.
+
+Call install() before anything under Modules is imported.
+"""
+
+import sys
+import types
+
+WIFI_DEVICE = '/org/freedesktop/NetworkManager/Devices/3'
+WIFI_ACCESS_POINT = '/org/freedesktop/NetworkManager/AccessPoint/1'
+BATTERY_DEVICE = '/org/freedesktop/UPower/devices/DisplayDevice'
+BLUETOOTH_ADAPTER = '/org/bluez/hci0'
+
+OBJECTS = {
+    ('org.freedesktop.NetworkManager', '/org/freedesktop/NetworkManager'): {
+        'org.freedesktop.NetworkManager': {'Devices': [WIFI_DEVICE]},
+    },
+    ('org.freedesktop.NetworkManager', WIFI_DEVICE): {
+        'org.freedesktop.NetworkManager.Device': {'DeviceType': 2, 'State': 100},
+        'org.freedesktop.NetworkManager.Device.Wireless': {
+            'ActiveAccessPoint': WIFI_ACCESS_POINT, 'AccessPoints': [WIFI_ACCESS_POINT]},
+    },
+    ('org.freedesktop.NetworkManager', WIFI_ACCESS_POINT): {
+        'org.freedesktop.NetworkManager.AccessPoint': {'Strength': 80, 'Ssid': b'bench',
+                                                       'Flags': 0, 'WpaFlags': 0,
+                                                       'RsnFlags': 0},
+    },
+    ('org.freedesktop.UPower', BATTERY_DEVICE): {
+        'org.freedesktop.UPower.Device': {'IsPresent': True, 'Percentage': 64.0, 'State': 2},
+    },
+    ('org.bluez', BLUETOOTH_ADAPTER): {
+        'org.bluez.Adapter1': {'Powered': True, 'Address': '00:00:00:00:00:00'},
+    },
+}
+
+class StubMatch: #pylint: disable=too-few-public-methods
+    """
+    Stand-in for a dbus-python SignalMatch.
+    """
+    def __init__(self, bus, handler, keywords):
+        self.bus = bus
+        self.handler = handler
+        self.keywords = keywords
+
+    def remove(self):
+        """
+        Stop delivering signals to this match.
+        """
+        if self in self.bus.matches:
+            self.bus.matches.remove(self)
+
+class StubObject:
+    """
+    Stand-in for a dbus-python proxy object. Method calls are answered from OBJECTS.
+    """
+    def __init__(self, bus_name, path):
+        self.bus_name = bus_name
+        self.object_path = path
+
+    def get_dbus_method(self, member, dbus_interface=None): #pylint: disable=unused-argument
+        """
+        Return a callable for the given method, which also honours reply_handler.
+        """
+        def method(*args, **keywords):
+            try:
+                result = self.call(member, args)
+            except KeyError as error:
+                if 'error_handler' in keywords:
+                    keywords['error_handler'](error)
+                    return None
+                raise
+            if 'reply_handler' in keywords:
+                if isinstance(result, tuple):
+                    keywords['reply_handler'](*result)
+                else:
+                    keywords['reply_handler'](result)
+                return None
+            return result
+        return method
+
+    def __getattr__(self, member):
+        return self.get_dbus_method(member)
+
+    def call(self, member, args):
+        """
+        Answer a method call from the table of canned objects.
+        """
+        interfaces = OBJECTS[(self.bus_name, self.object_path)] \
+            if (self.bus_name, self.object_path) in OBJECTS else {}
+        if member == 'Get':
+            return interfaces[args[0]][args[1]]
+        if member == 'GetAll':
+            return dict(interfaces.get(args[0], {}))
+        if member == 'GetDevices':
+            return interfaces['org.freedesktop.NetworkManager']['Devices']
+        if member in ('GetAllAccessPoints', 'GetAccessPoints'):
+            return interfaces['org.freedesktop.NetworkManager.Device.Wireless']['AccessPoints']
+        if member == 'GetManagedObjects':
+            return {path: dict(value) for (bus_name, path), value in OBJECTS.items()
+                    if bus_name == self.bus_name}
+        return None
+
+class StubBus:
+    """
+    Stand-in for the dbus-python system bus.
+    """
+    def __init__(self):
+        self.matches = []
+        self.owner_watches = {}
+
+    def get_object(self, bus_name, path, **keywords): #pylint: disable=unused-argument, no-self-use
+        """
+        Return a proxy for a canned object.
+        """
+        return StubObject(bus_name, path)
+
+    def add_signal_receiver(self, handler, signal_name=None, dbus_interface=None, bus_name=None,
+                            path=None, **keywords):
+        """
+        Remember a signal handler so emit_properties_changed can call it.
+        """
+        keywords.update({'signal_name': signal_name, 'dbus_interface': dbus_interface,
+                         'bus_name': bus_name, 'path': path})
+        match = StubMatch(self, handler, keywords)
+        self.matches.append(match)
+        return match
+
+    def emit_properties_changed(self, path, interface, changed):
+        """
+        Deliver a PropertiesChanged signal to every handler whose match rule accepts it.
+        """
+        for match in list(self.matches):
+            keywords = match.keywords
+            if keywords['signal_name'] not in (None, 'PropertiesChanged'):
+                continue
+            if keywords['path'] not in (None, path):
+                continue
+            if keywords.get('arg0') not in (None, interface):
+                continue
+            extra = {}
+            if keywords.get('path_keyword'):
+                extra[keywords['path_keyword']] = path
+            match.handler(interface, changed, [], **extra)
+
+    def watch_name_owner(self, bus_name, callback):
+        """
+        Remember a name owner callback, and call it with the current owner straight away. Every
+        service with canned objects is owned from the start.
+        """
+        self.owner_watches.setdefault(bus_name, []).append(callback)
+        owned = any(name == bus_name for name, path in OBJECTS)
+        callback(':1.' + str(len(self.owner_watches)) if owned else '')
+
+    def set_name_owner(self, bus_name, owner):
+        """
+        Give a service name a new owner, or take it away with ''.
+        """
+        for callback in list(self.owner_watches.get(bus_name, ())):
+            callback(owner)
+
+def make_dbus_module():
+    """
+    Build a minimal replacement for the dbus package, for machines without dbus-python.
+    """
+    module = types.ModuleType('dbus')
+
+    class Interface: #pylint: disable=too-few-public-methods
+        """
+        Minimal dbus.Interface, forwarding method calls to the proxy.
+        """
+        def __init__(self, obj, dbus_interface=None):
+            self.proxy_object = obj
+            self.dbus_interface = dbus_interface
+
+        def __getattr__(self, member):
+            return self.proxy_object.get_dbus_method(member, self.dbus_interface)
+
+    class DBusException(Exception):
+        """
+        Minimal dbus.exceptions.DBusException.
+        """
+
+    module.exceptions = types.SimpleNamespace(DBusException=DBusException)
+    module.Interface = Interface
+    module.UInt32 = int
+    module.Int32 = int
+    module.Boolean = bool
+    module.String = str
+    module.ObjectPath = str
+    module.Dictionary = dict
+    module.Array = list
+    module.Byte = int
+    return module
+
+def install():
+    """
+    Swap dbus_main (and dbus itself if it isn't installed) for the stubs. Returns the stub bus.
+    """
+    try:
+        import dbus #pylint: disable=import-outside-toplevel, unused-import
+    except ImportError:
+        sys.modules['dbus'] = make_dbus_module()
+    from Modules.DBus.property_cache import PropertyCache #pylint: disable=import-outside-toplevel
+    from Modules.DBus.subscriptions import SubscriptionManager #pylint: disable=import-outside-toplevel
+    module = types.ModuleType('Modules.DBus.dbus_main')
+    module.DBUS_BUS = StubBus()
+    module.PROPERTY_CACHE = PropertyCache(module.DBUS_BUS)
+    module.SUBSCRIPTIONS = SubscriptionManager(module.PROPERTY_CACHE)
+    module.get_probe_timeout = lambda bus_name: 1.0
+    module.DBUS_LOOP = None
+    module.MAINLOOP = None
+    module.DBUS_THREAD = None
+    import Modules.DBus #pylint: disable=import-outside-toplevel
+    sys.modules['Modules.DBus.dbus_main'] = module
+    Modules.DBus.dbus_main = module
+    return module.DBUS_BUS
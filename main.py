@@ -4,47 +4,161 @@
 This is the launcher application written in Python 3 / TKinter to replace the Pocket-Home app for
 devices running Debian 11. This file represents the main executable that kicks off the program as
 a whole.
+
+By default only a bare root window in the launcher's background colour is drawn before anything
+heavy is imported: PIL, dbus, gi and the UI modules (and with them the connection to the system
+bus and the DBus thread) are only loaded once that first frame is on screen, so the screen lights
+up straight away even on a single core 1GHz device. --eager-imports loads them all up front
+instead, as modules importing this one (such as the benchmarks) also do.
 """
 
 import tkinter
 import os
-import Modules.DBus.dbus_main as dbus_main #pylint: disable=unused-import
-import Modules.Elements.ui_elements as ui_elements
-import Modules.Launcher.launcher as launcher
+import sys
+import argparse
+import Modules.Profiling.startup_profiler as startup_profiler
+import Modules.Profiling.import_check as import_check
+import Modules.Profiling.metrics as metrics
+import Modules.Profiling.watchdog as watchdog
+import Modules.DBus.dispatcher as dispatcher
+import Modules.Elements.layout as layout
+import Modules.Idle.idle_monitor as idle_monitor
+
+SCREEN_SIZE = (480, 272)
+BACKGROUND = "#505050"
+
+def parse_arguments(argv):
+    """
+    Parse the command line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Pocket CHIP home launcher")
+    parser.add_argument('--profile-startup', metavar='REPORT', nargs='?',
+                        const='startup-profile.json', default=None,
+                        help="time each phase of startup and write a JSON report on exit")
+    parser.add_argument('--grid-mode', choices=('virtual', 'canvas', 'widgets'), default='virtual',
+                        help="how the application grid is built: only the buttons in view "
+                        "(virtual), canvas items instead of buttons (canvas) or a button for every "
+                        "application (widgets)")
+    parser.add_argument('--eager-imports', action='store_true',
+                        help="import everything before drawing the first frame")
+    parser.add_argument('--import-check', action='store_true',
+                        help="check nothing heavy is imported before the first frame, report how "
+                        "long each deferred module takes to import and exit")
+    parser.add_argument('--watchdog', metavar='LOG', nargs='?', const='watchdog.log',
+                        default=None,
+                        help="measure how long the main loop stalls, sample the stack while it "
+                        "does and write what was found to a log")
+    parser.add_argument('--stall-threshold', metavar='MS', type=int,
+                        default=watchdog.STALL_THRESHOLD_MS,
+                        help="how late the watchdog heartbeat must be to count as a stall "
+                        "(default: %(default)s)")
+    return parser.parse_args(argv)
+
+def import_modules():
+    """
+    Import the heavy modules. This connects to the system bus and starts the DBus thread (in
+    dbus_main), and loads PIL along with the UI modules.
+    """
+    #pylint: disable=global-statement, invalid-name, import-outside-toplevel, redefined-outer-name
+    global dbus_main, ui_elements, launcher, app_launcher
+    with startup_profiler.phase('import dbus_main'):
+        import Modules.DBus.dbus_main as dbus_main #pylint: disable=unused-import
+    with startup_profiler.phase('import ui_elements'):
+        import Modules.Elements.ui_elements as ui_elements
+    with startup_profiler.phase('import launcher'):
+        import Modules.Launcher.launcher as launcher
+        import Modules.Applications.app_launcher as app_launcher
+
+if __name__ == '__main__':
+    ARGUMENTS = parse_arguments(sys.argv[1:])
+    if ARGUMENTS.profile_startup:
+        startup_profiler.enable(ARGUMENTS.profile_startup)
+else:
+    import_modules()
 
 class Main(tkinter.Tk):
     """
     The main class which draws the screen, consisting of a frame, which is divided into a menu upper
     and a body lower. The menu upper is 10% of the screen Y size or 32 pixels (which ever is bigger)
     and spans the full X size. The body lower uses the remaining screen real estate.
+
+    With defer_imports the constructor only draws the bare root window, and the heavy modules are
+    imported and the rest of the launcher is built once that is on screen.
     """
-    def __init__(self):
+    def __init__(self, grid_mode='virtual', defer_imports=False):
         super().__init__()
+        self.grid_mode = grid_mode
+        self.screen_layout = layout.ScreenLayout(*SCREEN_SIZE)
         #self.attributes('-fullscreen', True)
-        self.geometry("480x272")
-        self.update()
-        self.configure(background="#505050")
+        self.geometry("%dx%d" % (self.screen_layout.screen_width,
+                                 self.screen_layout.screen_height))
+        self.configure(background=BACKGROUND)
         self.accent_color = '#0078D4'
-        self.style = ui_elements.CustomStyle(self)
         self.resizable(0, 0)
+        dispatcher.DISPATCHER.attach(self)
+        if defer_imports:
+            self.update_idletasks()
+            startup_profiler.mark('first paint')
+            self.after(1, self.build)
+        else:
+            self.build()
+
+    def build(self):
+        """
+        Build everything inside the root window, importing the heavy modules first if they
+        haven't been already.
+        """
+        if 'launcher' not in globals():
+            import_modules()
+        app_launcher.APP_LAUNCHER.attach(self)
+        with startup_profiler.phase('CustomStyle'):
+            self.style = ui_elements.CustomStyle(self)
         self.main_window = tkinter.Frame(self, background=self['background'], borderwidth=0,
-                                         width=self.winfo_width(), height=self.winfo_height())
+                                         width=self.screen_layout.screen_width,
+                                         height=self.screen_layout.screen_height)
         self.main_window.pack(fill="both", expand=True)
-        self.main_window.update()
-        self.menu = ui_elements.MenuBar(self.main_window)
+        with startup_profiler.phase('MenuBar'):
+            self.menu = ui_elements.MenuBar(self.main_window, self.screen_layout)
         self.menu.pack(side="top", fill="x")
-        self.menu.update()
-        self.body = tkinter.Frame(self.main_window, background=self.main_window['background'])
+        self.body = tkinter.Frame(self.main_window, background=self.main_window['background'],
+                                  height=self.screen_layout.body_height,
+                                  width=self.screen_layout.body_width)
         self.body.pack(side="bottom", fill="both", expand=True)
-        self.body.update()
-        self.body.configure(height=(self.main_window['height'] - self.menu['height']),
-                            width=self.main_window['width'])
-        self.update()
-        self.applauncher = launcher.MainAppWindow(self.body)
+        with startup_profiler.phase('MainAppWindow'):
+            self.applauncher = launcher.MainAppWindow(self.body, self.screen_layout,
+                                                      grid_mode=self.grid_mode)
         self.applauncher.pack(fill="both", expand=True)
         self.menu.title.config(text=self.applauncher.active_tab_name, fg="white")
+        startup_profiler.mark('built')
+
+def check_imports():
+    """
+    The import self-check: draw the bare root window, then report on the imports and exit.
+    """
+    root = tkinter.Tk()
+    root.geometry("%dx%d" % SCREEN_SIZE)
+    root.configure(background=BACKGROUND)
+    root.update_idletasks()
+    status = import_check.run(import_check.get_loaded_heavy_packages())
+    root.destroy()
+    sys.exit(status)
 
 if __name__ == '__main__':
     DIR_PATH = os.path.dirname(os.path.realpath(__file__))
-    MAINAPP = Main()
+    if ARGUMENTS.import_check:
+        check_imports()
+    if ARGUMENTS.eager_imports:
+        import_modules()
+    with startup_profiler.phase('Main'):
+        MAINAPP = Main(grid_mode=ARGUMENTS.grid_mode, defer_imports=not ARGUMENTS.eager_imports)
+    idle_monitor.IDLE_MONITOR.attach(MAINAPP)
+    metrics.METRICS.add_provider('dispatcher', dispatcher.DISPATCHER.get_counters)
+    metrics.METRICS.add_provider('idle', idle_monitor.IDLE_MONITOR.get_counters)
+    #app_launcher is only imported once the launcher is built, so look it up when asked
+    metrics.METRICS.add_provider('launches', lambda: app_launcher.APP_LAUNCHER.get_launch_stats()) #pylint: disable=unnecessary-lambda
+    if ARGUMENTS.watchdog:
+        watchdog.WATCHDOG.start(MAINAPP, ARGUMENTS.watchdog, ARGUMENTS.stall_threshold)
+        metrics.METRICS.add_provider('watchdog', watchdog.WATCHDOG.get_counters)
+    metrics.METRICS.attach(MAINAPP)
+    MAINAPP.after_idle(startup_profiler.mark, 'first idle')
     MAINAPP.mainloop()
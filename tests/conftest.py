@@ -0,0 +1,18 @@
+"""
+Shared setup for the tests. The modules are imported as Modules.<Area>.<name> from the top of the
+repository, and anything that talks to DBus gets the stub bus from the benchmarks (see
+benchmarks/dbus_stub.py) instead of the system bus, so the tests run without NetworkManager,
+BlueZ, UPower or even dbus-python.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import dbus_stub #pylint: disable=wrong-import-position
+
+dbus_stub.install()
@@ -0,0 +1,68 @@
+"""
+Tests for turning desktop file Exec lines into the command an application is started with.
+"""
+
+import unittest
+from unittest import mock
+from Modules.Applications import app_launcher
+from Modules.Applications.app_launcher import get_command
+
+class GetCommandTest(unittest.TestCase):
+    """
+    get_command splits the Exec line and expands its field codes as the desktop entry spec says.
+    """
+    def test_plain_command(self):
+        """
+        A plain command is split on whitespace.
+        """
+        self.assertEqual(get_command({'shortcut': 'mousepad --new-window'}),
+                         ['mousepad', '--new-window'])
+
+    def test_quoting(self):
+        """
+        Double quotes group an argument, and backslashes escape inside them.
+        """
+        self.assertEqual(get_command({'shortcut': 'sh -c "echo \\"hi there\\""'}),
+                         ['sh', '-c', 'echo "hi there"'])
+
+    def test_file_field_codes_are_dropped(self):
+        """
+        The launcher never opens files or URLs, so those field codes expand to nothing.
+        """
+        self.assertEqual(get_command({'shortcut': 'mousepad %F'}), ['mousepad'])
+        self.assertEqual(get_command({'shortcut': 'surf %u --fullscreen'}),
+                         ['surf', '--fullscreen'])
+
+    def test_other_field_codes(self):
+        """
+        %i expands to the icon option, %c to the name, %k to the desktop file and %% to %.
+        """
+        record = {'shortcut': 'app %i --title=%c --file=%k --pct=100%%', 'name': 'App',
+                  'icon_name': 'app-icon', 'desktop_file': '/usr/share/applications/app.desktop'}
+        self.assertEqual(get_command(record),
+                         ['app', '--icon', 'app-icon', '--title=App',
+                          '--file=/usr/share/applications/app.desktop', '--pct=100%'])
+        self.assertEqual(get_command({'shortcut': 'app %i'}), ['app'])
+
+    def test_string_escapes(self):
+        """
+        The escapes allowed in any string value are undone before the line is split.
+        """
+        self.assertEqual(get_command({'shortcut': 'echo a\\sb'}), ['echo', 'a', 'b'])
+
+    def test_unparseable(self):
+        """
+        A line with an unterminated quote can't be started, and neither can an empty one.
+        """
+        self.assertEqual(get_command({'shortcut': 'sh -c "oops'}), [])
+        self.assertEqual(get_command({}), [])
+
+    def test_terminal(self):
+        """
+        Applications asking for a terminal are wrapped in one, if there is one.
+        """
+        record = {'shortcut': 'htop', 'terminal': True}
+        with mock.patch.object(app_launcher.shutil, 'which', return_value='/usr/bin/xterm'):
+            self.assertEqual(get_command(record), app_launcher.TERMINAL_COMMAND + ['htop'])
+        with mock.patch.object(app_launcher.shutil, 'which', return_value=None):
+            self.assertEqual(get_command(record), ['htop'])
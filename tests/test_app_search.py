@@ -0,0 +1,72 @@
+"""
+Tests for the type-to-filter search index.
+"""
+
+import unittest
+from Modules.Applications.app_search import SearchIndex
+
+APPS = [
+    {'name': 'Terminal', 'generic_name': 'Terminal Emulator', 'keywords': ['shell', 'prompt'],
+     'shortcut': 'x-terminal-emulator'},
+    {'name': 'Text Editor', 'generic_name': 'Editor', 'keywords': ['notes'],
+     'shortcut': 'env LANG=C mousepad %F'},
+    {'name': 'Web Browser', 'generic_name': 'Browser', 'keywords': ['internet', 'terminal'],
+     'shortcut': '/usr/bin/surf'},
+    {'name': 'Pico-8', 'shortcut': 'pico8 -splore'},
+]
+
+class SearchIndexTest(unittest.TestCase):
+    """
+    SearchIndex.search results are indexes into the application list, best match first.
+    """
+    def setUp(self):
+        self.index = SearchIndex(APPS)
+
+    def test_empty_query_matches_everything_in_order(self):
+        """
+        An empty (or blank) query lists every application in list order.
+        """
+        self.assertEqual(self.index.search(''), [0, 1, 2, 3])
+        self.assertEqual(self.index.search('  '), [0, 1, 2, 3])
+
+    def test_name_ranks_above_keywords(self):
+        """
+        A match on the name counts for more than a match on a keyword.
+        """
+        self.assertEqual(self.index.search('term'), [0, 2])
+
+    def test_prefix_and_case(self):
+        """
+        Search terms match the start of any word, whatever the case.
+        """
+        self.assertEqual(self.index.search('EDI'), [1])
+        self.assertEqual(self.index.search('brow'), [2])
+
+    def test_every_term_has_to_match(self):
+        """
+        Each word of the query narrows the results down.
+        """
+        self.assertEqual(self.index.search('text ed'), [1])
+        self.assertEqual(self.index.search('text browser'), [])
+
+    def test_executable_name(self):
+        """
+        The program an application runs is searchable, without its path or environment.
+        """
+        self.assertEqual(self.index.search('mousepad'), [1])
+        self.assertEqual(self.index.search('surf'), [2])
+        self.assertEqual(self.index.search('lang'), [])
+
+    def test_fuzzy_fallback(self):
+        """
+        A term that isn't the start of any word falls back to a fuzzy match on the names.
+        """
+        self.assertEqual(self.index.search('trml'), [0])
+        self.assertEqual(self.index.search('xyz'), [])
+
+    def test_ties_keep_list_order(self):
+        """
+        Applications that match equally well stay in list order.
+        """
+        index = SearchIndex([{'name': 'Game B'}, {'name': 'Game A'}])
+        self.assertEqual(index.search('game'), [0, 1])
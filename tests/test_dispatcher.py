@@ -0,0 +1,152 @@
+"""
+Tests for the dispatcher that runs DBus updates on the Tk main loop.
+"""
+
+import unittest
+from Modules.DBus.dispatcher import Dispatcher
+
+class FakeRoot:
+    """
+    Stands in for the Tk root. It has no file handlers, so the dispatcher polls every frame, and
+    after callbacks are only run when the test says so.
+    """
+    def __init__(self):
+        self.tk = None
+        self.timers = {}
+        self.next_id = 0
+
+    def after(self, delay, callback): #pylint: disable=unused-argument
+        """
+        Remember a timer.
+        """
+        self.next_id += 1
+        self.timers[self.next_id] = callback
+        return self.next_id
+
+    def after_cancel(self, timer_id):
+        """
+        Forget a timer.
+        """
+        self.timers.pop(timer_id, None)
+
+    def run_timers(self):
+        """
+        Run the timers that are due, as the main loop would after a frame.
+        """
+        timers, self.timers = self.timers, {}
+        for callback in timers.values():
+            callback()
+
+class DispatcherTest(unittest.TestCase):
+    """
+    Updates are coalesced by key, held back while paused and run on resume, except urgent ones.
+    """
+    def setUp(self):
+        self.root = FakeRoot()
+        self.dispatcher = Dispatcher()
+        self.dispatcher.attach(self.root)
+        self.calls = []
+
+    def tearDown(self):
+        self.dispatcher.detach()
+
+    def record(self, name):
+        """
+        The update posted by the tests.
+        """
+        self.calls.append(name)
+
+    def other(self, name):
+        """
+        A second update, with a key of its own.
+        """
+        self.calls.append('other ' + name)
+
+    def test_updates_run_on_the_next_frame(self):
+        """
+        Nothing runs until the pump does.
+        """
+        self.dispatcher.post(self.record, 'a')
+        self.assertEqual(self.calls, [])
+        self.root.run_timers()
+        self.assertEqual(self.calls, ['a'])
+
+    def test_coalescing(self):
+        """
+        Only the last update with each key within a frame runs.
+        """
+        self.dispatcher.post(self.record, 'a')
+        self.dispatcher.post(self.other, 'b')
+        self.dispatcher.post(self.record, 'c')
+        self.dispatcher.post(self.record, 'd', key='own key')
+        self.root.run_timers()
+        self.assertEqual(self.calls, ['other b', 'c', 'd'])
+        counters = self.dispatcher.get_counters()
+        self.assertEqual((counters['queued'], counters['coalesced'], counters['dispatched']),
+                         (4, 1, 3))
+
+    def test_pause_holds_the_last_update_of_each_key(self):
+        """
+        Updates posted while paused don't run, even when the pump does, and resuming runs the last
+        one of each key straight away.
+        """
+        self.dispatcher.pause()
+        self.dispatcher.post(self.record, 'a')
+        self.dispatcher.post(self.record, 'b')
+        self.dispatcher.post(self.other, 'c')
+        self.root.run_timers()
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.dispatcher.get_counters()['held'], 3)
+        self.dispatcher.resume()
+        self.assertEqual(self.calls, ['b', 'other c'])
+        self.root.run_timers()
+        self.assertEqual(self.calls, ['b', 'other c'])
+
+    def test_held_updates_are_counted(self):
+        """
+        Updates held back while paused are counted as queued when they are posted, and replacing
+        a held update counts as coalescing it.
+        """
+        self.dispatcher.pause()
+        self.dispatcher.post(self.record, 'a')
+        self.dispatcher.post(self.record, 'b')
+        self.dispatcher.post(self.other, 'c')
+        counters = self.dispatcher.get_counters()
+        self.assertEqual((counters['queued'], counters['coalesced'], counters['dispatched']),
+                         (3, 1, 0))
+        self.dispatcher.resume()
+        counters = self.dispatcher.get_counters()
+        self.assertEqual((counters['queued'], counters['coalesced'], counters['dispatched']),
+                         (3, 1, 2))
+
+    def test_urgent_updates_are_not_held(self):
+        """
+        Replies to something the user did run while paused, and don't release the rest.
+        """
+        self.dispatcher.pause()
+        self.dispatcher.post(self.record, 'held')
+        self.dispatcher.post(self.other, 'urgent', urgent=True)
+        self.root.run_timers()
+        self.assertEqual(self.calls, ['other urgent'])
+        self.dispatcher.resume()
+        self.assertEqual(self.calls, ['other urgent', 'held'])
+
+    def test_resume_without_pause(self):
+        """
+        Resuming when not paused runs nothing early.
+        """
+        self.dispatcher.post(self.record, 'a')
+        self.dispatcher.resume()
+        self.assertEqual(self.calls, [])
+
+    def test_posted_before_attach(self):
+        """
+        Updates posted before the dispatcher has a root are run once it has.
+        """
+        dispatcher = Dispatcher()
+        dispatcher.post(self.record, 'early')
+        root = FakeRoot()
+        dispatcher.attach(root)
+        root.run_timers()
+        dispatcher.detach()
+        self.assertEqual(self.calls, ['early'])
@@ -0,0 +1,40 @@
+"""
+Tests for the runtime metrics registry.
+"""
+
+import tkinter
+import unittest
+from Modules.Profiling.metrics import Metrics
+
+class TkCountersTest(unittest.TestCase):
+    """
+    The Tk counters wrap tkinter itself, so the originals are put back after each test.
+    """
+    def setUp(self):
+        self.originals = (tkinter.CallWrapper.__call__, tkinter.Misc.update,
+                          tkinter.Misc.update_idletasks)
+
+    def tearDown(self):
+        (tkinter.CallWrapper.__call__, tkinter.Misc.update,
+         tkinter.Misc.update_idletasks) = self.originals
+
+    def test_callbacks_registered_earlier_are_counted(self):
+        """
+        Widgets are built (and their callbacks registered) before the counters are installed,
+        and their callbacks are counted all the same.
+        """
+        wrapper = tkinter.CallWrapper(lambda: 'called', None, None)
+        metrics = Metrics()
+        metrics.install_tk_counters()
+        self.assertEqual(wrapper(), 'called')
+        self.assertEqual(metrics.get_snapshot()['counters']['tk'], {'callbacks': 1})
+
+    def test_installing_twice(self):
+        """
+        A second install doesn't wrap tkinter again, which would count every callback twice.
+        """
+        metrics = Metrics()
+        metrics.install_tk_counters()
+        metrics.install_tk_counters()
+        tkinter.CallWrapper(lambda: None, None, None)()
+        self.assertEqual(metrics.get_snapshot()['counters']['tk'], {'callbacks': 1})
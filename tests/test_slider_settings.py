@@ -0,0 +1,233 @@
+"""
+Tests for the rate limiting and coalescing of the settings sliders, driven through the volume
+slider and the fake mixer. There is no display to build widgets on, so the sliders are made
+without running their constructors, with a fake slider and timers the tests run themselves.
+"""
+
+import unittest
+from Modules.Settings import mixer
+from Modules.Settings import settings
+
+class FakeSlider:
+    """
+    Stands in for the ttk scale.
+    """
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        """
+        The slider position.
+        """
+        return self.value
+
+    def set(self, value):
+        """
+        Move the slider.
+        """
+        self.value = value
+
+class CountingMixer(mixer.FakeMixer):
+    """
+    A fake mixer that remembers every volume it was set to.
+    """
+    def __init__(self, volume=50):
+        super().__init__(volume)
+        self.set_calls = []
+
+    def set_volume(self, volume):
+        """
+        Set the volume, and remember it.
+        """
+        self.set_calls.append(volume)
+        super().set_volume(volume)
+
+def make_slider(cls, interval_ms=30):
+    """
+    Set up a slider the way SliderSettings.__init__ does, without any widgets. Timers are kept in
+    slider.timers as [delay, callback] for the tests to run.
+    """
+    slider = cls.__new__(cls)
+    slider.interval_ms = interval_ms
+    slider.value = slider.get_value()
+    slider.wanted_value = None
+    slider.applying = False
+    slider.last_apply = 0
+    slider.apply_id = None
+    slider.dragging = False
+    slider.updating_slider = False
+    slider.slider = FakeSlider(slider.value)
+    slider.titleframe = {'text': 'Test'}
+    slider.timers = []
+    def after(delay, callback):
+        slider.timers.append([delay, callback])
+        return len(slider.timers)
+    slider.after = after
+    return slider
+
+def run_timers(slider):
+    """
+    Run the timers that have been set, as the Tk loop would once they are due.
+    """
+    timers, slider.timers = slider.timers, []
+    for _, callback in timers:
+        callback()
+
+class VolumeSlider(settings.VolumeSettings): #pylint: disable=too-many-ancestors, too-many-instance-attributes
+    """
+    The volume slider, on a counting fake mixer.
+    """
+    mixer = None
+
+class PendingSlider(settings.SliderSettings): #pylint: disable=too-many-ancestors, too-many-instance-attributes
+    """
+    A slider whose values take a while to apply, like the backlight's SetBrightness calls. The
+    test says when each one is done.
+    """
+    applied = None
+
+    def get_value(self):
+        """
+        The value starts at 50.
+        """
+        return 50
+
+    def apply_value(self, value):
+        """
+        Start applying a value.
+        """
+        self.applied.append(value)
+
+class FakeMixerTest(unittest.TestCase):
+    """
+    The fake mixer signals every change through its event pipe, like a real control device.
+    """
+    def setUp(self):
+        self.mixer = mixer.FakeMixer(40)
+
+    def tearDown(self):
+        self.mixer.close()
+
+    def test_changes_are_signalled(self):
+        """
+        Changes make the event pipe readable, and handle_events drains it.
+        """
+        handle = self.mixer.get_event_fds()[0]
+        self.mixer.set_volume(70)
+        self.mixer.simulate_change(150)
+        self.assertEqual(self.mixer.get_volume(), 100)
+        self.mixer.handle_events()
+        with self.assertRaises(BlockingIOError):
+            mixer.os.read(handle, 1)
+
+class SliderSettingsTest(unittest.TestCase):
+    """
+    Slider moves are applied at most once per interval and never while a value is still being
+    applied, so the moves made in between are coalesced into the latest one.
+    """
+    def setUp(self):
+        VolumeSlider.mixer = CountingMixer(50)
+        self.slider = make_slider(VolumeSlider)
+        self.mixer = VolumeSlider.mixer
+
+    def tearDown(self):
+        self.mixer.close()
+
+    def test_moves_are_coalesced(self):
+        """
+        A burst of moves within one interval only sets the volume once, to the last value.
+        """
+        for value in (51.2, 55.7, 60.1, 64.9):
+            self.slider.slider_moved(value)
+        self.assertEqual(len(self.slider.timers), 1)
+        self.assertEqual(self.slider.timers[0][0], 0)
+        run_timers(self.slider)
+        self.assertEqual(self.mixer.set_calls, [65])
+        self.assertEqual(self.slider.value, 65)
+
+    def test_rate_limit(self):
+        """
+        Right after a value has been applied, the next one waits for the rest of the interval.
+        """
+        self.slider.slider_moved(60)
+        run_timers(self.slider)
+        self.slider.slider_moved(70)
+        delay = self.slider.timers[0][0]
+        self.assertGreater(delay, 0)
+        self.assertLessEqual(delay, self.slider.interval_ms)
+        run_timers(self.slider)
+        self.assertEqual(self.mixer.set_calls, [60, 70])
+
+    def test_unchanged_value_is_not_applied(self):
+        """
+        Moving the slider back to where it was doesn't touch the mixer.
+        """
+        self.slider.slider_moved(61)
+        self.slider.slider_moved(50.4)
+        run_timers(self.slider)
+        self.assertEqual(self.mixer.set_calls, [])
+
+    def test_outside_changes_move_the_slider(self):
+        """
+        A change made elsewhere moves the slider, unless it is being dragged.
+        """
+        self.mixer.simulate_change(20)
+        self.slider.mixer_changed(None, None)
+        self.assertEqual(self.slider.slider.get(), 20)
+        self.assertEqual(self.slider.timers, [])
+        self.slider.drag_started()
+        self.mixer.simulate_change(30)
+        self.slider.mixer_changed(None, None)
+        self.assertEqual((self.slider.value, self.slider.slider.get()), (30, 20))
+
+    def test_own_changes_do_not_feed_back(self):
+        """
+        Setting the slider from the mixer doesn't ask for the value to be applied again.
+        """
+        self.slider.set_slider(80)
+        self.assertIsNone(self.slider.wanted_value)
+        self.assertEqual(self.slider.timers, [])
+
+class PendingSliderTest(unittest.TestCase):
+    """
+    While a value is being applied, new moves wait for it and only the latest is applied next.
+    """
+    def setUp(self):
+        PendingSlider.applied = []
+        self.slider = make_slider(PendingSlider)
+
+    def test_moves_wait_for_the_value_in_flight(self):
+        """
+        Nothing is scheduled while applying, and once done only the last move is applied.
+        """
+        self.slider.slider_moved(60)
+        run_timers(self.slider)
+        for value in (65, 70, 75):
+            self.slider.slider_moved(value)
+        self.assertEqual(self.slider.timers, [])
+        self.slider.value_applied(60)
+        run_timers(self.slider)
+        self.assertEqual(PendingSlider.applied, [60, 75])
+
+    def test_failure_sets_the_slider_back(self):
+        """
+        If a value can't be applied and nothing else was asked for, the slider goes back to the
+        actual value.
+        """
+        self.slider.slider_moved(90)
+        run_timers(self.slider)
+        self.slider.slider.set(90)
+        self.slider.value_failed(90)
+        self.assertEqual(self.slider.slider.get(), 50)
+        self.assertEqual(self.slider.timers, [])
+
+    def test_failure_keeps_newer_moves(self):
+        """
+        If the slider moved while the failed value was in flight, the newer value is applied.
+        """
+        self.slider.slider_moved(90)
+        run_timers(self.slider)
+        self.slider.slider_moved(95)
+        self.slider.value_failed(90)
+        run_timers(self.slider)
+        self.assertEqual(PendingSlider.applied, [90, 95])
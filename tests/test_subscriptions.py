@@ -0,0 +1,133 @@
+"""
+Tests for the subscription manager, run against the stub bus of the benchmarks.
+"""
+
+import copy
+import unittest
+import dbus_stub
+from Modules.DBus.property_cache import PropertyCache
+from Modules.DBus.subscriptions import SubscriptionManager
+
+NM_BUS = 'org.freedesktop.NetworkManager'
+NM_WIRELESS = 'org.freedesktop.NetworkManager.Device.Wireless'
+NM_ACCESS_POINT = 'org.freedesktop.NetworkManager.AccessPoint'
+FIRST = dbus_stub.WIFI_ACCESS_POINT
+SECOND = '/org/freedesktop/NetworkManager/AccessPoint/2'
+
+class SubscriptionManagerTest(unittest.TestCase):
+    """
+    Moving a subscription subscribes to the new object before letting go of the old one, and
+    only keeps the match rules of the objects that are followed.
+    """
+    def setUp(self):
+        self.objects = copy.deepcopy(dbus_stub.OBJECTS)
+        dbus_stub.OBJECTS[(NM_BUS, SECOND)] = {
+            NM_ACCESS_POINT: {'Strength': 40, 'Ssid': b'second'}}
+        self.bus = dbus_stub.StubBus()
+        self.cache = PropertyCache(self.bus)
+        self.manager = SubscriptionManager(self.cache)
+        self.calls = []
+
+    def tearDown(self):
+        dbus_stub.OBJECTS.clear()
+        dbus_stub.OBJECTS.update(self.objects)
+
+    def callback(self, interface, changed, invalidated): #pylint: disable=unused-argument
+        """
+        The subscriber, recording the strengths it is told about.
+        """
+        self.calls.append(changed.get('Strength'))
+
+    def get_matched_paths(self):
+        """
+        The paths of the access points with a match rule.
+        """
+        return sorted(match.keywords['path'] for match in self.bus.matches
+                      if match.keywords.get('arg0') == NM_ACCESS_POINT)
+
+    def test_subscribe_and_move(self):
+        """
+        The callback gets all the properties of each object it's moved to, then its changes, and
+        only those of the object it's on.
+        """
+        subscription = self.manager.subscribe(NM_BUS, FIRST, NM_ACCESS_POINT, self.callback, 1.0)
+        self.assertEqual(self.calls, [80])
+        subscription.move(SECOND)
+        self.assertEqual(self.calls, [80, 40])
+        self.assertEqual(self.get_matched_paths(), [SECOND])
+        self.bus.emit_properties_changed(FIRST, NM_ACCESS_POINT, {'Strength': 10})
+        self.bus.emit_properties_changed(SECOND, NM_ACCESS_POINT, {'Strength': 30})
+        self.assertEqual(self.calls, [80, 40, 30])
+
+    def test_move_to_the_same_path(self):
+        """
+        Moving to where the subscription already is does nothing.
+        """
+        subscription = self.manager.subscribe(NM_BUS, FIRST, NM_ACCESS_POINT, self.callback, 1.0)
+        subscription.move(FIRST)
+        self.assertEqual(self.calls, [80])
+        self.assertEqual(len(self.bus.matches), 1)
+
+    def test_move_to_no_object(self):
+        """
+        "/" means no object: the subscription is dropped along with the cached object.
+        """
+        subscription = self.manager.subscribe(NM_BUS, FIRST, NM_ACCESS_POINT, self.callback, 1.0)
+        subscription.move('/')
+        self.assertIsNone(subscription.path)
+        self.assertEqual(self.get_matched_paths(), [])
+        self.assertEqual(self.cache.get_all(NM_BUS, FIRST, NM_ACCESS_POINT), {})
+        self.assertEqual(self.manager.get_followed(), {})
+
+    def test_shared_objects_are_counted(self):
+        """
+        Two subscriptions on one object share its match rule, which stays until both have left.
+        """
+        first = self.manager.subscribe(NM_BUS, FIRST, NM_ACCESS_POINT, self.callback, 1.0)
+        second = self.manager.subscribe(NM_BUS, FIRST, NM_ACCESS_POINT, self.callback, 1.0)
+        self.assertEqual(self.get_matched_paths(), [FIRST])
+        self.assertEqual(self.manager.get_followed(), {(NM_BUS, FIRST, NM_ACCESS_POINT): 2})
+        first.cancel()
+        self.assertEqual(self.get_matched_paths(), [FIRST])
+        second.cancel()
+        self.assertEqual(self.get_matched_paths(), [])
+
+    def test_other_watchers_are_kept(self):
+        """
+        An object watched on the cache by someone else stays cached, and keeps its match rule,
+        when a subscription moves away from it.
+        """
+        self.cache.watch(NM_BUS, FIRST, NM_ACCESS_POINT)
+        subscription = self.manager.subscribe(NM_BUS, FIRST, NM_ACCESS_POINT, self.callback, 1.0)
+        subscription.move(SECOND)
+        self.assertEqual(self.get_matched_paths(), [FIRST, SECOND])
+        self.bus.emit_properties_changed(FIRST, NM_ACCESS_POINT, {'Strength': 10})
+        self.assertEqual(self.cache.get(NM_BUS, FIRST, NM_ACCESS_POINT, 'Strength'), 10)
+        self.cache.unwatch(NM_BUS, FIRST, NM_ACCESS_POINT)
+        self.assertEqual(self.get_matched_paths(), [SECOND])
+
+    def test_move_fetches_fresh_properties(self):
+        """
+        A copy seeded from GetManagedObjects may be out of date by the time we move to it.
+        """
+        self.cache.get_managed_objects(NM_BUS, '/')
+        dbus_stub.OBJECTS[(NM_BUS, SECOND)][NM_ACCESS_POINT]['Strength'] = 15
+        self.manager.subscribe(NM_BUS, SECOND, NM_ACCESS_POINT, self.callback, 1.0)
+        self.assertEqual(self.calls, [15])
+
+    def test_follow(self):
+        """
+        A followed subscription moves when the property pointing at its object changes, and
+        cancelling it stops following the property.
+        """
+        device = dbus_stub.WIFI_DEVICE
+        self.cache.watch(NM_BUS, device, NM_WIRELESS)
+        subscription = self.manager.follow(NM_BUS, device, NM_WIRELESS, 'ActiveAccessPoint',
+                                           NM_ACCESS_POINT, self.callback, 1.0)
+        self.assertEqual((subscription.path, self.calls), (FIRST, [80]))
+        self.bus.emit_properties_changed(device, NM_WIRELESS, {'ActiveAccessPoint': SECOND})
+        self.assertEqual((subscription.path, self.calls), (SECOND, [80, 40]))
+        subscription.cancel()
+        self.bus.emit_properties_changed(device, NM_WIRELESS, {'ActiveAccessPoint': FIRST})
+        self.assertIsNone(subscription.path)
+        self.assertEqual(self.get_matched_paths(), [])
@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+
+"""
+Build the sprite atlases for the launcher's status icons. The separate PNGs of each widget family
+(for instance Modules/Battery/battery_*.png) are packed side by side into one atlas image,
+Modules/Battery/battery_atlas.png, with an index of where each image is in
+Modules/Battery/battery_atlas.json. At runtime icon_cache.SpriteAtlas decodes the atlas once and
+crops the images back out of it, instead of opening and decoding every PNG on its own.
+
+Run this again whenever one of the source PNGs changes. With --check nothing is written, and the
+exit status says whether the atlases are up to date.
+"""
+
+import os
+import sys
+import json
+import argparse
+from PIL import Image
+
+TOOLS_DIR = os.path.dirname(os.path.realpath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+
+sys.path.insert(0, REPO_DIR)
+
+#pylint: disable=wrong-import-position
+from Modules.Cache.icon_cache import ATLAS_VERSION, get_atlas_paths
+#pylint: enable=wrong-import-position
+
+#Each atlas is (directory, atlas name, prefix of the source PNGs). The images are named in the
+#index by their file name with the prefix and extension taken off.
+ATLASES = [('Modules/Battery', 'battery', 'battery_'),
+           ('Modules/Wifi', 'wifi', 'wifi_'),
+           ('Modules/Bluetooth', 'bluetooth', 'bluetooth_'),
+           ('Modules/Elements', 'elements', '')]
+
+def find_sources(directory, name, prefix):
+    """
+    List the source PNGs of an atlas as (image name, path) pairs, sorted by name.
+    """
+    atlas_image = os.path.basename(get_atlas_paths(directory, name)[0])
+    sources = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.png') or not filename.startswith(prefix) or \
+           filename == atlas_image:
+            continue
+        sources.append((filename[len(prefix):-len('.png')], os.path.join(directory, filename)))
+    return sources
+
+def build_atlas(sources):
+    """
+    Pack the source images side by side into one RGBA image. Returns the image and the index of
+    sprites as {name: [left, top, width, height]}.
+    """
+    images = [(sprite, Image.open(path).convert('RGBA')) for sprite, path in sources]
+    width = sum(image.width for _, image in images)
+    height = max(image.height for _, image in images)
+    atlas = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    sprites = {}
+    left = 0
+    for sprite, image in images:
+        atlas.paste(image, (left, 0))
+        sprites[sprite] = [left, 0, image.width, image.height]
+        left += image.width
+    return atlas, sprites
+
+def is_up_to_date(atlas, sprites, image_path, index_path):
+    """
+    Check whether the atlas on disk already matches the one we just built.
+    """
+    try:
+        with open(index_path, encoding='utf-8') as indexfile:
+            index = json.load(indexfile)
+        with Image.open(image_path) as existing:
+            existing_pixels = existing.convert('RGBA').tobytes()
+    except (OSError, ValueError):
+        return False
+    return index == get_index(image_path, sprites) and existing_pixels == atlas.tobytes()
+
+def get_index(image_path, sprites):
+    """
+    Build the contents of an atlas index.
+    """
+    return {'version': ATLAS_VERSION,
+            'image': os.path.basename(image_path),
+            'sprites': sprites}
+
+def main(argv):
+    """
+    Build (or check) every atlas.
+    """
+    parser = argparse.ArgumentParser(description="Build the status icon sprite atlases")
+    parser.add_argument('--check', action='store_true',
+                        help="don't write anything, exit non-zero if an atlas is out of date")
+    arguments = parser.parse_args(argv)
+    stale = []
+    for directory, name, prefix in ATLASES:
+        directory = os.path.join(REPO_DIR, directory)
+        image_path, index_path = get_atlas_paths(directory, name)
+        atlas, sprites = build_atlas(find_sources(directory, name, prefix))
+        if is_up_to_date(atlas, sprites, image_path, index_path):
+            continue
+        stale.append(os.path.relpath(image_path, REPO_DIR))
+        if arguments.check:
+            continue
+        atlas.save(image_path, optimize=True)
+        with open(index_path, 'w', encoding='utf-8') as indexfile:
+            json.dump(get_index(image_path, sprites), indexfile, sort_keys=True)
+            indexfile.write('\n')
+    for path in stale:
+        print(("Out of date: " if arguments.check else "Built: ") + path)
+    return 1 if arguments.check and stale else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
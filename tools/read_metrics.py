@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+
+"""
+Read a metrics snapshot from a running launcher over its metrics socket and print it. With --sort
+the counters of every group are listed biggest first, to see what is costing the most.
+"""
+
+import os
+import sys
+import json
+import socket
+import argparse
+
+TOOLS_DIR = os.path.dirname(os.path.realpath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+
+sys.path.insert(0, REPO_DIR)
+
+#pylint: disable=wrong-import-position
+from Modules.Profiling.metrics import get_metrics_paths
+#pylint: enable=wrong-import-position
+
+def read_snapshot(socket_path):
+    """
+    Connect to the metrics socket and read the snapshot it sends back.
+    """
+    chunks = []
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(5)
+        client.connect(socket_path)
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b''.join(chunks))
+
+def print_sorted(snapshot):
+    """
+    Print the RSS and the counters of every group, biggest first.
+    """
+    print("rss_kb %s  uptime_s %s" % (snapshot.get('rss_kb'), snapshot.get('uptime_s')))
+    for group, counters in sorted(snapshot.get('counters', {}).items()):
+        print(group)
+        for name, value in sorted(counters.items(), key=lambda item: -item[1]):
+            print("  %10d  %s" % (value, name))
+
+def main(argv):
+    """
+    Read and print a snapshot.
+    """
+    parser = argparse.ArgumentParser(description="Read the metrics of a running launcher")
+    parser.add_argument('--socket', default=get_metrics_paths()[1],
+                        help="the metrics socket (default: %(default)s)")
+    parser.add_argument('--sort', action='store_true',
+                        help="list the counters biggest first instead of printing the JSON")
+    arguments = parser.parse_args(argv)
+    try:
+        snapshot = read_snapshot(arguments.socket)
+    except (OSError, ValueError) as error:
+        print("Could not read metrics: " + str(error))
+        return 1
+    if arguments.sort:
+        print_sorted(snapshot)
+    else:
+        print(json.dumps(snapshot, indent=1, sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))